@@ -258,3 +258,29 @@ CREATE INDEX IF NOT EXISTS idx_perfil_salud_persona ON perfil_salud(persona_id);
 INSERT INTO storage.buckets (id, name, public) 
 VALUES ('radiografias', 'radiografias', true)
 ON CONFLICT (id) DO NOTHING;
+
+-- Derivados WebP de la radiografía (miniatura para listados y vista previa mediana)
+ALTER TABLE analisis_radiografias
+ADD COLUMN IF NOT EXISTS imagen_miniatura_url TEXT,
+ADD COLUMN IF NOT EXISTS imagen_vista_previa_url TEXT;
+
+-- Versión del modelo que produjo cada diagnóstico
+ALTER TABLE analisis_radiografias
+ADD COLUMN IF NOT EXISTS version_modelo TEXT;
+
+-- Contadores para la reconciliación de /estadisticas (un GROUP BY en lugar de recorrer la tabla)
+CREATE OR REPLACE FUNCTION estadisticas_analisis(hasta TIMESTAMP)
+RETURNS TABLE (
+    fecha DATE,
+    diagnostico TEXT,
+    nivel_vulnerabilidad_paciente TEXT,
+    prioridad_atencion_sugerida TEXT,
+    total BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT a.fecha::date, a.diagnostico, a.nivel_vulnerabilidad_paciente, a.prioridad_atencion_sugerida, COUNT(*)
+    FROM analisis_radiografias a
+    WHERE a.fecha <= hasta
+    GROUP BY 1, 2, 3, 4;
+$$;
@@ -1,100 +1,61 @@
 # backend/app.py 
-from trayendo_modelo import model as modelo
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
-from fastapi.middleware.cors import CORSMiddleware
-from tensorflow import keras
-import numpy as np
-from PIL import Image
-import io
-import tensorflow as tf
-import os
+# Hilos de TensorFlow y oneDNN del autoajuste: deben aplicarse antes de importar TensorFlow
+from servicios.ajuste_cpu import aplicar_configuracion_cpu
+aplicar_configuracion_cpu()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, BackgroundTasks
 import uuid
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi.responses import JSONResponse
 
 # Supabase y controladores
 from config.conexion import (
     get_supabase,
-    get_supabase_admin,
-    verificar_conexion,
-    verificar_storage
+    get_supabase_admin
 )
-from controladores import authController, personaController, analisisController
-
-
-# APP
-app = FastAPI(title="API de Detección de Neumonía")
-
-
-# CORS
-def get_origins():
-    env = os.getenv("NODE_ENV", "development")
-    if env == "production":
-        return [
-            "https://neumonitor2.vercel.app",
-            "https://neumonitor2.onrender.com",
-        ]
-    return [
-        "http://localhost:3000",
-        "http://localhost:3001",
-        "http://127.0.0.1:3000",
-        "http://127.0.0.1:3001",
+from controladores import authController, personaController, analisisController, estadisticasController, modelosController, trabajosController
+from middleware.global_asgi import MiddlewareGlobal
+from middleware.compresion import MiddlewareCompresion
+from servicios.carga_imagen import leer_imagen_limitada
+from servicios.almacenamiento import subir_radiografia
+from servicios.derivados import generar_derivados, subir_derivados
+from servicios.estadisticas import agregados, reconciliar_periodicamente
+from servicios.inferencia import cola_inferencia, imagen_a_lote, interpretar_prediccion
+from servicios.admision import control_admision
+from servicios.registro_modelos import registro_modelos, sincronizar_version_activa
+from servicios.evaluacion_sombra import evaluador_sombra
+from servicios.cascada import cascada
+from servicios.resiliencia import DependenciaNoDisponible, llamar_supabase, estado_circuitos
+from servicios.salud import monitor_salud, sondear_periodicamente
+from servicios.respuestas import RespuestaJSON
+from servicios.versiones_persona import versiones_persona
+
+
+# CICLO DE VIDA (TAREAS EN SEGUNDO PLANO)
+@asynccontextmanager
+async def ciclo_vida(app: FastAPI):
+    registro_modelos.inicializar()
+    cascada.inicializar()
+    tareas = [
+        asyncio.create_task(reconciliar_periodicamente()),
+        asyncio.create_task(sincronizar_version_activa()),
+        asyncio.create_task(sondear_periodicamente()),
     ]
+    yield
+    for tarea in tareas:
+        tarea.cancel()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=get_origins(),
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["*"],
-)
 
+# APP
+# Todas las rutas (incluidos los routers) serializan con orjson
+app = FastAPI(title="API de Detección de Neumonía", lifespan=ciclo_vida, default_response_class=RespuestaJSON)
 
-# MIDDLEWARE GLOBAL
-@app.middleware("http")
-async def middleware_global(request: Request, call_next):
-    print(f"\n{'='*50}")
-    print(f"Solicitud: {request.method} {request.url.path}")
 
-    if request.method == "OPTIONS":
-        response = JSONResponse(content={"message": "OK"})
-    else:
-        try:
-            auth_header = request.headers.get("Authorization")
-            request.state.persona = None
-
-            if auth_header and auth_header.startswith("Bearer "):
-                token = auth_header.split(" ")[1]
-                supabase = get_supabase()
-                response_db = (
-                    supabase.table("persona")
-                    .select("*")
-                    .eq("id", token)
-                    .single()
-                    .execute()
-                )
-                if response_db.data:
-                    request.state.persona = response_db.data
-                    print(f"Usuario autenticado: {response_db.data.get('email')}")
-                else:
-                    print("Token inválido")
-            else:
-                print("No hay token en la solicitud")
-        except Exception as e:
-            print(f"Error en middleware: {e}")
-
-        response = await call_next(request)
-
-    origin = request.headers.get("origin", "")
-    if origin in get_origins():
-        response.headers["Access-Control-Allow-Origin"] = origin
-
-    response.headers["Access-Control-Allow-Credentials"] = "true"
-    response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-    response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type, Accept"
-
-    return response
+# MIDDLEWARE GLOBAL (ASGI PURO: CORS, ADMISIÓN, AUTENTICACIÓN Y LÍMITE DE TASA)
+# El último agregado es el más externo: la compresión queda por dentro
+app.add_middleware(MiddlewareCompresion)
+app.add_middleware(MiddlewareGlobal)
 
 @app.options("/{path:path}")
 async def options_handler():
@@ -105,6 +66,9 @@ async def options_handler():
 app.include_router(authController.router)
 app.include_router(personaController.router)
 app.include_router(analisisController.router)
+app.include_router(estadisticasController.router)
+app.include_router(modelosController.router)
+app.include_router(trabajosController.router)
 
 
 # ENDPOINTS PÚBLICOS
@@ -113,7 +77,7 @@ async def raiz():
     return {
         "mensaje": "API de Detección de Neumonía",
         "version": "1.1.0",
-        "estado": "operativo" if modelo else "modelo no cargado",
+        "estado": "operativo" if registro_modelos.disponible else "modelo no cargado",
         "nuevas_funcionalidades": {
             "registro_mejorado": True,
             "evaluacion_vulnerabilidad": True,
@@ -123,11 +87,29 @@ async def raiz():
 
 @app.get("/salud")
 async def verificar_salud():
+    # Estado de BD y storage tomado del sondeo en segundo plano (sin consultar a Supabase)
+    dependencias = monitor_salud.dependencias
+    if not registro_modelos.disponible:
+        estado = "modelo no cargado"
+    elif monitor_salud.dependencias_disponibles:
+        estado = "saludable"
+    else:
+        # Las predicciones anónimas siguen funcionando sin Supabase
+        estado = "degradado"
+
     return {
-        "estado": "saludable",
-        "modelo_cargado": modelo is not None,
-        "supabase_conectado": await verificar_conexion(),
-        "storage_disponible": await verificar_storage(),
+        "estado": estado,
+        "fecha": datetime.now().isoformat(),
+        "modelo_cargado": registro_modelos.disponible,
+        "version_modelo": registro_modelos.version_activa,
+        "carga_modelo": registro_modelos.estado_carga,
+        "cascada_activa": cascada.activa,
+        "supabase_conectado": dependencias["supabase"]["disponible"],
+        "storage_disponible": dependencias["storage"]["disponible"],
+        "dependencias": dependencias,
+        "cola_inferencia": cola_inferencia.metricas(),
+        "admision": control_admision.metricas(),
+        "circuitos_supabase": estado_circuitos(),
     }
 
 
@@ -140,12 +122,12 @@ async def obtener_vulnerabilidad(persona_id: str):
     """
     try:
         supabase = get_supabase()
-        response = (
+        response = await llamar_supabase("consulta", lambda: (
             supabase.table("perfil_salud")
             .select("*")
             .eq("persona_id", persona_id)
             .execute()
-        )
+        ))
 
         if not response.data:
             raise HTTPException(status_code=404, detail="Perfil no encontrado")
@@ -171,7 +153,8 @@ async def obtener_vulnerabilidad(persona_id: str):
 @app.post("/predecir")
 async def predecir_neumonia_publico(
     imagen: UploadFile = File(...),
-    request: Request = None
+    request: Request = None,
+    background_tasks: BackgroundTasks = None
 ):
     """
     Endpoint de predicción que:
@@ -179,35 +162,51 @@ async def predecir_neumonia_publico(
     2. Si el usuario está autenticado, ADICIONALMENTE incluye su perfil de vulnerabilidad
     3. La vulnerabilidad NO afecta el diagnóstico médico
     """
-    if modelo is None:
+    if not registro_modelos.disponible:
         raise HTTPException(status_code=500, detail="Modelo no disponible")
 
     if imagen.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
         raise HTTPException(status_code=400, detail="Formato no soportado")
 
+    # Validar tamaño y dimensiones sin cargar la imagen completa en memoria
+    imagen_cargada = leer_imagen_limitada(imagen)
+    resultado = None
+
     try:
+        autenticado = hasattr(request.state, 'persona') and request.state.persona
+
         
-        # PASO 1: DIAGNÓSTICO DE LA RADIOGRAFÍA (INDEPENDIENTE)
+        # PASO 0: PRIORIDAD EN LA COLA DE INFERENCIA
+        # Perfiles de ALTA prioridad se atienden primero; el tráfico anónimo al final.
+        # La prioridad solo ordena la cola, NO afecta el diagnóstico.
+        
+        # El perfil se consulta en paralelo con la decodificación y, si no llega a
+        # tiempo, la solicitud se encola como MEDIA (nunca espera a una BD lenta).
         
-        contenido = await imagen.read()
-        img = Image.open(io.BytesIO(contenido)).convert("RGB").resize((224, 224))
-        arr = keras.preprocessing.image.img_to_array(img)
-        arr = np.expand_dims(arr, axis=0)
+        prioridad = "ANONIMA"
+        if autenticado:
+            supabase = get_supabase_admin()
+            persona_id = request.state.persona["id"]
 
-        pred = modelo.predict(arr, verbose=0)[0]
-        prob = tf.nn.softmax(pred).numpy()
+            from controladores.analisisController import consultar_vulnerabilidad, prioridad_de
+            consulta_vulnerabilidad = consultar_vulnerabilidad(persona_id, supabase)
 
-        clases = ["NORMAL", "PNEUMONIA"]
-        idx = int(np.argmax(prob))
+        
+        # PASO 1: DIAGNÓSTICO DE LA RADIOGRAFÍA (INDEPENDIENTE)
+        
+        img = await asyncio.to_thread(imagen_cargada.decodificar)
+        arr = imagen_a_lote(img)
+        if autenticado:
+            prioridad = await prioridad_de(consulta_vulnerabilidad)
+        prob, version_modelo = await cola_inferencia.predecir(arr, prioridad)
+
+        # Evaluación en sombra de la versión candidata (no afecta al resultado)
+        evaluador_sombra.enviar(arr, prob, version_modelo)
 
         # Resultado base del diagnóstico (sin vulnerabilidad)
         resultado = {
-            "diagnostico": clases[idx],
-            "confianza": round(float(prob[idx] * 100), 2),
-            "probabilidades": {
-                "normal": float(prob[0]),
-                "neumonia": float(prob[1]),
-            },
+            **interpretar_prediccion(prob),
+            "version_modelo": version_modelo,
             "autenticado": False,
             "explicacion": "Análisis estándar del modelo de IA"
         }
@@ -215,27 +214,17 @@ async def predecir_neumonia_publico(
         
         # PASO 2: SI HAY SESIÓN, AGREGAR INFORMACIÓN DE VULNERABILIDAD
         
-        if hasattr(request.state, 'persona') and request.state.persona:
-            supabase = get_supabase_admin()
-            persona_id = request.state.persona["id"]
-            nombre_archivo = f"{persona_id}/{uuid.uuid4()}.jpg"
+        if autenticado:
+            # Misma consulta del paso 0 (ya terminada o con su propio timeout y respaldo)
+            vulnerabilidad_info = await consulta_vulnerabilidad
 
-            # Subir imagen
-            supabase.storage.from_("radiografias").upload(
-                nombre_archivo,
-                contenido,
-                {"content-type": imagen.content_type},
-            )
+            # Subir imagen (direccionada por contenido: un duplicado reutiliza el objeto existente)
+            nombre_archivo, url, duplicada = await subir_radiografia(supabase, persona_id, imagen_cargada)
 
-            url = supabase.storage.from_("radiografias").get_public_url(nombre_archivo)
+            # Miniatura y vista previa WebP para listados (se generan en un hilo y se suben en segundo plano)
+            derivados = None if duplicada else await asyncio.to_thread(generar_derivados, imagen_cargada)
 
             
-            # OBTENER INFORMACIÓN DE VULNERABILIDAD (SEPARADA)
-            
-            from controladores.analisisController import obtener_informacion_vulnerabilidad
-            vulnerabilidad_info = await obtener_informacion_vulnerabilidad(persona_id, supabase)
-            
-            
             # GENERAR EXPLICACIÓN QUE COMBINE AMBOS (PERO NO LOS MEZCLE)
             
             from controladores.analisisController import generar_explicacion_analisis
@@ -248,14 +237,16 @@ async def predecir_neumonia_publico(
             
             # GUARDAR ANÁLISIS CON AMBAS INFORMACIONES SEPARADAS
             
+            analisis_id = str(uuid.uuid4())
             analisis_data = {
-                "id": str(uuid.uuid4()),
+                "id": analisis_id,
                 "persona_id": persona_id,
                 "imagen_url": url,
                 # Diagnóstico de la radiografía
                 "diagnostico": resultado["diagnostico"],
                 "confianza": resultado["confianza"],
                 "probabilidades": resultado["probabilidades"],
+                "version_modelo": version_modelo,
                 "fecha": datetime.now().isoformat(),
                 # Información de vulnerabilidad del paciente (SEPARADA)
                 "nivel_vulnerabilidad_paciente": vulnerabilidad_info["nivel_vulnerabilidad"],
@@ -265,7 +256,13 @@ async def predecir_neumonia_publico(
                 "detalles_analisis": explicacion_info["explicacion_detallada"]
             }
 
-            supabase.table("analisis_radiografias").insert(analisis_data).execute()
+            try:
+                await llamar_supabase("escritura", lambda: supabase.table("analisis_radiografias").insert(analisis_data).execute())
+            finally:
+                # También si falla: un timeout no garantiza que la escritura no se aplicara
+                versiones_persona.incrementar(persona_id)
+            agregados.registrar(analisis_data)
+            background_tasks.add_task(subir_derivados, analisis_id, nombre_archivo, derivados)
 
             
             # RESPUESTA PARA USUARIO AUTENTICADO
@@ -289,11 +286,22 @@ async def predecir_neumonia_publico(
                 "explicacion_vulnerabilidad": vulnerabilidad_info["explicacion"]
             }
 
-        return JSONResponse(content=resultado)
+        return RespuestaJSON(content=resultado)
 
+    except DependenciaNoDisponible:
+        # El diagnóstico ya está calculado: responder como anónimo sin esperar a Supabase
+        if resultado is None:
+            raise
+        print("Supabase no disponible: diagnóstico entregado sin guardar en historial")
+        resultado["mensaje"] = "Análisis no guardado en historial: servicio de datos no disponible"
+        return RespuestaJSON(content=resultado)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error en predicción: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        imagen_cargada.cerrar()
 
 
 # MAIN
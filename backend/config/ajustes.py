@@ -0,0 +1,271 @@
+# backend/config/ajustes.py
+import os
+import tempfile
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+
+# ENTRADA DEL MODELO
+
+# Resolución (alto = ancho) de la radiografía que recibe el modelo. Fuente única
+# para entrenamiento (model.py), servidor, prediccion.py y la demo de Streamlit.
+# Debe coincidir con el modelo servido; ver herramientas/barrido_resolucion.py
+TAMANO_ENTRADA_MODELO = int(os.getenv("TAMANO_ENTRADA_MODELO", "224"))
+
+
+# CARGA DE IMÁGENES
+
+# Tamaño máximo permitido para una radiografía subida (bytes)
+MAX_BYTES_IMAGEN = int(os.getenv("MAX_BYTES_IMAGEN", str(10 * 1024 * 1024)))
+
+# Máximo de píxeles (ancho * alto) aceptados antes de decodificar la imagen.
+# Protege contra "bombas de descompresión" (archivos pequeños con dimensiones enormes)
+MAX_PIXELES_IMAGEN = int(os.getenv("MAX_PIXELES_IMAGEN", str(40_000_000)))
+
+# Margen para cabeceras multipart al validar Content-Length antes de leer el cuerpo
+MARGEN_MULTIPART = 64 * 1024
+
+# Claves de storage recordadas por worker para evitar consultas de existencia
+MAX_INDICE_ALMACENAMIENTO = int(os.getenv("MAX_INDICE_ALMACENAMIENTO", "10000"))
+
+
+# DERIVADOS DE RADIOGRAFÍAS (WEBP)
+
+# Lado máximo (px) de la miniatura usada en listados e historial
+TAMANO_MINIATURA = int(os.getenv("TAMANO_MINIATURA", "256"))
+
+# Lado máximo (px) de la vista previa mediana
+TAMANO_VISTA_PREVIA = int(os.getenv("TAMANO_VISTA_PREVIA", "1024"))
+
+# Calidad de compresión WebP (0-100)
+CALIDAD_WEBP = int(os.getenv("CALIDAD_WEBP", "75"))
+
+
+# ESTADÍSTICAS AGREGADAS
+
+# Intervalo (segundos) entre reconciliaciones completas de los contadores con la BD
+INTERVALO_RECONCILIACION_ESTADISTICAS = int(os.getenv("INTERVALO_RECONCILIACION_ESTADISTICAS", "600"))
+
+# Días máximos devueltos en la serie diaria de /estadisticas
+DIAS_ESTADISTICAS = int(os.getenv("DIAS_ESTADISTICAS", "30"))
+
+# Los análisis de los últimos segundos quedan fuera de la base (pueden estar insertándose)
+MARGEN_RECONCILIACION_ESTADISTICAS = int(os.getenv("MARGEN_RECONCILIACION_ESTADISTICAS", "60"))
+
+# Base reconciliada compartida por los workers del host (junto a su .registro y .lider)
+RUTA_ESTADISTICAS = os.getenv("RUTA_ESTADISTICAS") or os.path.join(
+    tempfile.gettempdir(), "neumonitor_estadisticas.json"
+)
+
+
+# COLA DE INFERENCIA
+
+# Hilos que ejecutan el modelo (TensorFlow ya paraleliza cada predicción internamente)
+HILOS_INFERENCIA = int(os.getenv("HILOS_INFERENCIA", "1"))
+
+# Segundos de espera que equivalen a subir un nivel de prioridad (evita inanición)
+ENVEJECIMIENTO_COLA_SEGUNDOS = float(os.getenv("ENVEJECIMIENTO_COLA_SEGUNDOS", "2.0"))
+
+# Segundos que se reutiliza el perfil de salud consultado de una persona (prioridad en la cola)
+TTL_VULNERABILIDAD_SEGUNDOS = float(os.getenv("TTL_VULNERABILIDAD_SEGUNDOS", "60"))
+
+# Espera máxima del perfil de salud antes de encolar la inferencia; si no llega, prioridad MEDIA
+ESPERA_PRIORIDAD_SEGUNDOS = float(os.getenv("ESPERA_PRIORIDAD_SEGUNDOS", "0.3"))
+
+
+# CONTROL DE ADMISIÓN
+
+# Solicitudes simultáneas por worker en rutas de inferencia (/predecir, /analisis/subir)
+LIMITE_INFERENCIA_EN_CURSO = int(os.getenv("LIMITE_INFERENCIA_EN_CURSO", "8"))
+
+# Solicitudes simultáneas por worker en /trabajos/analisis (lectura de la imagen y encolado)
+LIMITE_CARGA_EN_CURSO = int(os.getenv("LIMITE_CARGA_EN_CURSO", "8"))
+
+# Streams SSE abiertos por worker (/trabajos/{id}/eventos)
+LIMITE_EVENTOS_EN_CURSO = int(os.getenv("LIMITE_EVENTOS_EN_CURSO", "256"))
+
+# Solicitudes simultáneas por worker en el resto de rutas
+LIMITE_GENERAL_EN_CURSO = int(os.getenv("LIMITE_GENERAL_EN_CURSO", "64"))
+
+# Solicitudes que pueden esperar un cupo por grupo (más allá se responde 503 de inmediato)
+COLA_INFERENCIA_EN_ESPERA = int(os.getenv("COLA_INFERENCIA_EN_ESPERA", "16"))
+COLA_CARGA_EN_ESPERA = int(os.getenv("COLA_CARGA_EN_ESPERA", "16"))
+COLA_GENERAL_EN_ESPERA = int(os.getenv("COLA_GENERAL_EN_ESPERA", "64"))
+
+# Segundos máximos esperando un cupo antes de responder 503
+ESPERA_MAXIMA_ADMISION = float(os.getenv("ESPERA_MAXIMA_ADMISION", "2.0"))
+
+# Valor de la cabecera Retry-After (segundos) en respuestas 503
+RETRY_AFTER_SEGUNDOS = int(os.getenv("RETRY_AFTER_SEGUNDOS", "2"))
+
+
+# LÍMITE DE TASA (TOKEN BUCKET)
+
+def _leer_limite(nombre: str, por_defecto: str):
+    """Leer un límite con formato "rafaga,por_minuto" (ej. "10,12")"""
+    rafaga, por_minuto = os.getenv(nombre, por_defecto).split(",")
+    return float(rafaga), float(por_minuto) / 60.0
+
+
+# (capacidad de ráfaga, tokens repuestos por segundo) por grupo de rutas
+LIMITES_TASA = {
+    "prediccion": _leer_limite("LIMITE_TASA_PREDICCION", "10,12"),
+    "auth": _leer_limite("LIMITE_TASA_AUTH", "5,5"),
+    "general": _leer_limite("LIMITE_TASA_GENERAL", "120,120"),
+}
+
+# Archivo compartido (mmap) con el estado de las cubetas de todos los workers del host
+RUTA_ESTADO_LIMITE_TASA = os.getenv(
+    "RUTA_ESTADO_LIMITE_TASA",
+    os.path.join(tempfile.gettempdir(), "neumonitor_limite_tasa.bin")
+)
+
+# Usar la primera IP de X-Forwarded-For (solo detrás de un proxy de confianza)
+CONFIAR_X_FORWARDED_FOR = os.getenv("CONFIAR_X_FORWARDED_FOR", "false").lower() == "true"
+
+
+# REGISTRO DE MODELOS
+
+# Directorio con las versiones del modelo (<version>/modelo.keras) y manifiesto.json
+DIRECTORIO_MODELOS = os.getenv(
+    "DIRECTORIO_MODELOS",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "modelos")
+)
+
+# Segundos entre revisiones del manifiesto para adoptar la versión activa en cada worker
+INTERVALO_SINCRONIZACION_MODELO = int(os.getenv("INTERVALO_SINCRONIZACION_MODELO", "30"))
+
+# Token requerido en la cabecera X-Admin-Token para los endpoints de administración
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+# EVALUACIÓN EN SOMBRA
+
+# Versión candidata del registro evaluada en sombra (vacío = desactivado)
+VERSION_SOMBRA = os.getenv("VERSION_SOMBRA", "")
+
+# Fracción de imágenes de /predecir que también evalúa la versión candidata
+FRACCION_SOMBRA = float(os.getenv("FRACCION_SOMBRA", "0.1"))
+
+# Imágenes pendientes como máximo; si la cola está llena la muestra se descarta
+MAX_COLA_SOMBRA = int(os.getenv("MAX_COLA_SOMBRA", "16"))
+
+# Hilos del intérprete TFLite de la candidata (pool propio, separado del de TensorFlow)
+HILOS_SOMBRA = int(os.getenv("HILOS_SOMBRA", "1"))
+
+# Archivo JSONL con cada comparación (principal vs candidata)
+RUTA_REGISTRO_SOMBRA = os.getenv(
+    "RUTA_REGISTRO_SOMBRA",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "modelos", "sombra.jsonl")
+)
+
+
+# TEST-TIME AUGMENTATION (TTA)
+
+# Reevaluar con variantes (volteo, recortes) solo las predicciones dudosas
+TTA_ACTIVO = os.getenv("TTA_ACTIVO", "false").lower() == "true"
+
+# Probabilidad máxima de la salida del modelo por debajo de la cual se aplica TTA
+UMBRAL_CONFIANZA_TTA = float(os.getenv("UMBRAL_CONFIANZA_TTA", "0.80"))
+
+
+# CASCADA DE MODELOS
+
+# Versión registrada del modelo rápido de primera etapa (vacío = cascada desactivada)
+VERSION_CASCADA_RAPIDA = os.getenv("VERSION_CASCADA_RAPIDA", "")
+
+# Umbral de confianza del modelo rápido; si no se define se usa el calibrado
+# guardado en el manifiesto (umbral_cascada) para esa versión
+UMBRAL_CASCADA = os.getenv("UMBRAL_CASCADA")
+
+
+# AUTOAJUSTE DE CPU
+
+# Hilos de TensorFlow, oneDNN y micro-lote elegidos por herramientas/autoajuste_cpu.py
+RUTA_CONFIG_CPU = os.getenv("RUTA_CONFIG_CPU", os.path.join(DIRECTORIO_MODELOS, "config_cpu.json"))
+
+
+# RESILIENCIA DE SUPABASE
+
+# Timeouts por tipo de operación (segundos)
+TIMEOUT_SUPABASE_CONSULTA = float(os.getenv("TIMEOUT_SUPABASE_CONSULTA", "3"))
+TIMEOUT_SUPABASE_ESCRITURA = float(os.getenv("TIMEOUT_SUPABASE_ESCRITURA", "5"))
+TIMEOUT_SUPABASE_STORAGE = float(os.getenv("TIMEOUT_SUPABASE_STORAGE", "10"))
+
+# Reintentos de operaciones idempotentes y espera base del backoff (segundos)
+REINTENTOS_SUPABASE = int(os.getenv("REINTENTOS_SUPABASE", "2"))
+ESPERA_BASE_REINTENTO = float(os.getenv("ESPERA_BASE_REINTENTO", "0.2"))
+
+# Fallos consecutivos que abren el circuito y tiempo que permanece abierto
+UMBRAL_FALLOS_CIRCUITO = int(os.getenv("UMBRAL_FALLOS_CIRCUITO", "5"))
+SEGUNDOS_CIRCUITO_ABIERTO = float(os.getenv("SEGUNDOS_CIRCUITO_ABIERTO", "30"))
+
+
+# SONDEO DE SALUD
+
+# Cada cuántos segundos se verifican BD y storage en segundo plano para /salud
+INTERVALO_SONDEO_SALUD = int(os.getenv("INTERVALO_SONDEO_SALUD", "15"))
+
+# Tiempo máximo de cada verificación (segundos)
+TIMEOUT_SONDEO_SALUD = float(os.getenv("TIMEOUT_SONDEO_SALUD", "3"))
+
+
+# COMPRESIÓN DE RESPUESTAS
+
+# Tamaño mínimo del cuerpo (bytes) para comprimir; por debajo no compensa el costo
+UMBRAL_COMPRESION = int(os.getenv("UMBRAL_COMPRESION", "1024"))
+
+# Niveles de compresión: gzip 1-9, brotli 0-11 (valores medios: buena razón sin costo alto de CPU)
+NIVEL_GZIP = int(os.getenv("NIVEL_GZIP", "6"))
+NIVEL_BROTLI = int(os.getenv("NIVEL_BROTLI", "4"))
+
+
+# GET CONDICIONALES (ETAG)
+
+# Responder 304 a GET condicionales. Las versiones viven en un archivo local del
+# host: con varios hosts detrás del balanceador una escritura en uno no invalida
+# los ETag de los otros, así que debe desactivarse (false)
+GET_CONDICIONALES = os.getenv("GET_CONDICIONALES", "true").lower() == "true"
+
+# Archivo compartido (mmap) con la versión de historial/perfil de cada persona
+RUTA_VERSIONES_PERSONA = os.getenv(
+    "RUTA_VERSIONES_PERSONA",
+    os.path.join(tempfile.gettempdir(), "neumonitor_versiones_persona.bin")
+)
+
+# Ranuras del archivo; personas distintas en la misma ranura se desalojan (solo pierden el 304)
+RANURAS_VERSIONES_PERSONA = int(os.getenv("RANURAS_VERSIONES_PERSONA", "65536"))
+
+
+# TRABAJOS ASÍNCRONOS
+
+# Directorio con la cola SQLite (trabajos.sqlite3) y las imágenes pendientes
+DIRECTORIO_TRABAJOS = os.getenv(
+    "DIRECTORIO_TRABAJOS",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "trabajos")
+)
+
+# Procesos de trabajador.py (cada uno carga el modelo una vez) y trabajos simultáneos por proceso
+PROCESOS_TRABAJADOR = int(os.getenv("PROCESOS_TRABAJADOR", "1"))
+CONCURRENCIA_TRABAJADOR = int(os.getenv("CONCURRENCIA_TRABAJADOR", "4"))
+
+# Trabajos pendientes como máximo; por encima POST /trabajos responde 503
+MAX_TRABAJOS_PENDIENTES = int(os.getenv("MAX_TRABAJOS_PENDIENTES", "200"))
+
+# Segundos sin avance tras los cuales un trabajo en proceso se reasigna (trabajador caído)
+SEGUNDOS_CONCESION_TRABAJO = float(os.getenv("SEGUNDOS_CONCESION_TRABAJO", "120"))
+
+# Intentos por trabajo ante caídas del trabajador o de Supabase
+MAX_INTENTOS_TRABAJO = int(os.getenv("MAX_INTENTOS_TRABAJO", "3"))
+
+# Horas que se conservan los trabajos terminados para consultar su resultado
+RETENCION_TRABAJOS_HORAS = float(os.getenv("RETENCION_TRABAJOS_HORAS", "24"))
+
+# Espera del trabajador con la cola vacía y del stream SSE entre consultas (segundos)
+INTERVALO_SONDEO_TRABAJOS = float(os.getenv("INTERVALO_SONDEO_TRABAJOS", "0.25"))
+INTERVALO_EVENTOS_TRABAJO = float(os.getenv("INTERVALO_EVENTOS_TRABAJO", "0.5"))
+
+# Duración máxima de un stream SSE (ocupa un cupo de admisión mientras está abierto)
+DURACION_MAXIMA_EVENTOS = float(os.getenv("DURACION_MAXIMA_EVENTOS", "120"))
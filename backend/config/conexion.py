@@ -1,9 +1,11 @@
 #backend/config/conexion.py
 import os
-from supabase import create_client
+from supabase import create_client, ClientOptions
 from dotenv import load_dotenv
 import logging
 
+from config.ajustes import TIMEOUT_SUPABASE_ESCRITURA, TIMEOUT_SUPABASE_STORAGE
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -15,11 +17,19 @@ if not SUPABASE_URL or not SUPABASE_ANON_KEY:
     logging.error("SUPABASE_URL o SUPABASE_ANON_KEY no configuradas")
     raise ValueError("Variables de entorno de Supabase no configuradas")
 
-# Cliente público (sin pasar dict de opciones)
-supabase = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+# Timeouts HTTP del cliente: acotan también los hilos que quedan en curso
+# cuando servicios/resiliencia.py abandona una llamada por timeout
+def _opciones():
+    return ClientOptions(
+        postgrest_client_timeout=TIMEOUT_SUPABASE_ESCRITURA,
+        storage_client_timeout=TIMEOUT_SUPABASE_STORAGE,
+    )
+
+# Cliente público
+supabase = create_client(SUPABASE_URL, SUPABASE_ANON_KEY, options=_opciones())
 
 # Cliente admin
-supabase_admin = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+supabase_admin = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY, options=_opciones())
 
 # Funciones de utilidad
 def get_supabase():
@@ -27,24 +37,24 @@ def get_supabase():
 
 def get_supabase_admin():
     return supabase_admin
-async def verificar_conexion():
-    """Verificar conexión a Supabase"""
+def verificar_conexion():
+    """Verificar conexión a Supabase (bloqueante: usar desde un hilo)"""
     try:
         response = supabase.table("persona").select("id").limit(1).execute()
         if hasattr(response, "error") and response.error:
             logging.warning(f"Error inicial al consultar tabla persona: {response.error}")
         else:
-            logging.info("Conexión a Supabase establecida correctamente")
+            logging.debug("Conexión a Supabase establecida correctamente")
         return True
     except Exception as e:
         logging.error(f"Error conectando a Supabase: {str(e)}")
         return False
 
-async def verificar_storage():
-    """Verificar acceso a Storage"""
+def verificar_storage():
+    """Verificar acceso a Storage (bloqueante: usar desde un hilo)"""
     try:
         buckets = supabase.storage.list_buckets()
-        logging.info("Storage verificado correctamente")
+        logging.debug("Storage verificado correctamente")
         return True
     except Exception as e:
         logging.error(f"Error verificando storage: {str(e)}")
@@ -1,15 +1,20 @@
 # backend/controladores/analisisController.py
 
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Request
+import asyncio
+import time
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Request, BackgroundTasks
+from config.ajustes import TTL_VULNERABILIDAD_SEGUNDOS, ESPERA_PRIORIDAD_SEGUNDOS
 from config.conexion import get_supabase, get_supabase_admin
-from PIL import Image
-import io
 import uuid
 from datetime import datetime
-import numpy as np
-from tensorflow import keras
-import tensorflow as tf
-from trayendo_modelo import model as modelo
+from servicios.carga_imagen import leer_imagen_limitada
+from servicios.almacenamiento import subir_radiografia
+from servicios.derivados import generar_derivados, subir_derivados
+from servicios.estadisticas import agregados
+from servicios.registro_modelos import registro_modelos
+from servicios.inferencia import cola_inferencia, imagen_a_lote, interpretar_prediccion
+from servicios.resiliencia import llamar_supabase
+from servicios.versiones_persona import versiones_persona
 
 router = APIRouter(prefix="/analisis", tags=["Análisis"])
 
@@ -23,12 +28,12 @@ async def obtener_informacion_vulnerabilidad(persona_id: str, supabase):
     Esta información es INDEPENDIENTE del diagnóstico de la radiografía.
     """
     try:
-        response = (
+        response = await llamar_supabase("consulta", lambda: (
             supabase.table("perfil_salud")
             .select("*")
             .eq("persona_id", persona_id)
             .execute()
-        )
+        ))
         
         if response.data and len(response.data) > 0:
             perfil = response.data[0]
@@ -56,6 +61,54 @@ async def obtener_informacion_vulnerabilidad(persona_id: str, supabase):
         }
 
 
+# Perfiles de salud consultados recientemente: persona_id -> (vence, información)
+_vulnerabilidad_reciente = {}
+MAX_VULNERABILIDAD_RECIENTE = 4096
+
+
+async def obtener_vulnerabilidad_reciente(persona_id: str, supabase):
+    """
+    obtener_informacion_vulnerabilidad reutilizando por TTL_VULNERABILIDAD_SEGUNDOS
+    la última consulta exitosa de la persona (los errores no se guardan)
+    """
+    ahora = time.monotonic()
+    entrada = _vulnerabilidad_reciente.get(persona_id)
+    if entrada and entrada[0] > ahora:
+        return entrada[1]
+
+    info = await obtener_informacion_vulnerabilidad(persona_id, supabase)
+    if info["nivel_vulnerabilidad"] != "ERROR":
+        if len(_vulnerabilidad_reciente) >= MAX_VULNERABILIDAD_RECIENTE:
+            for clave in [c for c, (vence, _) in _vulnerabilidad_reciente.items() if vence <= ahora]:
+                del _vulnerabilidad_reciente[clave]
+            if len(_vulnerabilidad_reciente) >= MAX_VULNERABILIDAD_RECIENTE:
+                _vulnerabilidad_reciente.clear()
+        _vulnerabilidad_reciente[persona_id] = (ahora + TTL_VULNERABILIDAD_SEGUNDOS, info)
+    return info
+
+
+def consultar_vulnerabilidad(persona_id: str, supabase) -> asyncio.Task:
+    """
+    Iniciar la consulta del perfil de salud sin esperarla, para solaparla con
+    la decodificación de la imagen. El mismo resultado se usa después para la
+    explicación y el registro (el perfil se consulta una sola vez).
+    """
+    return asyncio.create_task(obtener_vulnerabilidad_reciente(persona_id, supabase))
+
+
+async def prioridad_de(consulta: asyncio.Task) -> str:
+    """
+    Prioridad en la cola de inferencia: la del perfil si llega en
+    ESPERA_PRIORIDAD_SEGUNDOS o MEDIA. La inferencia nunca espera los
+    reintentos de una BD lenta; la consulta sigue y se usa después.
+    """
+    try:
+        info = await asyncio.wait_for(asyncio.shield(consulta), ESPERA_PRIORIDAD_SEGUNDOS)
+    except asyncio.TimeoutError:
+        return "MEDIA"
+    return info["prioridad_atencion"]
+
+
 
 # FUNCIÓN: GENERAR EXPLICACIÓN DEL ANÁLISIS
 
@@ -235,56 +288,47 @@ se ajusta considerando el perfil del paciente.
 @router.post("/subir")
 async def subir_analisis(
     imagen: UploadFile = File(...),
-    request: Request = None
+    request: Request = None,
+    background_tasks: BackgroundTasks = None
 ):
     """
     Endpoint para subir análisis para usuarios autenticados.
     Incluye diagnóstico + información de vulnerabilidad del perfil.
     """
-    if modelo is None:
+    if not registro_modelos.disponible:
         raise HTTPException(status_code=500, detail="Modelo no disponible")
 
     if not hasattr(request.state, 'persona') or not request.state.persona:
         raise HTTPException(status_code=401, detail="Usuario no autenticado")
 
+    # Validar tamaño y dimensiones sin cargar la imagen completa en memoria
+    imagen_cargada = leer_imagen_limitada(imagen)
+
     try:
         persona_id = request.state.persona["id"]
-        contenido = await imagen.read()
+        supabase_admin = get_supabase_admin()
+
+        # Vulnerabilidad (define la prioridad en la cola de inferencia), en paralelo con la decodificación
+        consulta_vulnerabilidad = consultar_vulnerabilidad(persona_id, supabase_admin)
         
         # Procesar imagen
-        img = Image.open(io.BytesIO(contenido)).convert("RGB").resize((224, 224))
-        arr = keras.preprocessing.image.img_to_array(img)
-        arr = np.expand_dims(arr, axis=0)
+        img = await asyncio.to_thread(imagen_cargada.decodificar)
 
         # Predicción
-        pred = modelo.predict(arr, verbose=0)[0]
-        prob = tf.nn.softmax(pred).numpy()
-        
-        clases = ["NORMAL", "PNEUMONIA"]
-        idx = int(np.argmax(prob))
-
-        diagnostico = clases[idx]
-        confianza = round(float(prob[idx] * 100), 2)
-        probabilidades = {
-            "normal": float(prob[0]),
-            "neumonia": float(prob[1]),
-        }
+        prob, version_modelo = await cola_inferencia.predecir(imagen_a_lote(img), await prioridad_de(consulta_vulnerabilidad))
+        vulnerabilidad_info = await consulta_vulnerabilidad
+        prediccion = interpretar_prediccion(prob)
 
-        # Subir a storage
-        supabase_admin = get_supabase_admin()
-        nombre_archivo = f"{persona_id}/{uuid.uuid4()}.jpg"
-        
-        supabase_admin.storage.from_("radiografias").upload(
-            nombre_archivo,
-            contenido,
-            {"content-type": imagen.content_type},
-        )
-        
-        url = supabase_admin.storage.from_("radiografias").get_public_url(nombre_archivo)
+        diagnostico = prediccion["diagnostico"]
+        confianza = prediccion["confianza"]
+        probabilidades = prediccion["probabilidades"]
+
+        # Subir a storage (direccionada por contenido: un duplicado reutiliza el objeto existente)
+        nombre_archivo, url, duplicada = await subir_radiografia(supabase_admin, persona_id, imagen_cargada)
+
+        # Miniatura y vista previa WebP para listados (se generan en un hilo y se suben en segundo plano)
+        derivados = None if duplicada else await asyncio.to_thread(generar_derivados, imagen_cargada)
 
-        # Obtener vulnerabilidad
-        vulnerabilidad_info = await obtener_informacion_vulnerabilidad(persona_id, supabase_admin)
-        
         # Generar explicación
         explicacion_info = generar_explicacion_analisis(
             diagnostico,
@@ -293,13 +337,15 @@ async def subir_analisis(
         )
 
         # Guardar en BD
+        analisis_id = str(uuid.uuid4())
         analisis_data = {
-            "id": str(uuid.uuid4()),
+            "id": analisis_id,
             "persona_id": persona_id,
             "imagen_url": url,
             "diagnostico": diagnostico,
             "confianza": confianza,
             "probabilidades": probabilidades,
+            "version_modelo": version_modelo,
             "fecha": datetime.now().isoformat(),
             "nivel_vulnerabilidad_paciente": vulnerabilidad_info["nivel_vulnerabilidad"],
             "prioridad_atencion_sugerida": vulnerabilidad_info["prioridad_atencion"],
@@ -307,7 +353,13 @@ async def subir_analisis(
             "detalles_analisis": explicacion_info["explicacion_detallada"]
         }
 
-        supabase_admin.table("analisis_radiografias").insert(analisis_data).execute()
+        try:
+            await llamar_supabase("escritura", lambda: supabase_admin.table("analisis_radiografias").insert(analisis_data).execute())
+        finally:
+            # También si falla: un timeout no garantiza que la escritura no se aplicara
+            versiones_persona.incrementar(persona_id)
+        agregados.registrar(analisis_data)
+        background_tasks.add_task(subir_derivados, analisis_id, nombre_archivo, derivados)
 
         return {
             "success": True,
@@ -315,6 +367,7 @@ async def subir_analisis(
                 "diagnostico": diagnostico,
                 "confianza": confianza,
                 "probabilidades": probabilidades,
+                "version_modelo": version_modelo,
                 "vulnerabilidad": {
                     "nivel": vulnerabilidad_info["nivel_vulnerabilidad"],
                     "prioridad": vulnerabilidad_info["prioridad_atencion"],
@@ -328,9 +381,13 @@ async def subir_analisis(
             "message": "Análisis completado y guardado exitosamente"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error en subir_analisis: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        imagen_cargada.cerrar()
 
 
 
@@ -346,19 +403,21 @@ async def obtener_historial(request: Request):
         persona_id = request.state.persona["id"]
         supabase = get_supabase()
         
-        response = (
+        response = await llamar_supabase("consulta", lambda: (
             supabase.table("analisis_radiografias")
             .select("*")
             .eq("persona_id", persona_id)
             .order("fecha", desc=True)
             .execute()
-        )
+        ))
 
         return {
             "success": True,
             "data": response.data
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -376,12 +435,12 @@ async def obtener_perfil_salud(request: Request):
         persona_id = request.state.persona["id"]
         supabase = get_supabase()
         
-        response = (
+        response = await llamar_supabase("consulta", lambda: (
             supabase.table("perfil_salud")
             .select("*")
             .eq("persona_id", persona_id)
             .execute()
-        )
+        ))
 
         if not response.data:
             return {
@@ -396,5 +455,7 @@ async def obtener_perfil_salud(request: Request):
             "datos": response.data[0]
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
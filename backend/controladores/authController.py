@@ -6,6 +6,8 @@ import logging
 import hashlib
 from datetime import datetime, date
 from config.conexion import get_supabase, get_supabase_admin
+from servicios.resiliencia import llamar_supabase
+from servicios.versiones_persona import versiones_persona
 import uuid
 
 router = APIRouter(prefix="/auth", tags=["Autenticación"])
@@ -120,7 +122,7 @@ async def login(request: LoginRequest):
         supabase = get_supabase()
         
         # Buscar persona por email
-        response = supabase.table("persona").select("*").eq("email", request.email).execute()
+        response = await llamar_supabase("consulta", lambda: supabase.table("persona").select("*").eq("email", request.email).execute())
 
         if hasattr(response, 'error') and response.error:
             logging.error(f"Error buscando usuario: {response.error.message}")
@@ -183,7 +185,7 @@ async def registro(request: RegisterRequest):
         supabase = get_supabase_admin()
         
         # Verificar si el email ya existe
-        check_response = supabase.table("persona").select("email").eq("email", request.email).execute()
+        check_response = await llamar_supabase("consulta", lambda: supabase.table("persona").select("email").eq("email", request.email).execute())
         
         if check_response.data and len(check_response.data) > 0:
             raise HTTPException(
@@ -210,7 +212,7 @@ async def registro(request: RegisterRequest):
         }
         
         # Insertar persona
-        insert_response = supabase.table("persona").insert(persona_data).execute()
+        insert_response = await llamar_supabase("escritura", lambda: supabase.table("persona").insert(persona_data).execute())
         
         if hasattr(insert_response, 'error') and insert_response.error:
             raise HTTPException(
@@ -241,7 +243,7 @@ async def registro(request: RegisterRequest):
         }
         
         # Insertar perfil de salud
-        perfil_response = supabase.table("perfil_salud").insert(perfil_salud_data).execute()
+        perfil_response = await llamar_supabase("escritura", lambda: supabase.table("perfil_salud").insert(perfil_salud_data).execute())
         
         if hasattr(perfil_response, 'error') and perfil_response.error:
             logging.warning(f"Error creando perfil salud: {perfil_response.error.message}")
@@ -317,7 +319,7 @@ async def recuperar_password(request: RecuperarPasswordRequest):
             )
         
         # Buscar persona por email sin usar .single()
-        response = supabase.table("persona").select("id, email, nombre_completo").eq("email", request.email).execute()
+        response = await llamar_supabase("consulta", lambda: supabase.table("persona").select("id, email, nombre_completo").eq("email", request.email).execute())
         
         if hasattr(response, 'error') and response.error:
             logging.error(f"Error buscando usuario para recuperación: {response.error.message}")
@@ -341,10 +343,14 @@ async def recuperar_password(request: RecuperarPasswordRequest):
         hashed_password = hash_password(request.nueva_password)
         
         # Actualizar contraseña en la base de datos
-        update_response = supabase.table("persona").update({
-            "contrasenha": hashed_password,
-            "fecha_actualizacion": datetime.now().isoformat()
-        }).eq("id", persona_id).execute()
+        try:
+            update_response = await llamar_supabase("escritura", lambda: supabase.table("persona").update({
+                "contrasenha": hashed_password,
+                "fecha_actualizacion": datetime.now().isoformat()
+            }).eq("id", persona_id).execute())
+        finally:
+            # fecha_actualizacion forma parte de /persona/perfil
+            versiones_persona.incrementar(persona_id)
         
         if hasattr(update_response, 'error') and update_response.error:
             raise HTTPException(
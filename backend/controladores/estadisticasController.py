@@ -0,0 +1,24 @@
+# backend/controladores/estadisticasController.py
+from fastapi import APIRouter, Depends, Query
+
+from config.ajustes import DIAS_ESTADISTICAS
+from controladores.modelosController import verificar_admin
+from servicios.estadisticas import agregados
+
+router = APIRouter(prefix="/estadisticas", tags=["Estadísticas"])
+
+
+
+# ENDPOINT: ESTADÍSTICAS AGREGADAS
+
+# Solo administración: son agregados de todos los pacientes
+@router.get("", dependencies=[Depends(verificar_admin)])
+async def obtener_estadisticas(dias: int = Query(DIAS_ESTADISTICAS, ge=0, le=366)):
+    """
+    Estadísticas operativas precalculadas (no consulta la BD):
+    análisis por día, tasa de neumonía y distribución por vulnerabilidad y prioridad.
+    """
+    return {
+        "success": True,
+        "data": agregados.resumen(dias)
+    }
@@ -0,0 +1,77 @@
+# backend/controladores/modelosController.py
+import hmac
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException
+
+from config.ajustes import ADMIN_TOKEN
+from servicios.registro_modelos import leer_manifiesto, registro_modelos
+from servicios.evaluacion_sombra import evaluador_sombra
+from servicios.inferencia import cola_inferencia
+
+router = APIRouter(prefix="/admin/modelos", tags=["Administración de modelos"])
+
+
+# Dependencia: solo con X-Admin-Token válido
+async def verificar_admin(x_admin_token: str = Header(None)):
+    """Verificar el token de administración"""
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="No autorizado")
+
+
+
+# ENDPOINT: LISTAR VERSIONES
+
+@router.get("", dependencies=[Depends(verificar_admin)])
+async def listar_modelos():
+    """Versiones registradas, versión activa en este worker y estado de la última carga"""
+    return {
+        "success": True,
+        "data": {
+            "manifiesto": leer_manifiesto(),
+            "version_activa": registro_modelos.version_activa,
+            "estado_carga": registro_modelos.estado_carga,
+        }
+    }
+
+
+
+# ENDPOINT: ACTIVAR VERSIÓN
+
+@router.post("/{version}/activar", status_code=202, dependencies=[Depends(verificar_admin)])
+async def activar_modelo(version: str, background_tasks: BackgroundTasks):
+    """
+    Carga y calienta la versión en segundo plano y luego la activa.
+    Las solicitudes en curso terminan con la versión anterior.
+    El resto de workers la adoptan al leer el manifiesto.
+    """
+    if version not in leer_manifiesto()["versiones"]:
+        raise HTTPException(status_code=404, detail="Versión no registrada")
+
+    if registro_modelos.cargando:
+        raise HTTPException(status_code=409, detail="Ya hay una carga de modelo en curso")
+
+    background_tasks.add_task(registro_modelos.cargar_y_activar, version)
+
+    return {
+        "success": True,
+        "message": f"Cargando versión {version}",
+        "data": {"version_activa": registro_modelos.version_activa}
+    }
+
+
+
+# ENDPOINT: EVALUACIÓN EN SOMBRA
+
+@router.get("/sombra", dependencies=[Depends(verificar_admin)])
+async def resultados_sombra():
+    """Comparación de la versión candidata contra la activa sobre tráfico real"""
+    metricas_cola = cola_inferencia.metricas()
+    return {
+        "success": True,
+        "data": {
+            **evaluador_sombra.resumen(),
+            "version_principal": registro_modelos.version_activa,
+            "latencia_principal_p50_ms": metricas_cola["latencia_modelo_p50_ms"],
+            "latencia_principal_p95_ms": metricas_cola["latencia_modelo_p95_ms"],
+        }
+    }
@@ -6,6 +6,8 @@ import logging
 import hashlib
 from middleware.auth import AuthMiddleware, security
 from config.conexion import get_supabase
+from servicios.resiliencia import llamar_supabase
+from servicios.versiones_persona import versiones_persona
 from datetime import datetime
 
 router = APIRouter(prefix="/persona", tags=["Persona"])
@@ -82,7 +84,11 @@ async def actualizar_perfil(request: Request, update_data: UpdatePersonaRequest)
         update_fields["fecha_actualizacion"] = datetime.now().isoformat()
         
         # Actualizar en Supabase
-        response = supabase.table("persona").update(update_fields).eq("id", persona_id).execute()
+        try:
+            response = await llamar_supabase("escritura", lambda: supabase.table("persona").update(update_fields).eq("id", persona_id).execute())
+        finally:
+            # También si falla: un timeout no garantiza que la escritura no se aplicara
+            versiones_persona.incrementar(persona_id)
         
         if hasattr(response, 'error') and response.error:
             raise HTTPException(
@@ -133,7 +139,7 @@ async def cambiar_contrasena(request: Request, password_data: ChangePasswordRequ
         supabase = get_supabase()
         
         # Obtener la persona actual para verificar contrasenha
-        response = supabase.table("persona").select("*").eq("id", persona_id).single().execute()
+        response = await llamar_supabase("consulta", lambda: supabase.table("persona").select("*").eq("id", persona_id).single().execute())
         
         if hasattr(response, 'error') or not response.data:
             raise HTTPException(
@@ -155,10 +161,14 @@ async def cambiar_contrasena(request: Request, password_data: ChangePasswordRequ
         new_hashed = hash_password(password_data.new_password)
         
         # Actualizar contrasenha
-        update_response = supabase.table("persona").update({
-            "contrasenha": new_hashed,
-            "fecha_actualizacion": datetime.now().isoformat()
-        }).eq("id", persona_id).execute()
+        try:
+            update_response = await llamar_supabase("escritura", lambda: supabase.table("persona").update({
+                "contrasenha": new_hashed,
+                "fecha_actualizacion": datetime.now().isoformat()
+            }).eq("id", persona_id).execute())
+        finally:
+            # fecha_actualizacion forma parte de /persona/perfil
+            versiones_persona.incrementar(persona_id)
         
         if hasattr(update_response, 'error') and update_response.error:
             raise HTTPException(
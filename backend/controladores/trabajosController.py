@@ -0,0 +1,165 @@
+# backend/controladores/trabajosController.py
+import asyncio
+import time
+
+from fastapi import APIRouter, File, UploadFile, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from config.ajustes import (
+    MAX_TRABAJOS_PENDIENTES,
+    RETRY_AFTER_SEGUNDOS,
+    INTERVALO_EVENTOS_TRABAJO,
+    DURACION_MAXIMA_EVENTOS
+)
+from config.conexion import get_supabase_admin
+from controladores.analisisController import consultar_vulnerabilidad, prioridad_de
+from servicios.carga_imagen import leer_imagen_limitada
+from servicios.respuestas import serializar_json
+from servicios.trabajos import cola_trabajos, vista_trabajo, TERMINADOS
+
+router = APIRouter(prefix="/trabajos", tags=["Trabajos asíncronos"])
+
+# Comentario SSE enviado sin cambios para que los proxies no cierren la conexión
+SEGUNDOS_LATIDO_EVENTOS = 15
+
+
+
+# ENDPOINT: ENCOLAR ANÁLISIS
+
+@router.post("/analisis", status_code=202)
+async def encolar_analisis(imagen: UploadFile = File(...), request: Request = None):
+    """
+    Encolar un análisis y responder de inmediato con el id del trabajo.
+    Lo procesa trabajador.py: con sesión, igual que /predecir autenticado
+    (diagnóstico, vulnerabilidad y registro en el historial); sin sesión,
+    solo el diagnóstico. El id del trabajo da acceso a su resultado.
+    """
+    if imagen.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
+        raise HTTPException(status_code=400, detail="Formato no soportado")
+
+    # Mismas validaciones de tamaño y dimensiones que /predecir
+    imagen_cargada = leer_imagen_limitada(imagen)
+    try:
+        if await asyncio.to_thread(cola_trabajos.pendientes) >= MAX_TRABAJOS_PENDIENTES:
+            raise HTTPException(
+                status_code=503,
+                detail="Cola de análisis llena, intente nuevamente en unos segundos",
+                headers={"Retry-After": str(RETRY_AFTER_SEGUNDOS)},
+            )
+
+        # Misma prioridad que /predecir en la cola de inferencia (nivel del perfil de salud,
+        # en caché o con espera acotada: si la BD no responde a tiempo, MEDIA)
+        persona = getattr(request.state, "persona", None)
+        prioridad = "ANONIMA"
+        if persona:
+            prioridad = await prioridad_de(consultar_vulnerabilidad(persona["id"], get_supabase_admin()))
+
+        trabajo_id = await asyncio.to_thread(
+            cola_trabajos.encolar,
+            imagen_cargada.archivo,
+            imagen_cargada.tamano,
+            imagen_cargada.content_type,
+            imagen_cargada.dimensiones,
+            persona["id"] if persona else None,
+            prioridad,
+        )
+    finally:
+        imagen_cargada.cerrar()
+
+    return {
+        "success": True,
+        "data": {
+            "trabajo_id": trabajo_id,
+            "estado": "pendiente",
+            "autenticado": bool(persona),
+            "url_estado": f"/trabajos/{trabajo_id}",
+            "url_eventos": f"/trabajos/{trabajo_id}/eventos",
+        }
+    }
+
+
+
+def es_del_solicitante(trabajo: dict, request: Request) -> bool:
+    """
+    Un trabajo con persona incluye su vulnerabilidad y su historial: solo lo
+    ve esa persona (sesión en Authorization). Los anónimos, quien tenga el id.
+    """
+    if not trabajo["persona_id"]:
+        return True
+    persona = getattr(request.state, "persona", None)
+    return bool(persona) and persona["id"] == trabajo["persona_id"]
+
+
+
+# ENDPOINT: CONSULTAR TRABAJO
+
+@router.get("/{trabajo_id}")
+async def obtener_trabajo(trabajo_id: str, request: Request):
+    """
+    Estado, progreso y, si terminó, resultado del trabajo (consulta periódica).
+    Un trabajo de otra persona responde 404, igual que uno inexistente.
+    """
+    trabajo = await asyncio.to_thread(cola_trabajos.obtener, trabajo_id)
+    if trabajo is None or not es_del_solicitante(trabajo, request):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+
+    return {
+        "success": True,
+        "data": vista_trabajo(trabajo)
+    }
+
+
+
+# ENDPOINT: EVENTOS DEL TRABAJO (SSE)
+
+@router.get("/{trabajo_id}/eventos")
+async def eventos_trabajo(trabajo_id: str, request: Request):
+    """
+    Progreso del trabajo como Server-Sent Events: un evento `progreso` por
+    cada cambio y un evento final `completado` o `error` con el resultado.
+    El stream se cierra a los DURACION_MAXIMA_EVENTOS segundos; EventSource
+    se reconecta solo y recibe el estado actual.
+    EventSource no envía Authorization: sin la sesión de la persona del
+    trabajo los eventos llevan solo el progreso (resultado null) y el
+    resultado se obtiene con GET /trabajos/{id} autenticado.
+    """
+    trabajo = await asyncio.to_thread(cola_trabajos.obtener, trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    con_resultado = es_del_solicitante(trabajo, request)
+
+    async def eventos():
+        inicio = ultimo_envio = time.monotonic()
+        anterior = None
+        yield "retry: 2000\n\n"
+        while True:
+            trabajo = await asyncio.to_thread(cola_trabajos.obtener, trabajo_id)
+            if trabajo is None:
+                # Purgado mientras se seguía el stream
+                yield "event: error\ndata: {\"detail\": \"Trabajo no encontrado\"}\n\n"
+                return
+
+            vista = vista_trabajo(trabajo)
+            if not con_resultado:
+                vista["resultado"] = None
+            estado = (vista["estado"], vista["progreso"], vista["etapa"])
+            if estado != anterior:
+                anterior = estado
+                ultimo_envio = time.monotonic()
+                evento = vista["estado"] if vista["estado"] in TERMINADOS else "progreso"
+                yield f"event: {evento}\ndata: {serializar_json(vista).decode('utf-8')}\n\n"
+                if vista["estado"] in TERMINADOS:
+                    return
+            elif time.monotonic() - ultimo_envio >= SEGUNDOS_LATIDO_EVENTOS:
+                ultimo_envio = time.monotonic()
+                yield ": latido\n\n"
+
+            if time.monotonic() - inicio >= DURACION_MAXIMA_EVENTOS or await request.is_disconnected():
+                return
+            await asyncio.sleep(INTERVALO_EVENTOS_TRABAJO)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,204 @@
+# Destilación de conocimiento: modelo estudiante compacto para CPU
+# Usa el modelo entrenado (modelo_neumonia_MobileNet.keras) como profesor y
+# entrena un estudiante más pequeño con sus probabilidades suavizadas (soft targets).
+#
+# Uso (desde backend/):
+#   python destilacion.py --estudiante mobilenet --alpha 0.35 --tamano 160
+#   python destilacion.py --estudiante cnn --tamano 128 --salida modelo_estudiante_cnn.keras
+import argparse
+import json
+import os
+
+import tensorflow as tf
+import keras
+from keras import layers, models, ops
+from tensorflow.keras.applications import MobileNetV2
+
+from herramientas.medicion import evaluar_directorio, latencia_media, metricas
+
+
+# PARÁMETROS
+
+parser = argparse.ArgumentParser(description="Destilación del modelo de neumonía a un estudiante compacto")
+parser.add_argument("--profesor", default="modelo_neumonia_MobileNet.keras")
+parser.add_argument("--estudiante", choices=["mobilenet", "cnn"], default="mobilenet")
+parser.add_argument("--alpha", type=float, default=0.35, help="Multiplicador de ancho (estudiante mobilenet)")
+parser.add_argument("--tamano", type=int, default=160, help="Resolución interna del estudiante")
+parser.add_argument("--temperatura", type=float, default=4.0)
+parser.add_argument("--peso-etiquetas", type=float, default=0.1,
+                    help="Peso de la pérdida con etiquetas reales (el resto es destilación)")
+parser.add_argument("--epocas", type=int, default=20)
+parser.add_argument("--salida", default="modelo_estudiante.keras")
+args = parser.parse_args()
+
+
+# CONFIGURACIÓN DE RUTAS DEL DATASET
+
+train_dir = r'../chest_xray/train'
+val_dir = r'../chest_xray/val'
+test_dir = r'../chest_xray/test'
+
+batch_size = 16
+
+
+# PROFESOR
+
+print("Cargando modelo profesor...")
+profesor = tf.keras.models.load_model(args.profesor)
+profesor.trainable = False
+_, img_height, img_width, _ = profesor.input_shape
+
+
+# CARGA DEL DATASET (a la resolución del profesor; el estudiante reescala internamente)
+
+train_ds = tf.keras.utils.image_dataset_from_directory(
+    train_dir, seed=123, label_mode='int',
+    image_size=(img_height, img_width), batch_size=batch_size, shuffle=True
+)
+val_ds = tf.keras.utils.image_dataset_from_directory(
+    val_dir, seed=123, label_mode='int',
+    image_size=(img_height, img_width), batch_size=batch_size, shuffle=False
+)
+num_classes = len(train_ds.class_names)
+
+# Mismo data augmentation que model.py, aplicado en el pipeline para que
+# profesor y estudiante vean exactamente la misma imagen aumentada
+data_augmentation = tf.keras.Sequential([
+    layers.RandomFlip("horizontal"),
+    layers.RandomRotation(0.2),
+    layers.RandomZoom(0.2),
+    layers.RandomContrast(0.25),
+    layers.RandomBrightness(0.25),
+    layers.RandomTranslation(0.1, 0.1),
+], name="data_augmentation")
+
+AUTOTUNE = tf.data.AUTOTUNE
+train_ds = (
+    train_ds.cache()
+    .shuffle(1000)
+    .map(lambda x, y: (data_augmentation(x, training=True), y), num_parallel_calls=AUTOTUNE)
+    .prefetch(AUTOTUNE)
+)
+val_ds = val_ds.cache().prefetch(AUTOTUNE)
+
+
+# ESTUDIANTE
+# Recibe la misma entrada que el profesor (img_height x img_width, píxeles 0-255)
+# para ser reemplazo directo en el servidor, pero trabaja a args.tamano.
+
+inputs = layers.Input(shape=(img_height, img_width, 3))
+x = layers.Resizing(args.tamano, args.tamano)(inputs)
+x = layers.Rescaling(1./255)(x)
+
+if args.estudiante == "mobilenet":
+    base = MobileNetV2(
+        input_shape=(args.tamano, args.tamano, 3),
+        alpha=args.alpha,
+        include_top=False,
+        weights="imagenet"
+    )
+    x = base(x)
+    x = layers.GlobalAveragePooling2D()(x)
+else:
+    # CNN pequeña con convoluciones separables
+    for filtros in [32, 64, 128, 256]:
+        x = layers.SeparableConv2D(filtros, 3, padding='same', use_bias=False)(x)
+        x = layers.BatchNormalization()(x)
+        x = layers.ReLU()(x)
+        x = layers.MaxPooling2D()(x)
+    x = layers.GlobalAveragePooling2D()(x)
+
+x = layers.Dropout(0.3)(x)
+logits = layers.Dense(num_classes, name='logits')(x)
+estudiante = models.Model(inputs, logits, name=f"estudiante_{args.estudiante}")
+
+
+# DESTILADOR
+
+class Destilador(keras.Model):
+    """Combina la pérdida con etiquetas reales y la pérdida de destilación (KL con temperatura)"""
+
+    def __init__(self, estudiante, profesor, temperatura, peso_etiquetas):
+        super().__init__()
+        self.estudiante = estudiante
+        self.profesor = profesor
+        self.temperatura = temperatura
+        self.peso_etiquetas = peso_etiquetas
+        self.perdida_etiquetas = keras.losses.SparseCategoricalCrossentropy(from_logits=True)
+        self.perdida_destilacion = keras.losses.KLDivergence()
+
+    def call(self, x):
+        return self.estudiante(x)
+
+    def compute_loss(self, x=None, y=None, y_pred=None, sample_weight=None, training=True):
+        # El profesor termina en softmax: log(p) equivale a sus logits salvo una constante
+        logits_profesor = ops.log(self.profesor(x, training=False) + 1e-7)
+        perdida_etiquetas = self.perdida_etiquetas(y, y_pred)
+        perdida_destilacion = self.perdida_destilacion(
+            ops.softmax(logits_profesor / self.temperatura, axis=1),
+            ops.softmax(y_pred / self.temperatura, axis=1),
+        ) * (self.temperatura ** 2)
+        return self.peso_etiquetas * perdida_etiquetas + (1 - self.peso_etiquetas) * perdida_destilacion
+
+
+destilador = Destilador(estudiante, profesor, args.temperatura, args.peso_etiquetas)
+destilador.compile(
+    optimizer=keras.optimizers.Adam(learning_rate=0.001),
+    metrics=[keras.metrics.SparseCategoricalAccuracy(name='accuracy')]
+)
+
+
+# ENTRENAMIENTO
+
+print("\n" + "="*60)
+print(f"DESTILACIÓN: estudiante {args.estudiante} a {args.tamano}px (T={args.temperatura})")
+print("="*60)
+
+destilador.fit(
+    train_ds,
+    validation_data=val_ds,
+    epochs=args.epocas,
+    callbacks=[
+        tf.keras.callbacks.EarlyStopping(monitor='val_accuracy', patience=5, restore_best_weights=True, verbose=1),
+        tf.keras.callbacks.ReduceLROnPlateau(monitor='val_loss', patience=3, factor=0.5, min_lr=1e-7, verbose=1),
+    ],
+    verbose=1
+)
+
+
+# MODELO FINAL (REEMPLAZO DIRECTO: SALIDA SOFTMAX COMO EL PROFESOR)
+
+outputs = layers.Activation('softmax', name='predictions')(estudiante.output)
+modelo_final = models.Model(estudiante.input, outputs, name=estudiante.name)
+modelo_final.save(args.salida)
+print(f"\nModelo estudiante guardado como '{args.salida}'")
+
+
+# REPORTE COMPARATIVO EN TEST SET
+
+print("\n" + "="*60)
+print("PROFESOR vs ESTUDIANTE (test set)")
+print("="*60)
+
+reporte = {}
+for nombre, modelo in [("profesor", profesor), ("estudiante", modelo_final)]:
+    preds, etiquetas, indice_neumonia = evaluar_directorio(modelo, test_dir)
+    acc, recall = metricas(preds, etiquetas, indice_neumonia)
+    reporte[nombre] = {
+        "accuracy": round(acc * 100, 2),
+        "recall_neumonia": round(recall * 100, 2),
+        "parametros": int(modelo.count_params()),
+        "latencia_cpu_ms": round(latencia_media(modelo) * 1000, 2),
+    }
+
+print(f"{'Modelo':<12}{'Acc (%)':>10}{'Recall N (%)':>14}{'Parámetros':>14}{'Lat. CPU (ms)':>15}")
+print("-" * 65)
+for nombre, r in reporte.items():
+    print(f"{nombre:<12}{r['accuracy']:>10.2f}{r['recall_neumonia']:>14.2f}"
+          f"{r['parametros']:>14,}{r['latencia_cpu_ms']:>15.2f}")
+
+reporte["configuracion"] = vars(args)
+ruta_reporte = os.path.splitext(args.salida)[0] + "_reporte.json"
+with open(ruta_reporte, "w", encoding="utf-8") as f:
+    json.dump(reporte, f, indent=2, ensure_ascii=False)
+print(f"\nReporte guardado en '{ruta_reporte}'")
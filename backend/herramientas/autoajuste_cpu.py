@@ -0,0 +1,177 @@
+# backend/herramientas/autoajuste_cpu.py
+"""
+Autoajuste de TensorFlow en CPU para el nodo donde se despliega el servidor.
+
+Mide el modelo con distintas combinaciones de hilos intra-op / inter-op,
+oneDNN activado o no y tamaños de micro-lote. Cada combinación de hilos y
+oneDNN corre en un subproceso nuevo, porque TensorFlow no permite cambiarlas
+una vez inicializado. Elige la configuración con menor latencia por imagen y,
+con ella, el micro-lote de mayor throughput cuya latencia por lote no supere
+--latencia-maxima-ms. Escribe el resultado en RUTA_CONFIG_CPU, que el
+servidor aplica al iniciar, y reporta la ganancia frente a los valores por
+defecto de TensorFlow.
+
+Uso (desde backend/, en el nodo de despliegue y sin tráfico):
+    python -m herramientas.autoajuste_cpu
+    python -m herramientas.autoajuste_cpu --modelo modelo_neumonia_MobileNet.keras --lotes 1,2,4,8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from config.ajustes import RUTA_CONFIG_CPU, HILOS_INFERENCIA
+
+
+def medir(args):
+    """Subproceso: aplicar hilos, cargar el modelo y medir cada micro-lote"""
+    import numpy as np
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(args.intra)
+    tf.config.threading.set_inter_op_parallelism_threads(args.inter)
+
+    from servicios.modelo_tflite import cargar_modelo
+    modelo = cargar_modelo(args.modelo)
+    _, alto, ancho, canales = modelo.input_shape
+
+    resultados = {}
+    for lote in [int(l) for l in args.lotes.split(",")]:
+        arr = np.random.uniform(0, 255, (lote, alto, ancho, canales)).astype(np.float32)
+        for _ in range(3):
+            modelo.predict(arr, verbose=0)
+        tiempos = []
+        for _ in range(args.repeticiones):
+            inicio = time.perf_counter()
+            modelo.predict(arr, verbose=0)
+            tiempos.append(time.perf_counter() - inicio)
+        tiempos = np.array(tiempos)
+        resultados[lote] = {
+            "p50_ms": round(float(np.percentile(tiempos, 50)) * 1000, 2),
+            "p95_ms": round(float(np.percentile(tiempos, 95)) * 1000, 2),
+            "imagenes_por_segundo": round(lote / float(np.mean(tiempos)), 2),
+        }
+    print(json.dumps(resultados))
+
+
+def ejecutar(args, intra: int, inter: int, onednn):
+    """Lanzar una medición en un subproceso con la configuración indicada"""
+    entorno = dict(os.environ)
+    entorno.pop("TF_ENABLE_ONEDNN_OPTS", None)
+    if onednn is not None:
+        entorno["TF_ENABLE_ONEDNN_OPTS"] = "1" if onednn else "0"
+
+    salida = subprocess.run(
+        [sys.executable, "-m", "herramientas.autoajuste_cpu", "--medir",
+         "--modelo", args.modelo, "--lotes", args.lotes, "--repeticiones", str(args.repeticiones),
+         "--intra", str(intra), "--inter", str(inter)],
+        env=entorno, capture_output=True, text=True, check=True
+    )
+    # La última línea es el JSON; lo anterior son mensajes de TensorFlow
+    return {int(lote): r for lote, r in json.loads(salida.stdout.strip().splitlines()[-1]).items()}
+
+
+def candidatos_intra(cpus: int):
+    """Potencias de 2 hasta la cantidad de CPUs, más la mitad y el total"""
+    valores = {cpus, max(1, cpus // 2)}
+    n = 1
+    while n < cpus:
+        valores.add(n)
+        n *= 2
+    return sorted(valores)
+
+
+def modelo_por_defecto() -> str:
+    """Artefacto de la versión activa del registro, o el modelo original"""
+    from servicios.registro_modelos import leer_manifiesto, ruta_version
+    manifiesto = leer_manifiesto()
+    if manifiesto.get("activa"):
+        return ruta_version(manifiesto["activa"], manifiesto)
+    return "modelo_neumonia_MobileNet.keras"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autoajuste de hilos, oneDNN y micro-lote en CPU")
+    parser.add_argument("--modelo", default=None)
+    parser.add_argument("--lotes", default="1,2,4,8")
+    parser.add_argument("--repeticiones", type=int, default=30)
+    parser.add_argument("--latencia-maxima-ms", type=float, default=None,
+                        help="Latencia máxima por micro-lote (por defecto: 2x la latencia de 1 imagen)")
+    parser.add_argument("--salida", default=RUTA_CONFIG_CPU)
+    # Modo interno del subproceso de medición
+    parser.add_argument("--medir", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--intra", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--inter", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    args.modelo = args.modelo or modelo_por_defecto()
+    # El lote de 1 imagen es la referencia de latencia
+    if "1" not in args.lotes.split(","):
+        args.lotes = "1," + args.lotes
+    if args.medir:
+        medir(args)
+        return
+
+    cpus = os.cpu_count()
+    if HILOS_INFERENCIA > 1:
+        print(f"AVISO: HILOS_INFERENCIA={HILOS_INFERENCIA}; las mediciones son de un solo hilo de inferencia.")
+
+    print(f"Modelo: {args.modelo} | CPUs: {cpus}")
+    print("Midiendo valores por defecto de TensorFlow...")
+    base = ejecutar(args, 0, 0, None)
+
+    mediciones = []
+    for onednn in (True, False):
+        for inter in (1, 2):
+            for intra in candidatos_intra(cpus):
+                print(f"Midiendo intra={intra} inter={inter} oneDNN={'sí' if onednn else 'no'}...")
+                mediciones.append({
+                    "intra_op": intra, "inter_op": inter, "onednn": onednn,
+                    "lotes": ejecutar(args, intra, inter, onednn),
+                })
+
+    print(f"\n{'Intra':>6}{'Inter':>6}{'oneDNN':>8}{'Lote 1 p50 (ms)':>17}{'Lote 1 p95 (ms)':>17}{'Máx. img/s':>12}")
+    print("-" * 66)
+    for m in mediciones:
+        print(f"{m['intra_op']:>6}{m['inter_op']:>6}{'sí' if m['onednn'] else 'no':>8}"
+              f"{m['lotes'][1]['p50_ms']:>17.2f}{m['lotes'][1]['p95_ms']:>17.2f}"
+              f"{max(r['imagenes_por_segundo'] for r in m['lotes'].values()):>12.2f}")
+
+    # Servidor sensible a latencia: primero la menor latencia de una imagen
+    mejor = min(mediciones, key=lambda m: (m["lotes"][1]["p50_ms"], m["lotes"][1]["p95_ms"]))
+    latencia_maxima = args.latencia_maxima_ms or 2 * mejor["lotes"][1]["p50_ms"]
+    permitidos = {lote: r for lote, r in mejor["lotes"].items() if r["p95_ms"] <= latencia_maxima} or {1: mejor["lotes"][1]}
+    micro_lote = max(permitidos, key=lambda lote: permitidos[lote]["imagenes_por_segundo"])
+
+    configuracion = {
+        "intra_op": mejor["intra_op"],
+        "inter_op": mejor["inter_op"],
+        "onednn": mejor["onednn"],
+        "micro_lote": micro_lote,
+        "cpus": cpus,
+        "modelo": args.modelo,
+        "fecha": datetime.now().isoformat(),
+        "latencia_maxima_ms": latencia_maxima,
+        "por_defecto": base,
+        "elegida": mejor["lotes"],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(configuracion, f, indent=2, ensure_ascii=False)
+
+    base_1, mejor_1 = base[1], mejor["lotes"][1]
+    print(f"\nConfiguración elegida: intra={mejor['intra_op']} inter={mejor['inter_op']} "
+          f"oneDNN={'sí' if mejor['onednn'] else 'no'} micro-lote={micro_lote}")
+    print(f"  Latencia 1 imagen p50: {base_1['p50_ms']:.2f} -> {mejor_1['p50_ms']:.2f} ms "
+          f"({(1 - mejor_1['p50_ms'] / base_1['p50_ms']) * 100:.1f}% menos)")
+    print(f"  Latencia 1 imagen p95: {base_1['p95_ms']:.2f} -> {mejor_1['p95_ms']:.2f} ms")
+    print(f"  Throughput: {base_1['imagenes_por_segundo']:.2f} img/s (por defecto, lote 1) -> "
+          f"{mejor['lotes'][micro_lote]['imagenes_por_segundo']:.2f} img/s (lote {micro_lote})")
+    print(f"\nGuardada en '{args.salida}'; se aplica al reiniciar el servidor.")
+
+
+if __name__ == "__main__":
+    main()
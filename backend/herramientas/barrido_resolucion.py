@@ -0,0 +1,95 @@
+# backend/herramientas/barrido_resolucion.py
+"""
+Barrido de resolución de entrada y ancho (alpha) de MobileNetV2.
+
+Entrena cada configuración con model.py (en un subproceso, sin ventanas de
+matplotlib) y mide accuracy, recall de PNEUMONIA y latencia en CPU en el
+conjunto de prueba. Imprime la tabla marcando las configuraciones en el
+frente de Pareto y la guarda en JSON. Los modelos ya entrenados se reutilizan,
+así un barrido interrumpido se puede retomar.
+
+Uso (desde backend/):
+    python -m herramientas.barrido_resolucion --tamanos 160,192,224 --alphas 0.5,0.75,1.0
+    # Servir la configuración elegida con la misma resolución en todo el proyecto:
+    # TAMANO_ENTRADA_MODELO=<tamaño> en .env
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import tensorflow as tf
+
+from herramientas.medicion import evaluar_directorio, latencia_media, metricas
+
+
+def domina(a: dict, b: dict) -> bool:
+    """a domina a b si no es peor en ninguna métrica y es mejor en al menos una"""
+    no_peor = (a["accuracy"] >= b["accuracy"] and a["recall_neumonia"] >= b["recall_neumonia"]
+               and a["latencia_cpu_ms"] <= b["latencia_cpu_ms"])
+    mejor = (a["accuracy"] > b["accuracy"] or a["recall_neumonia"] > b["recall_neumonia"]
+             or a["latencia_cpu_ms"] < b["latencia_cpu_ms"])
+    return no_peor and mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de resolución y alpha de MobileNetV2")
+    parser.add_argument("--tamanos", default="160,192,224")
+    parser.add_argument("--alphas", default="0.5,0.75,1.0")
+    parser.add_argument("--prueba", default="../chest_xray/test")
+    parser.add_argument("--directorio", default="barrido", help="Carpeta para modelos y resultados")
+    args = parser.parse_args()
+
+    tamanos = [int(t) for t in args.tamanos.split(",")]
+    alphas = [float(a) for a in args.alphas.split(",")]
+    os.makedirs(args.directorio, exist_ok=True)
+
+    # model.py llama a plt.show(); con el backend Agg no bloquea el barrido
+    entorno = {**os.environ, "MPLBACKEND": "Agg"}
+
+    resultados = []
+    for tamano in tamanos:
+        for alpha in alphas:
+            ruta = os.path.join(args.directorio, f"mobilenet_a{alpha}_{tamano}.keras")
+            if not os.path.exists(ruta):
+                print(f"\nEntrenando alpha={alpha} tamaño={tamano}...")
+                subprocess.run(
+                    [sys.executable, "model.py", "--alpha", str(alpha), "--tamano", str(tamano), "--salida", ruta],
+                    env=entorno,
+                    check=True
+                )
+
+            modelo = tf.keras.models.load_model(ruta)
+            preds, etiquetas, indice_neumonia = evaluar_directorio(modelo, args.prueba)
+            acc, recall = metricas(preds, etiquetas, indice_neumonia)
+            resultados.append({
+                "tamano": tamano,
+                "alpha": alpha,
+                "modelo": ruta,
+                "accuracy": round(acc * 100, 2),
+                "recall_neumonia": round(recall * 100, 2),
+                "parametros": int(modelo.count_params()),
+                "latencia_cpu_ms": round(latencia_media(modelo) * 1000, 2),
+            })
+            tf.keras.backend.clear_session()
+
+    for r in resultados:
+        r["pareto"] = not any(domina(otro, r) for otro in resultados if otro is not r)
+
+    resultados.sort(key=lambda r: r["latencia_cpu_ms"])
+    print(f"\n{'Tamaño':>7}{'Alpha':>7}{'Acc (%)':>10}{'Recall N (%)':>14}{'Parámetros':>13}"
+          f"{'Lat. CPU (ms)':>15}{'Pareto':>8}")
+    print("-" * 74)
+    for r in resultados:
+        print(f"{r['tamano']:>7}{r['alpha']:>7.2f}{r['accuracy']:>10.2f}{r['recall_neumonia']:>14.2f}"
+              f"{r['parametros']:>13,}{r['latencia_cpu_ms']:>15.2f}{'*' if r['pareto'] else '':>8}")
+
+    ruta_resultados = os.path.join(args.directorio, "resultados.json")
+    with open(ruta_resultados, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en '{ruta_resultados}'")
+
+
+if __name__ == "__main__":
+    main()
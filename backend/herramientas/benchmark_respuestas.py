@@ -0,0 +1,185 @@
+# backend/herramientas/benchmark_respuestas.py
+"""
+Benchmark de la capa de respuestas: tiempo de serialización JSON y bytes
+enviados, antes (JSONResponse con json estándar, sin compresión) y después
+(orjson + gzip/brotli de middleware/compresion.py).
+
+Por defecto usa un historial sintético con la forma de /analisis/historial
+(filas de analisis_radiografias con `detalles_analisis` largos) y una
+respuesta autenticada de /predecir. También acepta un JSON real guardado
+desde la API (por ejemplo `curl .../analisis/historial > historial.json`).
+
+Uso (desde backend/):
+    python -m herramientas.benchmark_respuestas
+    python -m herramientas.benchmark_respuestas --filas 200 --repeticiones 500
+    python -m herramientas.benchmark_respuestas --archivo historial.json
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+
+from middleware.compresion import COMPRESORES
+from servicios.respuestas import RespuestaJSON, orjson
+
+
+PLANTILLA_DETALLES = """DIAGNÓSTICO DE LA RADIOGRAFÍA: {titulo}
+- Confianza del modelo: {confianza}%
+- {frase_diagnostico}
+
+
+PERFIL DE VULNERABILIDAD DEL PACIENTE: {nivel}
+- Nivel de vulnerabilidad: {nivel}
+- Prioridad de atención sugerida: {prioridad}
+- Paciente de {edad} años con acceso limitado a servicios de salud.
+
+Esta evaluación se basa en:
+  • Edad y condición demográfica
+  • Situación socioeconómica
+  • Acceso a servicios de salud
+  • Historial de COVID-19 y secuelas
+
+    ¿QUÉ SIGNIFICA EL NIVEL DE CONFIANZA?
+    - La confianza representa el grado de seguridad del modelo al comparar las posibles clases (NORMAL vs NEUMONÍA).
+    - Un valor inferior al 80% NO significa que el diagnóstico sea incorrecto.
+    - Indica que existen características compartidas entre ambas clases o que la imagen presenta patrones sutiles.
+    - El modelo selecciona la clase con mayor probabilidad relativa, aunque la diferencia no sea extrema.
+
+RECOMENDACIÓN:
+⚠️ {recomendacion}
+  - Consultar con médico profesional
+  - Llevar esta información al médico tratante
+
+NOTA IMPORTANTE:
+Este análisis combina:
+1. Diagnóstico automatizado de la radiografía (modelo de IA)
+2. Evaluación de vulnerabilidad según perfil de salud del paciente
+
+⚕️ SIEMPRE consulte con un profesional médico calificado."""
+
+
+def fila_historial(persona_id: str, fecha: datetime) -> dict:
+    """Fila de analisis_radiografias con la misma forma que guarda /predecir"""
+    neumonia = random.random() < 0.6
+    confianza = round(random.uniform(55, 99.9), 2)
+    nivel = random.choice(["BAJA", "MEDIA", "ALTA"])
+    prioridad = {"BAJA": "RUTINARIA", "MEDIA": "PRIORITARIA", "ALTA": "URGENTE"}[nivel]
+    return {
+        "id": str(uuid.uuid4()),
+        "persona_id": persona_id,
+        "imagen_url": f"https://example.supabase.co/storage/v1/object/public/radiografias/{persona_id}/{uuid.uuid4().hex}.jpg",
+        "diagnostico": "PNEUMONIA" if neumonia else "NORMAL",
+        "confianza": confianza,
+        "probabilidades": {
+            "NORMAL": round(100 - confianza if neumonia else confianza, 2),
+            "PNEUMONIA": round(confianza if neumonia else 100 - confianza, 2),
+        },
+        "version_modelo": "v3",
+        "fecha": fecha.isoformat(),
+        "nivel_vulnerabilidad_paciente": nivel,
+        "prioridad_atencion_sugerida": prioridad,
+        "explicacion_vulnerabilidad": f"Vulnerabilidad {nivel.lower()} por edad, comorbilidades y acceso a atención médica.",
+        "detalles_analisis": PLANTILLA_DETALLES.format(
+            titulo="NEUMONÍA DETECTADA" if neumonia else "NORMAL",
+            confianza=confianza,
+            frase_diagnostico=(
+                "El modelo de IA identificó patrones consistentes con neumonía en esta radiografía."
+                if neumonia else
+                "El modelo de IA no detectó patrones asociados con neumonía en esta radiografía."
+            ),
+            nivel=nivel,
+            prioridad=prioridad,
+            edad=random.randint(5, 90),
+            recomendacion="NEUMONÍA DETECTADA" if neumonia else "Continuar con chequeos de rutina",
+        ),
+    }
+
+
+def cargas_sinteticas(filas: int) -> dict:
+    persona_id = str(uuid.uuid4())
+    ahora = datetime.now()
+    historial = [fila_historial(persona_id, ahora - timedelta(days=i)) for i in range(filas)]
+    fila = historial[0]
+    predecir = {
+        "diagnostico": fila["diagnostico"],
+        "confianza": fila["confianza"],
+        "probabilidades": fila["probabilidades"],
+        "autenticado": True,
+        "mensaje": "Análisis guardado en historial",
+        "explicacion": "⚠️ Neumonía detectada. Consulta médica necesaria.",
+        "vulnerabilidad": {
+            "nivel": fila["nivel_vulnerabilidad_paciente"],
+            "prioridad": fila["prioridad_atencion_sugerida"],
+        },
+        "data": {
+            "detalles_analisis": fila["detalles_analisis"],
+            "nivel_vulnerabilidad_paciente": fila["nivel_vulnerabilidad_paciente"],
+            "prioridad_atencion_sugerida": fila["prioridad_atencion_sugerida"],
+            "explicacion_vulnerabilidad": fila["explicacion_vulnerabilidad"],
+        },
+    }
+    return {
+        f"/analisis/historial ({filas} filas)": {"success": True, "data": historial},
+        "/predecir (autenticado)": predecir,
+    }
+
+
+def medir_ms(funcion, repeticiones: int) -> float:
+    """Mediana del tiempo de una llamada (ms)"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialización y bytes enviados: antes vs después")
+    parser.add_argument("--filas", type=int, default=50, help="Filas del historial sintético")
+    parser.add_argument("--archivo", default=None, help="JSON real guardado desde la API")
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.semilla)
+    if args.archivo:
+        with open(args.archivo, encoding="utf-8") as f:
+            cargas = {args.archivo: json.load(f)}
+    else:
+        cargas = cargas_sinteticas(args.filas)
+
+    if orjson is None:
+        print("AVISO: orjson no está instalado; 'después' usa json estándar.")
+    if b"br" not in COMPRESORES:
+        print("AVISO: brotli no está instalado; solo se mide gzip.")
+
+    antes, despues = JSONResponse(content=None), RespuestaJSON(content=None)
+    for nombre, contenido in cargas.items():
+        cuerpo_antes = antes.render(contenido)
+        cuerpo = despues.render(contenido)
+        assert json.loads(cuerpo) == json.loads(cuerpo_antes), "Las serializaciones no son equivalentes"
+
+        t_antes = medir_ms(lambda: antes.render(contenido), args.repeticiones)
+        t_despues = medir_ms(lambda: despues.render(contenido), args.repeticiones)
+
+        print(f"\n{nombre}")
+        print(f"  Serialización: json {t_antes:.3f} ms -> orjson {t_despues:.3f} ms "
+              f"({t_antes / t_despues:.1f}x)")
+        print(f"  {'Codificación':<14}{'Bytes':>12}{'% del original':>16}{'Compresión (ms)':>17}{'Total (ms)':>12}")
+        print("  " + "-" * 71)
+        print(f"  {'antes (json)':<14}{len(cuerpo_antes):>12}{100.0:>16.1f}{0.0:>17.3f}{t_antes:>12.3f}")
+        for codificacion, comprimir in COMPRESORES.items():
+            comprimido = comprimir(cuerpo)
+            t_comp = medir_ms(lambda: comprimir(cuerpo), max(1, args.repeticiones // 4))
+            print(f"  {codificacion.decode():<14}{len(comprimido):>12}"
+                  f"{len(comprimido) / len(cuerpo_antes) * 100:>16.1f}{t_comp:>17.3f}{t_despues + t_comp:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
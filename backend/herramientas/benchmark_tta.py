@@ -0,0 +1,91 @@
+# backend/herramientas/benchmark_tta.py
+"""
+Benchmark de TTA condicionado por confianza: precisión vs latencia.
+
+Uso (desde backend/):
+    python -m herramientas.benchmark_tta --datos ../chest_xray/test --umbrales 0.6,0.7,0.8,0.9
+"""
+import argparse
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from servicios.inferencia import CLASES, variantes_tta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precisión vs latencia del TTA condicionado")
+    parser.add_argument("--modelo", default="modelo_neumonia_MobileNet.keras")
+    parser.add_argument("--datos", default="../chest_xray/test")
+    parser.add_argument("--umbrales", default="0.6,0.7,0.8,0.9")
+    args = parser.parse_args()
+
+    umbrales = [float(u) for u in args.umbrales.split(",")]
+    modelo = tf.keras.models.load_model(args.modelo)
+    _, alto, ancho, _ = modelo.input_shape
+
+    # Una imagen por lote, igual que en el servidor
+    datos = tf.keras.utils.image_dataset_from_directory(
+        args.datos,
+        label_mode="int",
+        image_size=(alto, ancho),
+        batch_size=1,
+        shuffle=False
+    )
+    indice_neumonia = datos.class_names.index(CLASES[1])
+
+    # Calentamiento
+    modelo.predict(np.zeros((1, alto, ancho, 3), dtype=np.float32), verbose=0)
+    modelo.predict(variantes_tta(np.zeros((1, alto, ancho, 3), dtype=np.float32)), verbose=0)
+
+    # Se evalúan siempre ambas pasadas; cada umbral se simula después sobre los mismos datos
+    etiquetas, preds_base, preds_tta, tiempos_base, tiempos_tta = [], [], [], [], []
+    for imagen, etiqueta in datos:
+        arr = imagen.numpy()
+
+        inicio = time.perf_counter()
+        pred = modelo.predict(arr, verbose=0)[0]
+        tiempos_base.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        preds_variantes = modelo.predict(variantes_tta(arr), verbose=0)
+        tiempos_tta.append(time.perf_counter() - inicio)
+
+        etiquetas.append(int(etiqueta.numpy()[0]))
+        preds_base.append(pred)
+        preds_tta.append(np.mean(np.vstack([pred[None, :], preds_variantes]), axis=0))
+
+    etiquetas = np.array(etiquetas)
+    preds_base = np.array(preds_base)
+    preds_tta = np.array(preds_tta)
+    tiempos_base = np.array(tiempos_base)
+    tiempos_tta = np.array(tiempos_tta)
+    confianza_base = preds_base.max(axis=1)
+
+    def fila(nombre, aplicar):
+        preds = np.where(aplicar[:, None], preds_tta, preds_base)
+        clases = preds.argmax(axis=1)
+        latencias = tiempos_base + np.where(aplicar, tiempos_tta, 0.0)
+        neumonia = etiquetas == indice_neumonia
+        return (
+            f"{nombre:<16}"
+            f"{np.mean(clases == etiquetas) * 100:>10.2f}"
+            f"{np.mean(clases[neumonia] == indice_neumonia) * 100:>12.2f}"
+            f"{np.mean(aplicar) * 100:>9.1f}"
+            f"{np.mean(latencias) * 1000:>12.1f}"
+            f"{np.percentile(latencias, 95) * 1000:>10.1f}"
+        )
+
+    print(f"\nImágenes evaluadas: {len(etiquetas)}")
+    print(f"{'Modo':<16}{'Acc (%)':>10}{'Recall N (%)':>12}{'TTA (%)':>9}{'Lat. media':>12}{'Lat. p95':>10}")
+    print("-" * 69)
+    print(fila("sin TTA", np.zeros(len(etiquetas), dtype=bool)))
+    for umbral in umbrales:
+        print(fila(f"TTA < {umbral:.2f}", confianza_base < umbral))
+    print(fila("TTA siempre", np.ones(len(etiquetas), dtype=bool)))
+    print("\nLatencias en ms por imagen (pasada base + pasada TTA cuando aplica).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# backend/herramientas/calibrar_cascada.py
+"""
+Calibración del umbral de la cascada (modelo rápido -> modelo completo).
+
+Elige el menor umbral de confianza del modelo rápido con el que la cascada
+mantiene, en el conjunto de calibración, una precisión y un recall de PNEUMONIA
+iguales o mayores que los del modelo completo. Reporta la tasa de escalamiento.
+
+Uso (desde backend/):
+    python model.py --alpha 0.35 --tamano 160 --salida modelo_rapido.keras
+    python -m servicios.registro_modelos registrar rapido-v1 modelo_rapido.keras "MobileNetV2 a=0.35 160px"
+    python -m herramientas.calibrar_cascada --rapido modelo_rapido.keras --version-registro rapido-v1
+"""
+import argparse
+
+import numpy as np
+import tensorflow as tf
+
+from herramientas.medicion import evaluar_directorio, latencia_media, metricas
+from servicios.cascada import combinar_cascada
+from servicios.registro_modelos import leer_manifiesto, guardar_manifiesto
+
+# Por debajo de este tamaño el umbral calibrado es poco confiable
+MINIMO_IMAGENES_CALIBRACION = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrar el umbral de la cascada de modelos")
+    parser.add_argument("--rapido", required=True, help="Modelo rápido (.keras)")
+    parser.add_argument("--completo", default="modelo_neumonia_MobileNet.keras")
+    parser.add_argument("--calibracion", default="../chest_xray/val")
+    parser.add_argument("--prueba", default="../chest_xray/test", help="Conjunto para el reporte final ('' para omitir)")
+    parser.add_argument("--version-registro", default="", help="Guardar el umbral en el manifiesto para esta versión")
+    args = parser.parse_args()
+
+    rapido = tf.keras.models.load_model(args.rapido)
+    completo = tf.keras.models.load_model(args.completo)
+    lat_rapido = latencia_media(rapido)
+    lat_completo = latencia_media(completo)
+
+    preds_r, etiquetas, indice_neumonia = evaluar_directorio(rapido, args.calibracion)
+    preds_c, _, _ = evaluar_directorio(completo, args.calibracion)
+    if len(etiquetas) < MINIMO_IMAGENES_CALIBRACION:
+        print(f"\nAVISO: solo {len(etiquetas)} imágenes de calibración; el umbral puede no generalizar.")
+
+    acc_completo, recall_completo = metricas(preds_c, etiquetas, indice_neumonia)
+    print(f"\nModelo completo: acc {acc_completo * 100:.2f}% | recall PNEUMONIA {recall_completo * 100:.2f}%"
+          f" | {lat_completo * 1000:.1f} ms")
+    print(f"Modelo rápido:   {lat_rapido * 1000:.1f} ms por imagen\n")
+
+    print(f"{'Umbral':>8}{'Acc (%)':>10}{'Recall N (%)':>14}{'Escalados (%)':>15}{'Lat. esperada':>15}")
+    print("-" * 62)
+    elegido = None
+    for umbral in np.round(np.arange(0.50, 1.0, 0.01), 2):
+        preds, escalados = combinar_cascada(preds_r, preds_c, umbral)
+        acc, recall = metricas(preds, etiquetas, indice_neumonia)
+        latencia = lat_rapido + np.mean(escalados) * lat_completo
+        print(f"{umbral:>8.2f}{acc * 100:>10.2f}{recall * 100:>14.2f}{np.mean(escalados) * 100:>15.1f}"
+              f"{latencia * 1000:>12.1f} ms")
+        if elegido is None and acc >= acc_completo and recall >= recall_completo:
+            elegido = float(umbral)
+
+    if elegido is None:
+        print("\nNingún umbral iguala al modelo completo; la cascada no se recomienda con este modelo rápido.")
+        return
+
+    print(f"\nUmbral elegido: {elegido:.2f}")
+
+    if args.prueba:
+        preds_r_p, etiquetas_p, indice_p = evaluar_directorio(rapido, args.prueba)
+        preds_c_p, _, _ = evaluar_directorio(completo, args.prueba)
+        preds, escalados = combinar_cascada(preds_r_p, preds_c_p, elegido)
+        acc, recall = metricas(preds, etiquetas_p, indice_p)
+        acc_c, recall_c = metricas(preds_c_p, etiquetas_p, indice_p)
+        print(f"\nPrueba ({len(etiquetas_p)} imágenes):")
+        print(f"  Completo: acc {acc_c * 100:.2f}% | recall PNEUMONIA {recall_c * 100:.2f}%")
+        print(f"  Cascada:  acc {acc * 100:.2f}% | recall PNEUMONIA {recall * 100:.2f}%"
+              f" | escalados {np.mean(escalados) * 100:.1f}%"
+              f" | latencia esperada {(lat_rapido + np.mean(escalados) * lat_completo) * 1000:.1f} ms")
+
+    if args.version_registro:
+        manifiesto = leer_manifiesto()
+        manifiesto["versiones"][args.version_registro]["umbral_cascada"] = elegido
+        guardar_manifiesto(manifiesto)
+        print(f"\nUmbral guardado en el manifiesto para {args.version_registro}")
+
+
+if __name__ == "__main__":
+    main()
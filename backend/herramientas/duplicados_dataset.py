@@ -0,0 +1,303 @@
+# backend/herramientas/duplicados_dataset.py
+"""
+Casi-duplicados y fuga entre particiones del dataset chest_xray.
+
+1. Calcula un hash perceptual (pHash por DCT) de cada imagen de
+   train/val/test en un pool de procesos y lo guarda, empaquetado en bits,
+   en un índice NumPy (indice_hashes.npz). Al relanzar solo se recalculan las
+   imágenes nuevas o modificadas.
+2. Busca pares a distancia de Hamming <= --umbral con XOR y popcount
+   vectorizados sobre palabras de 64 bits, por bloques de filas.
+3. Agrupa los pares (union-find) y reporta duplicados dentro de cada
+   partición, fugas entre particiones y grupos con etiquetas contradictorias.
+4. Escribe un manifiesto limpio (JSON) que model.py acepta con --manifiesto:
+   cada grupo queda en una sola partición (train > val > test, así test solo
+   conserva imágenes sin duplicados en las otras), con un único representante
+   por grupo; los grupos con etiquetas contradictorias se excluyen.
+
+Uso (desde backend/):
+    python -m herramientas.duplicados_dataset --datos ../chest_xray
+    python -m herramientas.duplicados_dataset --datos ../chest_xray --umbral 4 --salida manifiesto_limpio.json
+    python model.py --manifiesto manifiesto_limpio.json
+"""
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from multiprocessing import get_context
+
+import numpy as np
+from PIL import Image
+
+PARTICIONES = ["train", "val", "test"]
+EXTENSIONES = (".jpg", ".jpeg", ".png")
+
+# Lado de la imagen reducida sobre la que se calcula la DCT (pHash clásico: 32 px)
+LADO_DCT = 32
+
+# Memoria máxima (bytes) de la matriz XOR de un bloque de búsqueda
+MEMORIA_BLOQUE = 64 * 1024 * 1024
+
+
+
+# HASH PERCEPTUAL (PROCESOS DEL POOL)
+
+def matriz_dct(n: int) -> np.ndarray:
+    """Matriz de la DCT-II ortonormal de tamaño n"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+
+def phash(tarea):
+    """
+    pHash de `lado`² bits: escala de grises a 32x32, DCT 2D y comparación de
+    los coeficientes de baja frecuencia con su mediana (sin la componente DC).
+    Devuelve los bits empaquetados (uint8) o None si la imagen no se puede leer.
+    """
+    ruta, lado = tarea
+    try:
+        with Image.open(ruta) as img:
+            img.draft("L", (LADO_DCT, LADO_DCT))
+            gris = np.asarray(img.convert("L").resize((LADO_DCT, LADO_DCT), Image.LANCZOS), dtype=np.float64)
+    except Exception:
+        return None
+    dct = matriz_dct(LADO_DCT)
+    bajas = (dct @ gris @ dct.T)[:lado, :lado].ravel()
+    return np.packbits(bajas > np.median(bajas[1:]))
+
+
+
+# ÍNDICE DE HASHES
+
+def listar_dataset(raiz: str):
+    """(ruta relativa, partición, clase) de cada imagen de <raiz>/<partición>/<clase>/"""
+    imagenes = []
+    for particion in PARTICIONES:
+        directorio = os.path.join(raiz, particion)
+        if not os.path.isdir(directorio):
+            continue
+        for clase in sorted(os.listdir(directorio)):
+            directorio_clase = os.path.join(directorio, clase)
+            if not os.path.isdir(directorio_clase):
+                continue
+            for archivo in sorted(os.listdir(directorio_clase)):
+                if archivo.lower().endswith(EXTENSIONES):
+                    imagenes.append((os.path.join(particion, clase, archivo), particion, clase))
+    return imagenes
+
+
+def construir_indice(raiz: str, ruta_indice: str, lado: int, procesos: int) -> dict:
+    """
+    Hashes de todas las imágenes, reutilizando los del índice anterior cuya
+    ruta, tamaño y fecha de modificación no cambiaron.
+    """
+    imagenes = listar_dataset(raiz)
+    rutas = np.array([ruta for ruta, _, _ in imagenes])
+    estado = np.array([(os.path.getsize(os.path.join(raiz, r)), os.path.getmtime(os.path.join(raiz, r)))
+                       for r in rutas], dtype=np.float64).reshape(-1, 2)
+    bytes_hash = lado * lado // 8
+    hashes = np.zeros((len(rutas), bytes_hash), dtype=np.uint8)
+    validos = np.zeros(len(rutas), dtype=bool)
+
+    anteriores = {}
+    if os.path.exists(ruta_indice):
+        previo = np.load(ruta_indice)
+        if int(previo["lado"]) == lado:
+            for ruta, est, h, v in zip(previo["rutas"], previo["estado"], previo["hashes"], previo["validos"]):
+                anteriores[str(ruta)] = (est, h, v)
+
+    pendientes = []
+    for i, ruta in enumerate(rutas):
+        anterior = anteriores.get(str(ruta))
+        if anterior is not None and np.array_equal(anterior[0], estado[i]):
+            hashes[i], validos[i] = anterior[1], anterior[2]
+        else:
+            pendientes.append(i)
+
+    print(f"Imágenes: {len(rutas)} | hashes reutilizados: {len(rutas) - len(pendientes)} | por calcular: {len(pendientes)}")
+    if pendientes:
+        inicio = time.perf_counter()
+        with get_context("spawn").Pool(procesos) as pool:
+            tareas = [(os.path.join(raiz, rutas[i]), lado) for i in pendientes]
+            for i, h in zip(pendientes, pool.imap(phash, tareas, chunksize=64)):
+                if h is not None:
+                    hashes[i], validos[i] = h, True
+        transcurrido = time.perf_counter() - inicio
+        print(f"  {len(pendientes)} hashes en {transcurrido:.1f} s ({len(pendientes) / transcurrido:.0f} img/s)")
+
+    indice = {
+        "rutas": rutas,
+        "particiones": np.array([PARTICIONES.index(p) for _, p, _ in imagenes], dtype=np.int8),
+        "clases": np.array([c for _, _, c in imagenes]),
+        "estado": estado,
+        "hashes": hashes,
+        "validos": validos,
+        "lado": np.array(lado),
+    }
+    np.savez_compressed(ruta_indice, **indice)
+    return indice
+
+
+
+# BÚSQUEDA POR DISTANCIA DE HAMMING
+
+def contar_bits(x: np.ndarray) -> np.ndarray:
+    """Popcount por elemento (np.bitwise_count en NumPy >= 2.0)"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    tabla = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return tabla[x.view(np.uint8)].reshape(*x.shape, x.itemsize).sum(axis=-1)
+
+
+def pares_cercanos(hashes: np.ndarray, umbral: int):
+    """
+    Pares (i, j), i < j, con distancia de Hamming <= umbral.
+    Los hashes (n, bytes) se ven como palabras uint64: la distancia es la
+    suma del popcount del XOR de cada palabra. Cada bloque de filas se compara
+    solo con las filas siguientes (triángulo superior).
+    """
+    relleno = (-hashes.shape[1]) % 8
+    palabras = np.ascontiguousarray(np.pad(hashes, ((0, 0), (0, relleno)))).view(np.uint64)
+    n, w = palabras.shape
+    if n == 0:
+        vacio = np.zeros(0, dtype=np.int64)
+        return vacio, vacio, vacio.astype(np.int32)
+    filas_bloque = max(1, MEMORIA_BLOQUE // max(1, n * w * 8))
+
+    pares_i, pares_j, distancias = [], [], []
+    for inicio in range(0, n, filas_bloque):
+        fin = min(n, inicio + filas_bloque)
+        bloque = palabras[inicio:fin, None, :] ^ palabras[None, inicio:, :]
+        distancia = contar_bits(bloque).sum(axis=-1, dtype=np.int32)
+        # Solo j > i dentro del triángulo superior
+        distancia[np.arange(fin - inicio)[:, None] >= np.arange(n - inicio)[None, :]] = umbral + 1
+        i, j = np.nonzero(distancia <= umbral)
+        pares_i.append(i + inicio)
+        pares_j.append(j + inicio)
+        distancias.append(distancia[i, j])
+    return np.concatenate(pares_i), np.concatenate(pares_j), np.concatenate(distancias)
+
+
+def agrupar(n: int, pares_i: np.ndarray, pares_j: np.ndarray) -> np.ndarray:
+    """Componente (grupo) de cada imagen según los pares cercanos (union-find)"""
+    padre = np.arange(n)
+
+    def raiz(x):
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    for i, j in zip(pares_i, pares_j):
+        ri, rj = raiz(i), raiz(j)
+        if ri != rj:
+            padre[max(ri, rj)] = min(ri, rj)
+    return np.array([raiz(x) for x in range(n)])
+
+
+
+# MANIFIESTO LIMPIO
+
+def manifiesto_limpio(indice: dict, grupos: np.ndarray, raiz: str, umbral: int) -> dict:
+    """
+    Una partición por grupo (la primera en orden train > val > test entre sus
+    miembros), un representante por grupo (el primero en orden de ruta) y
+    exclusión de los grupos con clases distintas.
+    """
+    rutas, particiones, clases, validos = indice["rutas"], indice["particiones"], indice["clases"], indice["validos"]
+    miembros = defaultdict(list)
+    for i in np.flatnonzero(validos):
+        miembros[grupos[i]].append(i)
+
+    splits = {particion: [] for particion in PARTICIONES}
+    excluidas = {"duplicados": 0, "fuga": 0, "etiquetas_contradictorias": 0, "ilegibles": int((~validos).sum())}
+    for integrantes in miembros.values():
+        if len({clases[i] for i in integrantes}) > 1:
+            excluidas["etiquetas_contradictorias"] += len(integrantes)
+            continue
+        destino = min(particiones[i] for i in integrantes)
+        representante = min((i for i in integrantes if particiones[i] == destino), key=lambda i: rutas[i])
+        excluidas["duplicados"] += len(integrantes) - 1
+        excluidas["fuga"] += sum(1 for i in integrantes if particiones[i] != destino)
+        splits[PARTICIONES[destino]].append([str(rutas[representante]), str(clases[representante])])
+
+    for lista in splits.values():
+        lista.sort()
+    return {
+        "raiz": os.path.abspath(raiz),
+        "clases": sorted({str(c) for c in clases}),
+        "umbral_hamming": umbral,
+        "bits_hash": int(indice["lado"]) ** 2,
+        "splits": splits,
+        "excluidas": excluidas,
+    }
+
+
+
+# REPORTE
+
+def main():
+    parser = argparse.ArgumentParser(description="Casi-duplicados y fuga entre train/val/test")
+    parser.add_argument("--datos", default="../chest_xray", help="Raíz con train/, val/ y test/")
+    parser.add_argument("--lado", type=int, default=8, choices=[8, 16],
+                        help="Lado de la región DCT: 8 = 64 bits, 16 = 256 bits")
+    parser.add_argument("--umbral", type=int, default=None,
+                        help="Distancia de Hamming máxima (por defecto ~10%% de los bits)")
+    parser.add_argument("--indice", default=None, help="Índice de hashes (por defecto <datos>/indice_hashes.npz)")
+    parser.add_argument("--salida", default="manifiesto_limpio.json")
+    parser.add_argument("--reporte", default=None, help="JSON opcional con todos los pares encontrados")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    bits = args.lado * args.lado
+    umbral = args.umbral if args.umbral is not None else bits * 6 // 64
+    ruta_indice = args.indice or os.path.join(args.datos, "indice_hashes.npz")
+
+    indice = construir_indice(args.datos, ruta_indice, args.lado, args.procesos)
+    validos = np.flatnonzero(indice["validos"])
+    inicio = time.perf_counter()
+    pares_i, pares_j, distancias = pares_cercanos(indice["hashes"][validos], umbral)
+    pares_i, pares_j = validos[pares_i], validos[pares_j]
+    print(f"Búsqueda de Hamming (umbral {umbral}/{bits} bits): {len(pares_i)} pares en "
+          f"{time.perf_counter() - inicio:.2f} s")
+
+    particiones, clases, rutas = indice["particiones"], indice["clases"], indice["rutas"]
+    conteo = defaultdict(int)
+    for i, j in zip(pares_i, pares_j):
+        a, b = sorted((PARTICIONES[particiones[i]], PARTICIONES[particiones[j]]), key=PARTICIONES.index)
+        conteo[f"{a}-{b}"] += 1
+
+    grupos = agrupar(len(rutas), pares_i, pares_j)
+    print(f"\n{'Pares':<14}{'Cantidad':>10}")
+    print("-" * 24)
+    for a in PARTICIONES:
+        for b in PARTICIONES[PARTICIONES.index(a):]:
+            marca = "" if a == b else "  <- fuga"
+            print(f"{a + '-' + b:<14}{conteo[f'{a}-{b}']:>10}{marca}")
+
+    en_test = particiones == PARTICIONES.index("test")
+    fuga_test = {j if en_test[j] else i for i, j in zip(pares_i, pares_j) if en_test[i] != en_test[j]}
+    print(f"\nImágenes de test con un casi-duplicado en train/val: {len(fuga_test)} de {int(en_test.sum())}")
+
+    manifiesto = manifiesto_limpio(indice, grupos, args.datos, umbral)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=1, ensure_ascii=False)
+    tamanos = ", ".join(f"{p}={len(manifiesto['splits'][p])}" for p in PARTICIONES)
+    print(f"Manifiesto limpio en '{args.salida}': {tamanos} | excluidas: {manifiesto['excluidas']}")
+
+    if args.reporte:
+        with open(args.reporte, "w", encoding="utf-8") as f:
+            json.dump([
+                {"a": str(rutas[i]), "b": str(rutas[j]), "distancia": int(d),
+                 "clases_distintas": bool(clases[i] != clases[j])}
+                for i, j, d in zip(pares_i, pares_j, distancias)
+            ], f, indent=1, ensure_ascii=False)
+        print(f"Pares guardados en '{args.reporte}'")
+
+
+if __name__ == "__main__":
+    main()
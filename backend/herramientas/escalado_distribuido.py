@@ -0,0 +1,131 @@
+# backend/herramientas/escalado_distribuido.py
+"""
+Eficiencia de escalado del entrenamiento distribuido (model.py --distribuido).
+
+Para cada cantidad de trabajadores N lanza N procesos locales de model.py con
+su TF_CONFIG (un puerto local por trabajador), mide las imágenes/s de la
+fase 1 durante --pasos pasos (model.py --pasos-medicion) y reporta la
+aceleración y la eficiencia respecto a 1 trabajador:
+
+    eficiencia(N) = rendimiento(N) / (N × rendimiento(1))
+
+En una sola máquina los trabajadores comparten las CPUs (los hilos se
+reparten entre ellos), así que la prueba local valida el clúster y mide el
+costo de sincronización; la medición en varios nodos se hace lanzando
+model.py --distribuido en cada uno con las direcciones reales en TF_CONFIG.
+
+Uso (desde backend/):
+    python -m herramientas.escalado_distribuido --trabajadores 1 2 4
+    python -m herramientas.escalado_distribuido --trabajadores 1 2 --pasos 50 --alpha 0.35 --tamano 160
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+
+from config.ajustes import TAMANO_ENTRADA_MODELO
+
+DIRECTORIO_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def puertos_libres(cantidad: int) -> list:
+    """Puertos locales libres (se mantienen abiertos hasta tener todos para no repetirlos)"""
+    sockets = []
+    for _ in range(cantidad):
+        s = socket.socket()
+        s.bind(("localhost", 0))
+        sockets.append(s)
+    puertos = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return puertos
+
+
+def medir(trabajadores: int, args, directorio: str) -> dict:
+    """Lanzar `trabajadores` procesos de model.py como un clúster local y leer la medición del jefe"""
+    cluster = {"worker": [f"localhost:{puerto}" for puerto in puertos_libres(trabajadores)]}
+    hilos = max(1, (os.cpu_count() or 1) // trabajadores)
+    salida_medicion = os.path.join(directorio, f"medicion-{trabajadores}.json")
+
+    comando = [
+        sys.executable, "model.py", "--distribuido",
+        "--pasos-medicion", str(args.pasos),
+        "--salida-medicion", salida_medicion,
+        "--hilos", str(hilos),
+        "--alpha", str(args.alpha),
+        "--tamano", str(args.tamano),
+    ]
+    if args.manifiesto:
+        comando += ["--manifiesto", args.manifiesto]
+
+    procesos = []
+    for i in range(trabajadores):
+        entorno = dict(
+            os.environ,
+            TF_CONFIG=json.dumps({"cluster": cluster, "task": {"type": "worker", "index": i}}),
+            CUDA_VISIBLE_DEVICES="",  # Nodos de CPU
+            TF_CPP_MIN_LOG_LEVEL="2",
+        )
+        registro = open(os.path.join(directorio, f"trabajador-{trabajadores}-{i}.log"), "w", encoding="utf-8")
+        procesos.append((subprocess.Popen(comando, cwd=DIRECTORIO_BACKEND, env=entorno,
+                                          stdout=registro, stderr=subprocess.STDOUT), registro))
+
+    try:
+        codigos = [proceso.wait(timeout=args.tiempo_maximo) for proceso, _ in procesos]
+    except subprocess.TimeoutExpired:
+        codigos = [None]
+    finally:
+        for proceso, registro in procesos:
+            if proceso.poll() is None:
+                proceso.kill()
+            registro.close()
+
+    if any(codigo != 0 for codigo in codigos) or not os.path.exists(salida_medicion):
+        raise SystemExit(f"Falló la medición con {trabajadores} trabajador(es) (códigos {codigos}); "
+                         f"ver registros trabajador-{trabajadores}-*.log en {directorio}")
+    with open(salida_medicion, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eficiencia de escalado del entrenamiento multi-worker")
+    parser.add_argument("--trabajadores", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pasos", type=int, default=30, help="Pasos medidos (después del calentamiento)")
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--tamano", type=int, default=TAMANO_ENTRADA_MODELO)
+    parser.add_argument("--manifiesto", default=None)
+    parser.add_argument("--tiempo-maximo", type=float, default=1800, help="Segundos máximos por medición")
+    parser.add_argument("--reporte", default="escalado_distribuido.json")
+    args = parser.parse_args()
+
+    # La eficiencia se mide respecto a 1 trabajador
+    cantidades = sorted(set(args.trabajadores) | {1})
+    directorio = tempfile.mkdtemp(prefix="escalado_")
+    print(f"Registros de los trabajadores en {directorio}")
+
+    mediciones = []
+    for n in cantidades:
+        print(f"Midiendo con {n} trabajador(es)...")
+        mediciones.append(medir(n, args, directorio))
+
+    base = mediciones[0]["imagenes_por_segundo"]
+    print(f"\n{'Trabajadores':<14}{'Lote global':>12}{'img/s':>10}{'Aceleración':>13}{'Eficiencia':>12}")
+    print("-" * 61)
+    for medicion in mediciones:
+        n = medicion["trabajadores"]
+        aceleracion = medicion["imagenes_por_segundo"] / base
+        medicion["aceleracion"] = aceleracion
+        medicion["eficiencia"] = aceleracion / n
+        print(f"{n:<14}{medicion['batch_global']:>12}{medicion['imagenes_por_segundo']:>10.1f}"
+              f"{aceleracion:>12.2f}x{medicion['eficiencia'] * 100:>11.0f}%")
+
+    with open(args.reporte, "w", encoding="utf-8") as f:
+        json.dump({"cpus": os.cpu_count(), "pasos": args.pasos, "mediciones": mediciones}, f, indent=2)
+    print(f"\nReporte guardado en '{args.reporte}'")
+
+
+if __name__ == "__main__":
+    main()
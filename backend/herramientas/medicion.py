@@ -0,0 +1,47 @@
+# backend/herramientas/medicion.py
+"""Utilidades compartidas para medir precisión y latencia de modelos."""
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from servicios.inferencia import CLASES
+
+
+def evaluar_directorio(modelo, directorio: str, batch_size: int = 32):
+    """
+    Salidas del modelo y etiquetas de un directorio (a la resolución del modelo).
+    Devuelve (salidas, etiquetas, índice de la clase PNEUMONIA).
+    """
+    _, alto, ancho, _ = modelo.input_shape
+    datos = tf.keras.utils.image_dataset_from_directory(
+        directorio,
+        label_mode="int",
+        image_size=(alto, ancho),
+        batch_size=batch_size,
+        shuffle=False
+    )
+    preds, etiquetas = [], []
+    for imagenes, lote_etiquetas in datos:
+        preds.append(modelo.predict(imagenes, verbose=0))
+        etiquetas.append(lote_etiquetas.numpy())
+    return np.concatenate(preds), np.concatenate(etiquetas), datos.class_names.index(CLASES[1])
+
+
+def metricas(preds: np.ndarray, etiquetas: np.ndarray, indice_neumonia: int):
+    """(precisión, recall de PNEUMONIA)"""
+    clases = preds.argmax(axis=1)
+    neumonia = etiquetas == indice_neumonia
+    return float(np.mean(clases == etiquetas)), float(np.mean(clases[neumonia] == indice_neumonia))
+
+
+def latencia_media(modelo, repeticiones: int = 50, batch_size: int = 1) -> float:
+    """Latencia media (s) de una predicción en CPU"""
+    _, alto, ancho, canales = modelo.input_shape
+    arr = np.random.uniform(0, 255, (batch_size, alto, ancho, canales)).astype(np.float32)
+    with tf.device("/CPU:0"):
+        modelo.predict(arr, verbose=0)
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            modelo.predict(arr, verbose=0)
+    return (time.perf_counter() - inicio) / repeticiones
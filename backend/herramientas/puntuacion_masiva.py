@@ -0,0 +1,279 @@
+# backend/herramientas/puntuacion_masiva.py
+"""
+Puntuación masiva de radiografías para auditorías.
+
+Recorre un árbol de directorios (.jpg, .jpeg, .png), decodifica las imágenes
+en un pool de procesos y las evalúa en lotes con el modelo (.keras o .tflite).
+Los resultados se escriben por partes en el directorio de salida
+(parte-00000.parquet o .csv), cada una de forma atómica: si la ejecución se
+interrumpe, al relanzar el mismo comando se omiten las imágenes ya escritas.
+Al terminar se unen las partes en resultados.<formato> y se reportan las
+imágenes por segundo.
+
+Uso (desde backend/):
+    python -m herramientas.puntuacion_masiva --entrada /datos/estudios --salida auditoria_2026
+    python -m herramientas.puntuacion_masiva --entrada /datos/estudios --salida auditoria_2026 --formato csv --lote 128
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from collections import deque
+from multiprocessing import get_context
+
+import numpy as np
+from PIL import Image
+
+from config.ajustes import TAMANO_ENTRADA_MODELO, MAX_PIXELES_IMAGEN
+
+EXTENSIONES = (".jpg", ".jpeg", ".png")
+
+# Mismo límite que el servidor contra "bombas de descompresión"
+Image.MAX_IMAGE_PIXELS = MAX_PIXELES_IMAGEN
+
+COLUMNAS = ["ruta", "diagnostico", "confianza", "prob_normal", "prob_neumonia", "error"]
+
+
+
+# DECODIFICACIÓN (PROCESOS DEL POOL)
+
+def decodificar_lote(tarea):
+    """
+    Decodificar un lote de rutas a (n, tamano, tamano, 3) uint8, igual que
+    ImagenCargada.decodificar. Las imágenes ilegibles quedan en cero con su error.
+    """
+    raiz, rutas, tamano = tarea
+    arr = np.zeros((len(rutas), tamano, tamano, 3), dtype=np.uint8)
+    errores = [None] * len(rutas)
+    for i, ruta in enumerate(rutas):
+        try:
+            with Image.open(os.path.join(raiz, ruta)) as img:
+                img.draft("RGB", (tamano, tamano))
+                arr[i] = np.asarray(img.convert("RGB").resize((tamano, tamano)))
+        except Exception as e:
+            errores[i] = f"{type(e).__name__}: {e}"
+    return rutas, arr, errores
+
+
+
+# SALIDA POR PARTES (CHECKPOINT)
+
+def listar_imagenes(raiz: str):
+    """Rutas relativas de las imágenes del árbol, en orden estable"""
+    rutas = []
+    for directorio, subdirectorios, archivos in os.walk(raiz):
+        subdirectorios.sort()
+        for archivo in sorted(archivos):
+            if archivo.lower().endswith(EXTENSIONES):
+                rutas.append(os.path.relpath(os.path.join(directorio, archivo), raiz))
+    return rutas
+
+
+def partes(salida: str, formato: str):
+    return sorted(glob.glob(os.path.join(salida, f"parte-*.{formato}")))
+
+
+def rutas_de_parte(ruta: str, formato: str) -> list:
+    """Columna `ruta` de una parte (sin convertir nombres como "NA" en nulos)"""
+    import pandas as pd
+    if formato == "parquet":
+        return pd.read_parquet(ruta, columns=["ruta"])["ruta"].tolist()
+    return pd.read_csv(ruta, usecols=["ruta"], dtype=str, keep_default_na=False)["ruta"].tolist()
+
+
+def escribir_parte(salida: str, formato: str, indice: int, filas: list) -> str:
+    """Escribir una parte con nombre temporal y renombrarla (nunca queda a medias)"""
+    import pandas as pd
+    datos = pd.DataFrame(filas, columns=COLUMNAS)
+    ruta = os.path.join(salida, f"parte-{indice:05d}.{formato}")
+    temporal = ruta + ".tmp"
+    if formato == "parquet":
+        import pyarrow as pa
+        # Esquema fijo: una parte sin errores no debe inferir la columna `error` como nula
+        esquema = pa.schema([
+            ("ruta", pa.string()), ("diagnostico", pa.string()), ("confianza", pa.float64()),
+            ("prob_normal", pa.float64()), ("prob_neumonia", pa.float64()), ("error", pa.string()),
+        ])
+        datos.to_parquet(temporal, index=False, schema=esquema)
+    else:
+        datos.to_csv(temporal, index=False)
+    with open(temporal, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def preparar_salida(args) -> set:
+    """
+    Crear o validar el directorio de salida y devolver las rutas ya puntuadas.
+    La configuración se guarda en meta.json: retomar con otro modelo o tamaño
+    mezclaría resultados incomparables.
+    """
+    os.makedirs(args.salida, exist_ok=True)
+    ruta_meta = os.path.join(args.salida, "meta.json")
+    meta = {"entrada": os.path.abspath(args.entrada), "modelo": os.path.abspath(args.modelo),
+            "tamano": args.tamano, "formato": args.formato}
+
+    if args.reiniciar:
+        for ruta in partes(args.salida, args.formato) + glob.glob(os.path.join(args.salida, "*.tmp")):
+            os.remove(ruta)
+    elif os.path.exists(ruta_meta):
+        with open(ruta_meta, encoding="utf-8") as f:
+            anterior = json.load(f)
+        if anterior != meta:
+            raise SystemExit(f"La salida '{args.salida}' es de otra configuración ({anterior}); use --reiniciar u otra --salida")
+
+    with open(ruta_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    hechas = set()
+    for ruta in partes(args.salida, args.formato):
+        hechas.update(rutas_de_parte(ruta, args.formato))
+    return hechas
+
+
+def consolidar(salida: str, formato: str) -> str:
+    """Unir todas las partes en resultados.<formato>"""
+    ruta = os.path.join(salida, f"resultados.{formato}")
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        # Por grupos de filas: no se carga el resultado completo en memoria
+        escritor = None
+        for parte in partes(salida, formato):
+            tabla = pq.read_table(parte)
+            escritor = escritor or pq.ParquetWriter(ruta, tabla.schema)
+            escritor.write_table(tabla)
+        if escritor:
+            escritor.close()
+    else:
+        # CSV: concatenar el texto de las partes con una sola cabecera
+        with open(ruta, "w", encoding="utf-8", newline="") as destino:
+            for i, parte in enumerate(partes(salida, formato)):
+                with open(parte, encoding="utf-8", newline="") as origen:
+                    cabecera = origen.readline()
+                    if i == 0:
+                        destino.write(cabecera)
+                    destino.writelines(origen)
+    return ruta
+
+
+
+# PUNTUACIÓN
+
+def puntuar(args, pendientes: list):
+    # El pool se crea antes de importar TensorFlow: los procesos solo cargan PIL y numpy
+    pool = get_context("spawn").Pool(args.procesos)
+
+    import tensorflow as tf
+    from servicios.inferencia import CLASES
+    from servicios.modelo_tflite import cargar_modelo
+
+    modelo = cargar_modelo(args.modelo)
+    _, alto, ancho, _ = modelo.input_shape
+    if (alto, ancho) != (args.tamano, args.tamano):
+        pool.terminate()
+        raise SystemExit(f"El modelo espera {alto}x{ancho}; --tamano es {args.tamano}")
+
+    filas = []
+    procesadas = errores = 0
+    tiempo_modelo = 0.0
+    siguiente_parte = len(partes(args.salida, args.formato))
+    inicio = time.perf_counter()
+
+    def evaluar(decodificado):
+        """Evaluar un lote decodificado y agregar sus filas"""
+        nonlocal procesadas, errores, tiempo_modelo
+        rutas, arr, fallos = decodificado
+        validas = np.array([fallo is None for fallo in fallos])
+        probs = np.zeros((len(rutas), len(CLASES)), dtype=np.float32)
+        if validas.any():
+            inicio_modelo = time.perf_counter()
+            # Misma salida que el servidor: softmax sobre la salida del modelo
+            probs[validas] = tf.nn.softmax(modelo.predict(arr[validas].astype(np.float32), verbose=0)).numpy()
+            tiempo_modelo += time.perf_counter() - inicio_modelo
+
+        for i, ruta in enumerate(rutas):
+            if fallos[i] is None:
+                idx = int(np.argmax(probs[i]))
+                filas.append((ruta, CLASES[idx], round(float(probs[i, idx] * 100), 2),
+                              float(probs[i, 0]), float(probs[i, 1]), None))
+            else:
+                filas.append((ruta, None, None, None, None, fallos[i]))
+        procesadas += len(rutas)
+        errores += int((~validas).sum())
+
+    def volcar():
+        nonlocal filas, siguiente_parte
+        if filas:
+            escribir_parte(args.salida, args.formato, siguiente_parte, filas)
+            siguiente_parte += 1
+            filas = []
+
+    # Decodificación adelantada acotada: como mucho 2 lotes por proceso en vuelo
+    en_vuelo = deque()
+    try:
+        for i in range(0, len(pendientes), args.lote):
+            tarea = (args.entrada, pendientes[i:i + args.lote], args.tamano)
+            en_vuelo.append(pool.apply_async(decodificar_lote, (tarea,)))
+            if len(en_vuelo) >= 2 * args.procesos:
+                evaluar(en_vuelo.popleft().get())
+            if len(filas) >= args.filas_por_parte:
+                volcar()
+                reportar(procesadas, len(pendientes), errores, inicio, tiempo_modelo)
+        while en_vuelo:
+            evaluar(en_vuelo.popleft().get())
+        volcar()
+    except KeyboardInterrupt:
+        # Guardar lo ya evaluado: al relanzar se continúa desde aquí
+        volcar()
+        pool.terminate()
+        print(f"\nInterrumpido: {procesadas} imágenes guardadas; relance el mismo comando para continuar")
+        raise SystemExit(1)
+    pool.close()
+    pool.join()
+
+    total = time.perf_counter() - inicio
+    print(f"\nPuntuadas {procesadas} imágenes ({errores} con error) en {total:.1f} s")
+    print(f"  Throughput: {procesadas / total:.1f} img/s")
+    print(f"  Inferencia: {tiempo_modelo:.1f} s ({procesadas / max(tiempo_modelo, 1e-9):.1f} img/s solo modelo)")
+
+
+def reportar(procesadas: int, total: int, errores: int, inicio: float, tiempo_modelo: float):
+    transcurrido = time.perf_counter() - inicio
+    print(f"  {procesadas}/{total} ({procesadas / transcurrido:.1f} img/s, "
+          f"modelo {tiempo_modelo / transcurrido * 100:.0f}% del tiempo, {errores} errores)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Puntuación masiva de radiografías con checkpoint")
+    parser.add_argument("--entrada", required=True, help="Directorio raíz con las radiografías")
+    parser.add_argument("--salida", required=True, help="Directorio de resultados (partes, meta.json)")
+    parser.add_argument("--modelo", default=None, help="Modelo .keras o .tflite (por defecto la versión activa)")
+    parser.add_argument("--formato", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--lote", type=int, default=64, help="Imágenes por lote de inferencia")
+    parser.add_argument("--procesos", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Procesos de decodificación")
+    parser.add_argument("--filas-por-parte", type=int, default=2048)
+    parser.add_argument("--tamano", type=int, default=TAMANO_ENTRADA_MODELO)
+    parser.add_argument("--reiniciar", action="store_true", help="Descartar resultados anteriores")
+    args = parser.parse_args()
+
+    if args.modelo is None:
+        from herramientas.autoajuste_cpu import modelo_por_defecto
+        args.modelo = modelo_por_defecto()
+
+    hechas = preparar_salida(args)
+    rutas = listar_imagenes(args.entrada)
+    pendientes = [ruta for ruta in rutas if ruta not in hechas]
+    print(f"Imágenes: {len(rutas)} | ya puntuadas: {len(rutas) - len(pendientes)} | pendientes: {len(pendientes)}")
+
+    if pendientes:
+        puntuar(args, pendientes)
+
+    ruta = consolidar(args.salida, args.formato)
+    print(f"Resultados consolidados en '{ruta}'")
+
+
+if __name__ == "__main__":
+    main()
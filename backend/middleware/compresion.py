@@ -0,0 +1,121 @@
+# backend/middleware/compresion.py
+import gzip
+
+from config.ajustes import UMBRAL_COMPRESION, NIVEL_GZIP, NIVEL_BROTLI
+
+try:
+    import brotli
+except ImportError:  # Sin brotli: solo gzip
+    brotli = None
+
+# Tipos de contenido que vale la pena comprimir (las imágenes ya van comprimidas)
+TIPOS_COMPRIMIBLES = (b"application/json", b"text/", b"application/javascript", b"image/svg+xml")
+
+COMPRESORES = {
+    b"gzip": lambda cuerpo: gzip.compress(cuerpo, compresslevel=NIVEL_GZIP, mtime=0),
+}
+if brotli is not None:
+    COMPRESORES[b"br"] = lambda cuerpo: brotli.compress(cuerpo, quality=NIVEL_BROTLI)
+
+# Orden de preferencia cuando el cliente acepta varias codificaciones
+PREFERENCIA = (b"br", b"gzip")
+
+
+
+# NEGOCIACIÓN DE CODIFICACIÓN
+
+def elegir_codificacion(accept_encoding: bytes):
+    """Codificación soportada preferida entre las aceptadas (q > 0), o None"""
+    aceptadas = set()
+    for parte in accept_encoding.lower().split(b","):
+        nombre, _, parametros = parte.strip().partition(b";")
+        q = parametros.strip()
+        if q.startswith(b"q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        aceptadas.add(nombre.strip())
+    for codificacion in PREFERENCIA:
+        if codificacion in COMPRESORES and (codificacion in aceptadas or b"*" in aceptadas):
+            return codificacion
+    return None
+
+
+
+# MIDDLEWARE DE COMPRESIÓN (ASGI PURO)
+
+class MiddlewareCompresion:
+    """
+    Comprime con brotli o gzip (según Accept-Encoding) las respuestas de un
+    solo mensaje cuyo cuerpo supere UMBRAL_COMPRESION bytes.
+    Las respuestas en streaming (more_body) y las que ya traen
+    Content-Encoding pasan sin tocar, igual que las de tipos no comprimibles.
+    """
+
+    def __init__(self, app, umbral: int = UMBRAL_COMPRESION):
+        self.app = app
+        self.umbral = umbral
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codificacion = None
+        for nombre, valor in scope["headers"]:
+            if nombre == b"accept-encoding":
+                codificacion = elegir_codificacion(valor)
+                break
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        transparente = False
+
+        async def enviar_comprimido(mensaje):
+            nonlocal inicio, transparente
+            if transparente:
+                await send(mensaje)
+                return
+
+            if mensaje["type"] == "http.response.start":
+                cabeceras = dict(mensaje.get("headers", []))
+                tipo = cabeceras.get(b"content-type", b"")
+                longitud = cabeceras.get(b"content-length")
+                if (
+                    b"content-encoding" in cabeceras
+                    or not tipo.startswith(TIPOS_COMPRIMIBLES)
+                    or (longitud is not None and int(longitud) < self.umbral)
+                ):
+                    transparente = True
+                    await send(mensaje)
+                else:
+                    # Esperar al primer fragmento del cuerpo para decidir
+                    inicio = mensaje
+                return
+
+            if mensaje["type"] != "http.response.body" or inicio is None:
+                await send(mensaje)
+                return
+
+            cuerpo = mensaje.get("body", b"")
+            if mensaje.get("more_body", False) or len(cuerpo) < self.umbral:
+                # Streaming o cuerpo pequeño: reenviar tal cual
+                transparente = True
+                await send(inicio)
+                await send(mensaje)
+                return
+
+            comprimido = COMPRESORES[codificacion](cuerpo)
+            cabeceras = [(n, v) for n, v in inicio.get("headers", []) if n != b"content-length"]
+            cabeceras.append((b"content-encoding", codificacion))
+            cabeceras.append((b"content-length", str(len(comprimido)).encode("latin-1")))
+            cabeceras.append((b"vary", b"Accept-Encoding"))
+            transparente = True
+            await send({**inicio, "headers": cabeceras})
+            await send({"type": "http.response.body", "body": comprimido})
+
+        await self.app(scope, receive, enviar_comprimido)
@@ -0,0 +1,233 @@
+# backend/middleware/global_asgi.py
+import os
+
+from fastapi.responses import JSONResponse
+
+from config.conexion import get_supabase
+from servicios.admision import control_admision, respuesta_sobrecarga
+from servicios.carga_imagen import RUTAS_CARGA_IMAGEN, CuerpoDemasiadoGrande, excede_limite_cuerpo, receive_limitado
+from servicios.limite_tasa import (
+    limitador_tasa, grupo_tasa_de, clave_cliente, clave_token_invalido, respuesta_limite_tasa
+)
+from servicios.resiliencia import DependenciaNoDisponible, llamar_supabase
+from servicios.versiones_persona import RUTAS_CONDICIONALES, versiones_persona, no_modificado
+
+
+
+# CORS (CALCULADO UNA SOLA VEZ AL IMPORTAR)
+
+def get_origins():
+    env = os.getenv("NODE_ENV", "development")
+    if env == "production":
+        return [
+            "https://neumonitor2.vercel.app",
+            "https://neumonitor2.onrender.com",
+        ]
+    return [
+        "http://localhost:3000",
+        "http://localhost:3001",
+        "http://127.0.0.1:3000",
+        "http://127.0.0.1:3001",
+    ]
+
+
+ORIGENES_PERMITIDOS = frozenset(origen.encode("latin-1") for origen in get_origins())
+
+# Cabeceras CORS comunes a todas las respuestas
+CABECERAS_CORS = (
+    (b"access-control-allow-credentials", b"true"),
+    (b"access-control-allow-methods", b"GET, POST, PUT, DELETE, OPTIONS"),
+    (b"access-control-allow-headers", b"Authorization, Content-Type, Accept"),
+    (b"access-control-expose-headers", b"*"),
+)
+
+# Rutas que se atienden como anónimas si la sesión no se puede verificar
+# (Supabase no disponible); el resto responde 503
+RUTAS_DEGRADABLES = {"/", "/salud", "/predecir"}
+
+
+
+# AUTENTICACIÓN (TOKEN = ID DE PERSONA)
+
+def token_de(autorizacion: bytes):
+    """Token de la cabecera Authorization: Bearer (None si no hay)"""
+    if autorizacion and autorizacion.startswith(b"Bearer "):
+        return autorizacion[7:].decode("latin-1").strip() or None
+    return None
+
+
+async def resolver_persona(autorizacion: bytes):
+    """
+    Persona asociada al token Bearer (None si no hay token o es inválido).
+    Lanza DependenciaNoDisponible si Supabase no responde.
+    """
+    try:
+        token = token_de(autorizacion)
+        if token:
+            supabase = get_supabase()
+            response_db = await llamar_supabase("consulta", lambda: (
+                supabase.table("persona")
+                .select("*")
+                .eq("id", token)
+                .single()
+                .execute()
+            ))
+            if response_db.data:
+                print(f"Usuario autenticado: {response_db.data.get('email')}")
+                return response_db.data
+            print("Token inválido")
+        else:
+            print("No hay token en la solicitud")
+    except DependenciaNoDisponible:
+        raise
+    except Exception as e:
+        print(f"Error en middleware: {e}")
+    return None
+
+
+
+# GET CONDICIONALES (ETAG / LAST-MODIFIED)
+
+def cabeceras_validacion(etag: str, ultima_modificacion: str):
+    """Validadores de la versión y caché privada que siempre revalida"""
+    return (
+        (b"etag", etag.encode("latin-1")),
+        (b"last-modified", ultima_modificacion.encode("latin-1")),
+        (b"cache-control", b"private, no-cache"),
+        (b"vary", b"Authorization"),
+    )
+
+
+
+# MIDDLEWARE GLOBAL (ASGI PURO)
+
+class MiddlewareGlobal:
+    """
+    Middleware ASGI único: CORS, límite de cuerpo, control de admisión,
+    GET condicionales, resolución del token y límite de tasa.
+    A diferencia de @app.middleware("http") no envuelve la respuesta: solo
+    agrega cabeceras al mensaje http.response.start y reenvía el cuerpo tal
+    cual, así las respuestas en streaming no se almacenan ni se copian.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ruta = scope["path"]
+        origen = autorizacion = longitud = si_no_coincide = si_modificado_desde = None
+        for nombre, valor in scope["headers"]:
+            if nombre == b"origin":
+                origen = valor
+            elif nombre == b"authorization":
+                autorizacion = valor
+            elif nombre == b"content-length":
+                longitud = valor
+            elif nombre == b"if-none-match":
+                si_no_coincide = valor.decode("latin-1")
+            elif nombre == b"if-modified-since":
+                si_modificado_desde = valor.decode("latin-1")
+
+        print(f"\n{'='*50}")
+        print(f"Solicitud: {scope['method']} {ruta}")
+
+        permitido = origen in ORIGENES_PERMITIDOS
+        validacion = ()
+        respuesta_iniciada = False
+
+        async def enviar_con_cors(mensaje):
+            nonlocal respuesta_iniciada
+            if mensaje["type"] == "http.response.start":
+                respuesta_iniciada = True
+                cabeceras = mensaje.setdefault("headers", [])
+                if not isinstance(cabeceras, list):
+                    cabeceras = mensaje["headers"] = list(cabeceras)
+                cabeceras.extend(CABECERAS_CORS)
+                if permitido:
+                    cabeceras.append((b"access-control-allow-origin", origen))
+                    cabeceras.append((b"vary", b"Origin"))
+                if mensaje["status"] in (200, 304):
+                    cabeceras.extend(validacion)
+            await send(mensaje)
+
+        if scope["method"] == "OPTIONS":
+            await JSONResponse(content={"message": "OK"})(scope, receive, enviar_con_cors)
+            return
+
+        if ruta in RUTAS_CARGA_IMAGEN and excede_limite_cuerpo(longitud and longitud.decode("latin-1")):
+            # Rechazar antes de leer el cuerpo de la solicitud
+            respuesta = JSONResponse(status_code=413, content={"detail": "Imagen demasiado grande"})
+            await respuesta(scope, receive, enviar_con_cors)
+            return
+
+        if ruta in RUTAS_CARGA_IMAGEN:
+            # Sin Content-Length (o si miente) el límite se aplica al leer el cuerpo
+            receive = receive_limitado(receive)
+
+        grupo = control_admision.grupo_de(ruta)
+        if not await control_admision.entrar(grupo):
+            # Grupo de rutas saturado en este worker (cola de espera llena o espera vencida)
+            await respuesta_sobrecarga()(scope, receive, enviar_con_cors)
+            return
+
+        try:
+            # Validadores leídos antes de consultar la BD: si hay una escritura
+            # concurrente, el cliente recibe un ETag viejo y vuelve a pedir el recurso
+            token = token_de(autorizacion)
+            validadores = None
+            if ruta in RUTAS_CONDICIONALES and scope["method"] == "GET" and token:
+                etag, ultima_modificacion, modificado = validadores = versiones_persona.validadores(token)
+                if versiones_persona.compartido and no_modificado(si_no_coincide, si_modificado_desde, etag, modificado):
+                    # El cliente ya tiene la versión actual: 304 sin resolver la persona ni consultar la BD
+                    validacion = cabeceras_validacion(etag, ultima_modificacion)
+                    await enviar_con_cors({"type": "http.response.start", "status": 304, "headers": []})
+                    await enviar_con_cors({"type": "http.response.body", "body": b""})
+                    return
+
+            # Límite de tasa antes de cualquier consulta a la BD: por token (= id de
+            # persona) o, sin sesión, por IP. Una IP que ya agotó su cubeta de tokens
+            # inválidos no puede seguir forzando búsquedas cambiando de token.
+            grupo_tasa = grupo_tasa_de(ruta)
+            if grupo_tasa:
+                espera = limitador_tasa.consumir(grupo_tasa, clave_cliente(scope, token))
+                if token and not espera:
+                    espera = limitador_tasa.consultar(grupo_tasa, clave_token_invalido(scope))
+                if espera > 0:
+                    await respuesta_limite_tasa(espera)(scope, receive, enviar_con_cors)
+                    return
+
+            estado = scope.setdefault("state", {})
+            sesion_verificada = True
+            try:
+                estado["persona"] = await resolver_persona(autorizacion)
+            except DependenciaNoDisponible as e:
+                sesion_verificada = False
+                estado["persona"] = None
+                print("Supabase no disponible: no se pudo verificar la sesión")
+                if ruta not in RUTAS_DEGRADABLES:
+                    respuesta = JSONResponse(status_code=e.status_code, content={"detail": e.detail}, headers=e.headers)
+                    await respuesta(scope, receive, enviar_con_cors)
+                    return
+
+            if validadores and estado["persona"]:
+                validacion = cabeceras_validacion(*validadores[:2])
+
+            if grupo_tasa and token and sesion_verificada and not estado["persona"]:
+                # Token que no es de ninguna persona: se cobra a la IP
+                limitador_tasa.consumir(grupo_tasa, clave_token_invalido(scope))
+
+            try:
+                await self.app(scope, receive, enviar_con_cors)
+            except CuerpoDemasiadoGrande as e:
+                # Normalmente FastAPI ya la convirtió en 413; esto cubre lecturas fuera de un endpoint
+                if respuesta_iniciada:
+                    raise
+                await JSONResponse(status_code=e.status_code, content={"detail": e.detail})(
+                    scope, receive, enviar_con_cors
+                )
+        finally:
+            control_admision.salir(grupo)
@@ -4,8 +4,81 @@ import tensorflow as tf
 from tensorflow.keras import layers, models
 from tensorflow.keras.applications import MobileNetV2  # Modelo preentrenado para transfer learning
 import os
+import argparse  # Parámetros de entrenamiento por línea de comandos
+import contextlib
+import json
+import math
+import random
+import secrets
+import shutil
+import tempfile
+import time
 import numpy as np  # Para manipulación de arreglos y cálculos numéricos
 
+from config.ajustes import TAMANO_ENTRADA_MODELO  # Resolución por defecto (compartida con el servidor)
+
+
+# PARÁMETROS DE ENTRENAMIENTO
+
+# Permiten entrenar variantes más livianas con este mismo pipeline
+# (ej. primera etapa de la cascada: python model.py --alpha 0.35 --tamano 160 --salida modelo_rapido.keras)
+# MobileNetV2 tiene pesos ImageNet para alpha 0.35, 0.5, 0.75, 1.0, 1.3, 1.4 y tamaños 96, 128, 160, 192, 224
+parser = argparse.ArgumentParser(description="Entrenamiento del modelo de detección de neumonía")
+parser.add_argument("--alpha", type=float, default=1.0, help="Multiplicador de ancho de MobileNetV2")
+parser.add_argument("--tamano", type=int, default=TAMANO_ENTRADA_MODELO, help="Resolución de entrada (alto = ancho)")
+parser.add_argument("--salida", default="modelo_neumonia_MobileNet.keras", help="Archivo del modelo final")
+parser.add_argument("--fase3", action="store_true",
+                    help="Fase 3 opcional: poda por magnitud + exportación int8 (.tflite)")
+parser.add_argument("--esparsidad", type=float, default=0.5, help="Fracción de pesos podados al final de la fase 3")
+parser.add_argument("--epocas-fase3", type=int, default=6)
+parser.add_argument("--tolerancia", type=float, default=0.01,
+                    help="Caída máxima de accuracy del modelo int8 respecto a la fase 2")
+parser.add_argument("--tolerancia-recall", type=float, default=0.005,
+                    help="Caída máxima de recall de PNEUMONIA del modelo int8, respecto a la fase 2 "
+                         "y respecto al modelo podado sin cuantizar")
+parser.add_argument("--manifiesto", default=None,
+                    help="Manifiesto limpio de herramientas.duplicados_dataset (particiones sin casi-duplicados)")
+parser.add_argument("--checkpoints", default=None,
+                    help="Directorio del estado completo del entrenamiento, para reanudar "
+                         "(por defecto checkpoints_entrenamiento/<salida>)")
+parser.add_argument("--reiniciar", action="store_true", help="Descartar los checkpoints y entrenar desde cero")
+parser.add_argument("--semilla", type=int, default=123, help="Semilla de los generadores aleatorios")
+parser.add_argument("--distribuido", action="store_true",
+                    help="Entrenamiento data-parallel multi-worker (el clúster se define con TF_CONFIG)")
+parser.add_argument("--hilos", type=int, default=0, help="Hilos intra-op de TensorFlow (0 = decide TensorFlow)")
+parser.add_argument("--pasos-medicion", type=int, default=0,
+                    help="Solo medir el rendimiento de la fase 1 durante estos pasos y terminar")
+parser.add_argument("--salida-medicion", default="medicion_entrenamiento.json")
+args = parser.parse_args()
+if args.checkpoints is None:
+    args.checkpoints = os.path.join("checkpoints_entrenamiento", os.path.splitext(os.path.basename(args.salida))[0])
+
+
+# ESTRATEGIA DE DISTRIBUCIÓN
+
+# Con --distribuido cada nodo ejecuta este mismo script con su TF_CONFIG
+# (herramientas/escalado_distribuido.py lo lanza como varios procesos locales).
+# MultiWorkerMirroredStrategy replica el modelo y promedia los gradientes en
+# cada paso; debe crearse antes de cualquier otra operación de TensorFlow.
+if args.hilos:
+    tf.config.threading.set_intra_op_parallelism_threads(args.hilos)
+    tf.config.threading.set_inter_op_parallelism_threads(min(2, args.hilos))
+
+if args.distribuido:
+    estrategia = tf.distribute.MultiWorkerMirroredStrategy()
+    cluster = estrategia.cluster_resolver.cluster_spec().as_dict()
+    tipo_tarea, indice_trabajador = estrategia.cluster_resolver.task_type, estrategia.cluster_resolver.task_id
+    num_trabajadores = sum(len(tareas) for tareas in cluster.values())
+    # El jefe (chief, o worker 0 si no hay chief) guarda checkpoints, evalúa y exporta
+    es_jefe = tipo_tarea == "chief" or (tipo_tarea == "worker" and indice_trabajador == 0 and "chief" not in cluster)
+else:
+    estrategia = tf.distribute.get_strategy()
+    indice_trabajador, num_trabajadores, es_jefe = 0, 1, True
+replicas = estrategia.num_replicas_in_sync
+
+# Semilla de Python, NumPy y TensorFlow (pesos iniciales, mezcla y augmentation)
+tf.keras.utils.set_random_seed(args.semilla)
+
 
 # CONFIGURACIÓN DE RUTAS DEL DATASET
 
@@ -13,45 +86,153 @@ train_dir = r'../chest_xray/train'  # Carpeta con imágenes de entrenamiento
 val_dir = r'../chest_xray/val'      # Carpeta con imágenes de validación
 test_dir = r'../chest_xray/test'    # Carpeta con imágenes de prueba
 
-batch_size = 16  # Tamaño del batch (cantidad de imágenes por iteración)
-img_height = 224  # Altura de la imagen para entrada del modelo
-img_width = 224   # Ancho de la imagen para entrada del modelo
+batch_size = 16  # Tamaño del batch (cantidad de imágenes por iteración, por réplica)
+batch_global = batch_size * replicas  # Imágenes por paso sumando todas las réplicas
+img_height = args.tamano  # Altura de la imagen para entrada del modelo
+img_width = args.tamano   # Ancho de la imagen para entrada del modelo
 
 
 # CARGA DEL DATASET
 
-print("Cargando set de entrenamiento...")
-train_ds = tf.keras.utils.image_dataset_from_directory(
-    train_dir,
-    seed=123,  # Semilla para reproducibilidad
-    label_mode='int',  # Etiquetas como enteros
-    image_size=(img_height, img_width),  # Redimensionar imágenes
-    batch_size=batch_size,
-    shuffle=True  # Mezclar datos
-)
+manifiesto = None
+if args.manifiesto:
+    with open(args.manifiesto, encoding="utf-8") as f:
+        manifiesto = json.load(f)
+    print(f"Usando manifiesto limpio '{args.manifiesto}' (umbral de Hamming {manifiesto['umbral_hamming']})")
+
+
+def archivos_de_particion(particion, directorio):
+    """
+    (rutas, etiquetas, clases) de una partición: del manifiesto si se usa, o
+    del directorio con las mismas clases que image_dataset_from_directory
+    """
+    if manifiesto:
+        clases = manifiesto["clases"]
+        entradas = manifiesto["splits"][particion]
+        rutas = [os.path.join(manifiesto["raiz"], ruta) for ruta, _ in entradas]
+        return rutas, [clases.index(clase) for _, clase in entradas], clases
+
+    clases = sorted(d for d in os.listdir(directorio) if os.path.isdir(os.path.join(directorio, d)))
+    rutas, etiquetas = [], []
+    for etiqueta, clase in enumerate(clases):
+        for archivo in sorted(os.listdir(os.path.join(directorio, clase))):
+            if archivo.lower().endswith((".jpg", ".jpeg", ".png", ".bmp", ".gif")):
+                rutas.append(os.path.join(directorio, clase, archivo))
+                etiquetas.append(etiqueta)
+    return rutas, etiquetas, clases
+
+
+def cargar_imagen(ruta, etiqueta):
+    img = tf.io.decode_image(tf.io.read_file(ruta), channels=3, expand_animations=False)
+    return tf.image.resize(img, (img_height, img_width)), etiqueta
+
+
+def dataset_de_manifiesto(particion, shuffle):
+    """
+    Mismo formato que image_dataset_from_directory (imágenes RGB float32
+    redimensionadas, etiquetas int y class_names) a partir de una partición
+    del manifiesto de herramientas.duplicados_dataset
+    """
+    rutas, etiquetas, clases = archivos_de_particion(particion, None)
+    print(f"{len(rutas)} imágenes de {len(clases)} clases en '{particion}' del manifiesto")
+
+    ds = tf.data.Dataset.from_tensor_slices((rutas, etiquetas))
+    if shuffle:
+        ds = ds.shuffle(len(rutas), seed=args.semilla)
+    ds = ds.map(cargar_imagen, num_parallel_calls=tf.data.AUTOTUNE).batch(batch_size)
+    ds.class_names = clases
+    return ds
+
+
+def dataset_distribuido(particion, directorio, shuffle):
+    """
+    Dataset de fit() con --distribuido y sus pasos por época. Cada trabajador
+    lee y decodifica solo su fracción (shard antes de decodificar) y arma
+    lotes por réplica. Se repite sin fin: con steps_per_epoch todos los
+    trabajadores dan los mismos pasos aunque los shards difieran en una imagen.
+    """
+    rutas, etiquetas, _ = archivos_de_particion(particion, directorio)
+    print(f"Trabajador {indice_trabajador}: shard de ~{math.ceil(len(rutas) / num_trabajadores)} "
+          f"de {len(rutas)} imágenes de '{particion}' por época")
+
+    def crear(contexto):
+        ds = tf.data.Dataset.from_tensor_slices((rutas, etiquetas))
+        if shuffle:
+            # Misma semilla en todos los trabajadores: permutación común y shards disjuntos
+            ds = ds.shuffle(len(rutas), seed=args.semilla)
+        ds = ds.repeat().shard(contexto.num_input_pipelines, contexto.input_pipeline_id)
+        ds = ds.map(cargar_imagen, num_parallel_calls=tf.data.AUTOTUNE)
+        return ds.batch(contexto.get_per_replica_batch_size(batch_global)).prefetch(tf.data.AUTOTUNE)
+
+    return estrategia.distribute_datasets_from_function(crear), math.ceil(len(rutas) / batch_global)
 
-print("Cargando set de validación...")
-val_ds = tf.keras.utils.image_dataset_from_directory(
-    val_dir,
-    seed=123,
-    label_mode='int',
-    image_size=(img_height, img_width),
-    batch_size=batch_size,
-    shuffle=False
-)
 
-# Obtener nombres de clases y cantidad de clases
-class_names = train_ds.class_names
-num_classes = len(class_names)
-print(f"Clases encontradas: {class_names}")
+AUTOTUNE = tf.data.AUTOTUNE
 
 
-# OPTIMIZACIÓN DEL PIPELINE
+def cargar_datasets_locales():
+    """
+    train_ds y val_ds completos (con cache y prefetch) y los nombres de las clases.
+    Sin --distribuido alimentan fit(); con --distribuido solo los crea el jefe,
+    después del entrenamiento, para evaluar y para la fase 3.
+    """
+    print("Cargando set de entrenamiento...")
+    if manifiesto:
+        train_ds = dataset_de_manifiesto("train", shuffle=True)
+    else:
+        train_ds = tf.keras.utils.image_dataset_from_directory(
+            train_dir,
+            seed=args.semilla,  # Semilla para reproducibilidad
+            label_mode='int',  # Etiquetas como enteros
+            image_size=(img_height, img_width),  # Redimensionar imágenes
+            batch_size=batch_size,
+            shuffle=True  # Mezclar datos
+        )
+
+    print("Cargando set de validación...")
+    if manifiesto:
+        val_ds = dataset_de_manifiesto("val", shuffle=False)
+    else:
+        val_ds = tf.keras.utils.image_dataset_from_directory(
+            val_dir,
+            seed=args.semilla,
+            label_mode='int',
+            image_size=(img_height, img_width),
+            batch_size=batch_size,
+            shuffle=False
+        )
+
+    # Cache y prefetch permiten acelerar el entrenamiento evitando cuellos de botella
+    return (train_ds.cache().shuffle(1000).prefetch(buffer_size=AUTOTUNE),
+            val_ds.cache().prefetch(buffer_size=AUTOTUNE),
+            train_ds.class_names)
+
+
+# Datos de fit(): los datasets completos o, con --distribuido, solo el shard de cada
+# trabajador (ninguno arma ni cachea el dataset completo para entrenar)
+pasos_entrenamiento = pasos_validacion = None
+if args.distribuido:
+    train_ds = val_ds = None
+    class_names = archivos_de_particion("train", train_dir)[2]
+    datos_entrenamiento, pasos_entrenamiento = dataset_distribuido("train", train_dir, shuffle=True)
+    datos_validacion, pasos_validacion = dataset_distribuido("val", val_dir, shuffle=False)
+    print(f"Trabajador {indice_trabajador} de {num_trabajadores} ({replicas} réplicas): "
+          f"lote global {batch_global}, {pasos_entrenamiento} pasos por época")
+    hosts = {direccion.rsplit(":", 1)[0] for tareas in cluster.values() for direccion in tareas}
+    if len(hosts) == 1:
+        print(f"Los {num_trabajadores} trabajadores están en un solo host ({hosts.pop()}): comparten sus CPUs "
+              f"y su disco; cada uno decodifica solo su shard, sin cache en memoria")
+else:
+    train_ds, val_ds, class_names = cargar_datasets_locales()
+    datos_entrenamiento, datos_validacion = train_ds, val_ds
 
-# Cache y prefetch permiten acelerar el entrenamiento evitando cuellos de botella
-AUTOTUNE = tf.data.AUTOTUNE
-train_ds = train_ds.cache().shuffle(1000).prefetch(buffer_size=AUTOTUNE)
-val_ds = val_ds.cache().prefetch(buffer_size=AUTOTUNE)
+num_classes = len(class_names)
+print(f"Clases encontradas: {class_names}")
+
+# Variables del modelo y optimizadores se crean dentro del scope de la estrategia
+# (se cierra al terminar la fase 2)
+alcance_estrategia = contextlib.ExitStack()
+alcance_estrategia.enter_context(estrategia.scope())
 
 
 # DATA AUGMENTATION MEJORADO
@@ -71,6 +252,7 @@ data_augmentation = tf.keras.Sequential([
 
 base_model = MobileNetV2(
     input_shape=(img_height, img_width, 3),
+    alpha=args.alpha,  # Multiplicador de ancho (1.0 = modelo completo)
     include_top=False,  # Quitamos la capa superior para agregar nuestras propias capas
     weights="imagenet"  # Pesos preentrenados en ImageNet
 )
@@ -104,8 +286,11 @@ model = models.Model(inputs, outputs)
 # COMPILACIÓN INICIAL
 
 # Optimizer Adam, función de pérdida para clasificación multi-clase
+# Con varias réplicas el learning rate crece con el lote global (escalado lineal)
+if replicas > 1:
+    print(f"Learning rate escalado x{replicas} para el lote global de {batch_global}")
 model.compile(
-    optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
+    optimizer=tf.keras.optimizers.Adam(learning_rate=0.001 * replicas),
     loss='sparse_categorical_crossentropy',
     metrics=['accuracy']
 )
@@ -113,6 +298,287 @@ model.compile(
 model.summary()  # Mostrar arquitectura y parámetros
 
 
+# CHECKPOINTS REANUDABLES
+
+# Al final de cada época se guarda en --checkpoints el estado completo: pesos
+# (incluido el estado aleatorio de las capas de augmentation), variables del
+# optimizador (momentos, iteraciones y learning rate vigente), fase, época,
+# historial, estado de los callbacks y de los generadores aleatorios globales.
+# Si el proceso se interrumpe, el mismo comando continúa desde la última
+# época completada, en la misma fase.
+
+ARCHIVO_ESTADO = "estado.json"
+ARCHIVO_MARCA = "marca_trabajadores"
+ATRIBUTOS_CALLBACK = ("wait", "best", "best_epoch", "stopped_epoch", "cooldown_counter")
+
+# Configuración que debe coincidir para reanudar (otra arquitectura o datos no son comparables)
+configuracion = {"alpha": args.alpha, "tamano": args.tamano, "manifiesto": args.manifiesto, "semilla": args.semilla}
+
+
+def variables_a_dict(prefijo, variables):
+    return {f"{prefijo}:{getattr(v, 'path', v.name)}": v.numpy() for v in variables}
+
+
+def asignar_variables(prefijo, variables, tensores):
+    for v in variables:
+        v.assign(tensores[f"{prefijo}:{getattr(v, 'path', v.name)}"])
+
+
+def guardar_checkpoint(fase, epoca, historial, callbacks=(), con_optimizador=True):
+    """
+    Escribir los tensores (.npz) y después estado.json, ambos de forma atómica:
+    estado.json siempre apunta a un checkpoint completo. Con --distribuido
+    solo escribe el jefe (los pesos y el optimizador son iguales en todos).
+    """
+    if not es_jefe:
+        return
+    os.makedirs(args.checkpoints, exist_ok=True)
+    tensores = variables_a_dict("modelo", model.variables)
+    if con_optimizador:
+        tensores.update(variables_a_dict("optimizador", model.optimizer.variables))
+
+    estado_callbacks = []
+    for i, callback in enumerate(callbacks):
+        estado_callbacks.append({
+            atributo: float(getattr(callback, atributo)) if atributo == "best" else int(getattr(callback, atributo))
+            for atributo in ATRIBUTOS_CALLBACK if getattr(callback, atributo, None) is not None
+        })
+        # EarlyStopping con restore_best_weights guarda los mejores pesos de la fase
+        for j, peso in enumerate(getattr(callback, "best_weights", None) or []):
+            tensores[f"mejores:{i}:{j}"] = peso
+
+    estado_numpy = np.random.get_state()
+    tensores["aleatorio:numpy"] = estado_numpy[1]
+    tensores["aleatorio:tensorflow"] = tf.random.get_global_generator().state.numpy()
+    version_python, estado_python, gauss_python = random.getstate()
+
+    nombre = f"fase{fase}-epoca{epoca:03d}.npz"
+    ruta = os.path.join(args.checkpoints, nombre)
+    with open(ruta + ".tmp", "wb") as f:
+        np.savez(f, **tensores)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(ruta + ".tmp", ruta)
+
+    estado = {
+        "configuracion": configuracion,
+        "fase": fase,
+        "epoca": epoca,
+        "tensores": nombre,
+        "optimizador": con_optimizador,
+        "callbacks": estado_callbacks,
+        "historial": historial,
+        "aleatorio": {
+            "numpy": [estado_numpy[2], estado_numpy[3], estado_numpy[4]],
+            "python": [version_python, list(estado_python), gauss_python],
+        },
+    }
+    ruta_estado = os.path.join(args.checkpoints, ARCHIVO_ESTADO)
+    with open(ruta_estado + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(estado, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(ruta_estado + ".tmp", ruta_estado)
+
+    # Los checkpoints anteriores ya no son necesarios
+    for archivo in os.listdir(args.checkpoints):
+        if archivo.endswith(".npz") and archivo != nombre:
+            os.remove(os.path.join(args.checkpoints, archivo))
+
+
+def sumar_entre_trabajadores(valores):
+    """
+    Suma elemento a elemento de un vector de enteros entre todos los
+    trabajadores (una colectiva: también hace de barrera). Cada réplica local
+    aporta el vector, por eso se divide por las réplicas de este trabajador
+    (MultiWorkerMirroredStrategy usa la misma cantidad en todos).
+    """
+    por_replica = estrategia.run(lambda: tf.constant(valores, dtype=tf.int64))
+    total = estrategia.reduce(tf.distribute.ReduceOp.SUM, por_replica, axis=None).numpy()
+    return [int(valor) for valor in total // len(estrategia.extended.worker_devices)]
+
+
+def verificar_directorio_compartido():
+    """
+    Con --distribuido solo el jefe escribe checkpoints y los demás reanudan
+    desde ellos, así que --checkpoints debe ser el mismo directorio para
+    todos (almacenamiento compartido). El jefe escribe una marca aleatoria y
+    la difunde con una colectiva; cada trabajador comprueba que lee esa marca.
+    Si alguno falla terminan todos (el resto esperaría para siempre en la
+    siguiente colectiva).
+    """
+    ruta_marca = os.path.join(args.checkpoints, ARCHIVO_MARCA)
+    marca = 0
+    if es_jefe:
+        marca = secrets.randbelow(2 ** 31) + 1
+        os.makedirs(args.checkpoints, exist_ok=True)
+        with open(ruta_marca + ".tmp", "w", encoding="utf-8") as f:
+            f.write(str(marca))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ruta_marca + ".tmp", ruta_marca)
+    marca = sumar_entre_trabajadores([marca])[0]
+
+    try:
+        with open(ruta_marca, encoding="utf-8") as f:
+            compartido = int(f.read()) == marca
+    except (OSError, ValueError):
+        compartido = False
+    if not compartido:
+        print(f"Trabajador {indice_trabajador}: '{args.checkpoints}' no contiene la marca del jefe")
+    if sumar_entre_trabajadores([0 if compartido else 1])[0]:
+        raise SystemExit(f"'{args.checkpoints}' no es un directorio compartido por todos los trabajadores: "
+                         f"solo el jefe escribe checkpoints y los demás reanudan desde ellos. "
+                         f"Use almacenamiento compartido (NFS, disco de red) para --checkpoints")
+
+
+def cargar_checkpoint():
+    """
+    Último estado guardado (con sus tensores) o None si no hay o se pidió --reiniciar.
+    Con --distribuido todos los trabajadores cargan el checkpoint del jefe y
+    se comprueba que reanudan desde la misma fase y época.
+    """
+    ruta_estado = os.path.join(args.checkpoints, ARCHIVO_ESTADO)
+    if args.reiniciar and es_jefe:
+        shutil.rmtree(args.checkpoints, ignore_errors=True)
+    if args.distribuido:
+        # Después del borrado de --reiniciar: la colectiva espera al jefe
+        verificar_directorio_compartido()
+
+    estado = None
+    if not args.reiniciar and os.path.exists(ruta_estado):
+        with open(ruta_estado, encoding="utf-8") as f:
+            estado = json.load(f)
+        if estado["configuracion"] != configuracion:
+            raise SystemExit(f"Los checkpoints de '{args.checkpoints}' son de otra configuración "
+                             f"({estado['configuracion']}); use --reiniciar u otro --checkpoints")
+        with np.load(os.path.join(args.checkpoints, estado["tensores"])) as archivo:
+            estado["tensores"] = {clave: archivo[clave] for clave in archivo.files}
+
+    if args.distribuido:
+        punto = [estado["fase"], estado["epoca"]] if estado else [0, 0]
+        punto_jefe = sumar_entre_trabajadores(punto if es_jefe else [0, 0])
+        if sumar_entre_trabajadores([int(punto != punto_jefe)])[0]:
+            raise SystemExit(f"Los trabajadores no reanudan desde el mismo checkpoint del jefe "
+                             f"(fase y época del jefe: {punto_jefe}, de este trabajador: {punto})")
+    return estado
+
+
+def restaurar_aleatorio(estado):
+    tensores, aleatorio = estado["tensores"], estado["aleatorio"]
+    np.random.set_state(("MT19937", tensores["aleatorio:numpy"], *aleatorio["numpy"]))
+    version_python, estado_python, gauss_python = aleatorio["python"]
+    random.setstate((version_python, tuple(estado_python), gauss_python))
+    tf.random.get_global_generator().reset(tensores["aleatorio:tensorflow"])
+
+
+def restaurar_optimizador(estado):
+    """Crear las variables del optimizador de la fase actual y cargar sus valores"""
+    model.optimizer.build(model.trainable_variables)
+    asignar_variables("optimizador", model.optimizer.variables, estado["tensores"])
+
+
+class CheckpointEntrenamiento(tf.keras.callbacks.Callback):
+    """
+    Guarda el estado completo al final de cada época. Al reanudar devuelve a
+    los demás callbacks de la fase el estado que tenían, porque sus
+    on_train_begin lo reinician (por eso debe ir último en la lista).
+    """
+
+    def __init__(self, fase, callbacks, historial, estado=None):
+        super().__init__()
+        self.fase = fase
+        self.callbacks = callbacks
+        self.historial = historial
+        self.estado = estado
+
+    def on_train_begin(self, logs=None):
+        if self.estado is None:
+            return
+        for i, (callback, atributos) in enumerate(zip(self.callbacks, self.estado["callbacks"])):
+            if getattr(callback, "monitor_op", True) is None:
+                callback._set_monitor_op()
+            for atributo, valor in atributos.items():
+                setattr(callback, atributo, valor)
+            mejores = [peso for clave, peso in sorted(
+                ((clave, peso) for clave, peso in self.estado["tensores"].items()
+                 if clave.startswith(f"mejores:{i}:")),
+                key=lambda par: int(par[0].rsplit(":", 1)[1]))]
+            if mejores:
+                callback.best_weights = mejores
+
+    def on_epoch_end(self, epoch, logs=None):
+        for clave, valor in (logs or {}).items():
+            self.historial.setdefault(clave, []).append(float(valor))
+        # Si el early stopping detuvo la fase, la cierra el checkpoint de fin de fase
+        # (ya con los mejores pesos restaurados)
+        if not self.model.stop_training:
+            guardar_checkpoint(self.fase, epoch + 1, historial, self.callbacks)
+
+
+def ruta_de_trabajador(nombre):
+    """Archivo propio de cada trabajador: solo el jefe escribe en la ruta compartida"""
+    return nombre if es_jefe else os.path.join(tempfile.gettempdir(), f"trabajador{indice_trabajador}_{nombre}")
+
+
+# Los demás trabajadores entrenan sin mostrar progreso
+detalle = 1 if es_jefe else 0
+
+
+# MEDICIÓN DE RENDIMIENTO (OPCIONAL)
+
+# --pasos-medicion: imágenes/s de la fase 1 con la configuración actual
+# (herramientas/escalado_distribuido.py compara 1..N trabajadores)
+
+PASOS_CALENTAMIENTO = 5  # El primer paso incluye el trazado del grafo
+
+
+class MedicionRendimiento(tf.keras.callbacks.Callback):
+    def on_train_batch_begin(self, batch, logs=None):
+        if batch == PASOS_CALENTAMIENTO:
+            self.inicio = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.fin = time.perf_counter()
+
+
+if args.pasos_medicion:
+    medicion = MedicionRendimiento()
+    model.fit(
+        datos_entrenamiento if args.distribuido else train_ds.repeat(),
+        epochs=1,
+        steps_per_epoch=PASOS_CALENTAMIENTO + args.pasos_medicion,
+        callbacks=[medicion],
+        verbose=detalle
+    )
+    segundos = medicion.fin - medicion.inicio
+    resultado = {
+        "trabajadores": num_trabajadores,
+        "replicas": replicas,
+        "batch_global": batch_global,
+        "pasos": args.pasos_medicion,
+        "segundos": segundos,
+        "imagenes_por_segundo": args.pasos_medicion * batch_global / segundos,
+    }
+    if es_jefe:
+        with open(args.salida_medicion, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+        print(f"{resultado['imagenes_por_segundo']:.1f} img/s con {num_trabajadores} trabajador(es); "
+              f"guardado en '{args.salida_medicion}'")
+    raise SystemExit(0)
+
+
+historial = {"fase1": {}, "fase2": {}}
+estado = cargar_checkpoint()
+fase_inicial, epoca_inicial = 1, 0
+if estado:
+    fase_inicial, epoca_inicial = estado["fase"], estado["epoca"]
+    historial = estado["historial"]
+    asignar_variables("modelo", model.variables, estado["tensores"])
+    restaurar_aleatorio(estado)
+    print(f"Reanudando desde '{args.checkpoints}': fase {fase_inicial}, época {epoca_inicial}")
+
+
 # CALLBACKS PARA ENTRENAMIENTO
 
 # EarlyStopping: detener si no mejora validación
@@ -133,7 +599,7 @@ callbacks_phase1 = [
         verbose=1
     ),
     tf.keras.callbacks.ModelCheckpoint(
-        'best_model_phase1.keras',
+        ruta_de_trabajador('best_model_phase1.keras'),
         monitor='val_accuracy',
         save_best_only=True,
         verbose=1
@@ -148,13 +614,29 @@ print("FASE 1: Entrenamiento con MobileNetV2 congelado")
 print("="*60)
 
 epochs_phase1 = 15
-history1 = model.fit(
-    train_ds,
-    validation_data=val_ds,
-    epochs=epochs_phase1,
-    callbacks=callbacks_phase1,
-    verbose=1
-)
+if fase_inicial == 1:
+    if estado and estado["optimizador"]:
+        restaurar_optimizador(estado)
+    if epoca_inicial < epochs_phase1:
+        model.fit(
+            datos_entrenamiento,
+            validation_data=datos_validacion,
+            epochs=epochs_phase1,
+            initial_epoch=epoca_inicial,
+            steps_per_epoch=pasos_entrenamiento,
+            validation_steps=pasos_validacion,
+            callbacks=callbacks_phase1 + [
+                CheckpointEntrenamiento(1, callbacks_phase1, historial["fase1"], estado)
+            ],
+            verbose=detalle
+        )
+    # Fin de fase: pesos finales de la fase 1; la fase 2 empieza con optimizador nuevo
+    guardar_checkpoint(2, len(historial["fase1"]["loss"]), historial, con_optimizador=False)
+else:
+    print("Fase 1 ya completada (checkpoint)")
+
+# La fase 2 continúa la numeración de épocas donde terminó la fase 1
+fin_fase1 = len(historial["fase1"]["loss"])
 
 
 # FASE 2: FINE-TUNING
@@ -171,7 +653,7 @@ for layer in base_model.layers[:fine_tune_at]:
 
 # Recompilar con learning rate más bajo
 model.compile(
-    optimizer=tf.keras.optimizers.Adam(learning_rate=0.0001),
+    optimizer=tf.keras.optimizers.Adam(learning_rate=0.0001 * replicas),
     loss='sparse_categorical_crossentropy',
     metrics=['accuracy']
 )
@@ -191,7 +673,7 @@ callbacks_phase2 = [
         verbose=1
     ),
     tf.keras.callbacks.ModelCheckpoint(
-        'best_model_phase2.keras',
+        ruta_de_trabajador('best_model_phase2.keras'),
         monitor='val_accuracy',
         save_best_only=True,
         verbose=1
@@ -199,24 +681,51 @@ callbacks_phase2 = [
 ]
 
 epochs_phase2 = 20
-history2 = model.fit(
-    train_ds,
-    validation_data=val_ds,
-    epochs=epochs_phase2,
-    initial_epoch=history1.epoch[-1],
-    callbacks=callbacks_phase2,
-    verbose=1
-)
+if fase_inicial <= 2:
+    estado_fase2 = estado if fase_inicial == 2 else None
+    if estado_fase2 and estado_fase2["optimizador"]:
+        restaurar_optimizador(estado_fase2)
+    inicio_fase2 = epoca_inicial if estado_fase2 else fin_fase1
+    if inicio_fase2 < fin_fase1 + epochs_phase2:
+        model.fit(
+            datos_entrenamiento,
+            validation_data=datos_validacion,
+            epochs=fin_fase1 + epochs_phase2,
+            initial_epoch=inicio_fase2,
+            steps_per_epoch=pasos_entrenamiento,
+            validation_steps=pasos_validacion,
+            callbacks=callbacks_phase2 + [
+                CheckpointEntrenamiento(2, callbacks_phase2, historial["fase2"], estado_fase2)
+            ],
+            verbose=detalle
+        )
+    # Entrenamiento terminado: al reanudar solo se repiten evaluación y exportación
+    guardar_checkpoint(3, fin_fase1 + len(historial["fase2"]["loss"]), historial, con_optimizador=False)
+else:
+    print("Fase 2 ya completada (checkpoint)")
 
 print("\n¡Entrenamiento finalizado!")
 
+alcance_estrategia.close()
+if args.distribuido:
+    # Evaluar con la estrategia exigiría a todos los trabajadores seguir en el mismo
+    # paso: el jefe continúa solo con una copia local del modelo y los demás terminan
+    if not es_jefe:
+        raise SystemExit(0)
+    ruta_local = os.path.join(args.checkpoints, "modelo_distribuido.keras")
+    model.save(ruta_local)
+    model = tf.keras.models.load_model(ruta_local)
+    base_model = model.get_layer(base_model.name)
+    # Recién ahora, y solo en el jefe, los datasets completos (evaluación y fase 3)
+    train_ds, val_ds, _ = cargar_datasets_locales()
+
 
 # COMBINAR HISTORIALES DE ENTRENAMIENTO
 
-acc = history1.history['accuracy'] + history2.history['accuracy']
-val_acc = history1.history['val_accuracy'] + history2.history['val_accuracy']
-loss = history1.history['loss'] + history2.history['loss']
-val_loss = history1.history['val_loss'] + history2.history['val_loss']
+acc = historial["fase1"]['accuracy'] + historial["fase2"]['accuracy']
+val_acc = historial["fase1"]['val_accuracy'] + historial["fase2"]['val_accuracy']
+loss = historial["fase1"]['loss'] + historial["fase2"]['loss']
+val_loss = historial["fase1"]['val_loss'] + historial["fase2"]['val_loss']
 
 
 # GRAFICAR ENTRENAMIENTO
@@ -229,7 +738,7 @@ plt.figure(figsize=(14, 6))
 plt.subplot(1, 2, 1)
 plt.plot(epochs_range, acc, label='Entrenamiento', linewidth=2)
 plt.plot(epochs_range, val_acc, label='Validación', linewidth=2)
-plt.axvline(x=epochs_phase1, color='r', linestyle='--', label='Inicio Fine-tuning')
+plt.axvline(x=fin_fase1, color='r', linestyle='--', label='Inicio Fine-tuning')
 plt.legend(loc='lower right')
 plt.title('Precisión (Accuracy)', fontsize=14, fontweight='bold')
 plt.xlabel('Época')
@@ -240,7 +749,7 @@ plt.grid(True, alpha=0.3)
 plt.subplot(1, 2, 2)
 plt.plot(epochs_range, loss, label='Entrenamiento', linewidth=2)
 plt.plot(epochs_range, val_loss, label='Validación', linewidth=2)
-plt.axvline(x=epochs_phase1, color='r', linestyle='--', label='Inicio Fine-tuning')
+plt.axvline(x=fin_fase1, color='r', linestyle='--', label='Inicio Fine-tuning')
 plt.legend(loc='upper right')
 plt.title('Pérdida (Loss)', fontsize=14, fontweight='bold')
 plt.xlabel('Época')
@@ -258,13 +767,16 @@ print("\n" + "="*60)
 print("EVALUACIÓN EN TEST SET")
 print("="*60)
 
-test_ds = tf.keras.utils.image_dataset_from_directory(
-    test_dir,
-    label_mode='int',
-    image_size=(img_height, img_width),
-    batch_size=batch_size,
-    shuffle=False
-)
+if manifiesto:
+    test_ds = dataset_de_manifiesto("test", shuffle=False)
+else:
+    test_ds = tf.keras.utils.image_dataset_from_directory(
+        test_dir,
+        label_mode='int',
+        image_size=(img_height, img_width),
+        batch_size=batch_size,
+        shuffle=False
+    )
 
 test_loss, test_acc = model.evaluate(test_ds, verbose=1)
 print(f"\nTest Accuracy: {test_acc*100:.2f}%")
@@ -316,7 +828,165 @@ print(classification_report(y_true, y_pred_classes, target_names=class_names))
 
 # GUARDAR MODELO FINAL
 
-model.save('modelo_neumonia_MobileNet.keras')
-print("\n. ¡Modelo guardado exitosamente como 'modelo_neumonia_MobileNet.keras'!")
+model.save(args.salida)
+print(f"\n. ¡Modelo guardado exitosamente como '{args.salida}'!")
 print(f"Accuracy final en test: {test_acc*100:.2f}%")
 print(f"Confianza promedio: {np.mean(confidences)*100:.2f}%")
+
+
+# FASE 3 (OPCIONAL): PODA POR MAGNITUD + CUANTIZACIÓN INT8
+# tensorflow-model-optimization (poda y quantization-aware training) no es
+# compatible con Keras 3, por eso la poda se aplica con máscaras propias y la
+# cuantización es post-entrenamiento al exportar a TFLite (int8 con dataset
+# representativo), no QAT. Para que la cuantización no cueste recall, el modelo
+# int8 solo se exporta si la caída medida de recall de PNEUMONIA queda dentro de
+# --tolerancia-recall tanto respecto a la fase 2 como respecto al modelo podado
+# en float (costo de la cuantización sola), y la de accuracy dentro de --tolerancia.
+
+if args.fase3:
+    from servicios.modelo_tflite import ModeloTFLite
+
+    print("\n" + "="*60)
+    print(f"FASE 3: Poda por magnitud ({args.esparsidad*100:.0f}%) y cuantización int8")
+    print("="*60)
+
+    indice_neumonia = class_names.index('PNEUMONIA')
+
+    def evaluar_test(predecir):
+        """Accuracy y recall de PNEUMONIA en test para una función de predicción"""
+        etiquetas, predichas = [], []
+        for images, labels in test_ds:
+            etiquetas.extend(labels.numpy())
+            predichas.extend(np.argmax(predecir(images.numpy()), axis=1))
+        etiquetas, predichas = np.array(etiquetas), np.array(predichas)
+        es_neumonia = etiquetas == indice_neumonia
+        return np.mean(etiquetas == predichas), np.mean(predichas[es_neumonia] == indice_neumonia)
+
+    acc_fase2 = np.mean(np.array(y_true) == y_pred_classes)
+    recall_fase2 = np.mean(y_pred_classes[np.array(y_true) == indice_neumonia] == indice_neumonia)
+
+    class PodaMagnitud(tf.keras.callbacks.Callback):
+        """
+        Poda gradual por magnitud de las capas entrenables (convoluciones y densas).
+        La esparsidad crece con un calendario polinómico hasta la final y las
+        máscaras se reaplican en cada batch para que los pesos podados sigan en cero.
+        """
+
+        def __init__(self, capas, esparsidad_final, pasos_totales, frecuencia=100):
+            super().__init__()
+            self.capas = capas
+            self.esparsidad_final = esparsidad_final
+            # La última cuarta parte del entrenamiento recupera accuracy con la máscara fija
+            self.pasos_poda = max(1, int(pasos_totales * 0.75))
+            self.frecuencia = frecuencia
+            self.paso = 0
+            self.mascaras = [tf.ones_like(capa.kernel) for capa in capas]
+
+        def _actualizar_mascaras(self):
+            progreso = min(1.0, self.paso / self.pasos_poda)
+            esparsidad = self.esparsidad_final * (1 - (1 - progreso) ** 3)
+            for i, capa in enumerate(self.capas):
+                magnitudes = np.abs(capa.kernel.numpy())
+                umbral = np.quantile(magnitudes, esparsidad)
+                self.mascaras[i] = tf.constant(magnitudes > umbral, dtype=capa.kernel.dtype)
+
+        def on_train_batch_end(self, batch, logs=None):
+            self.paso += 1
+            if self.paso <= self.pasos_poda and self.paso % self.frecuencia == 0:
+                self._actualizar_mascaras()
+            for capa, mascara in zip(self.capas, self.mascaras):
+                capa.kernel.assign(capa.kernel * mascara)
+
+        def on_train_end(self, logs=None):
+            # Asegurar la esparsidad final aunque el early stopping corte antes
+            self.paso = self.pasos_poda
+            self._actualizar_mascaras()
+            self.on_train_batch_end(None)
+
+    capas_poda = [
+        capa for capa in base_model.layers + model.layers
+        if capa.trainable and isinstance(capa, (layers.Conv2D, layers.DepthwiseConv2D, layers.Dense))
+    ]
+    poda = PodaMagnitud(capas_poda, args.esparsidad, len(train_ds) * args.epocas_fase3)
+
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=0.00001),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    model.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=args.epocas_fase3,
+        callbacks=[poda],
+        verbose=1
+    )
+
+    total = sum(int(np.prod(c.kernel.shape)) for c in capas_poda)
+    ceros = sum(int(np.sum(c.kernel.numpy() == 0)) for c in capas_poda)
+    print(f"Esparsidad en capas podadas: {ceros / total * 100:.1f}% ({len(capas_poda)} capas)")
+
+    # Exportar como SavedModel y convertir a TFLite int8 (entrada y salida en float32)
+    base_salida = os.path.splitext(args.salida)[0]
+    ruta_podado = f"{base_salida}_podado.keras"
+    model.save(ruta_podado)
+    model.export(f"{base_salida}_savedmodel")
+
+    def dataset_representativo():
+        for images, _ in train_ds.take(50):
+            for imagen in images:
+                yield [tf.expand_dims(tf.cast(imagen, tf.float32), 0)]
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(f"{base_salida}_savedmodel")
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = dataset_representativo
+    converter.target_spec.supported_ops = [
+        tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+        tf.lite.OpsSet.TFLITE_BUILTINS,  # Respaldo en float para operaciones sin versión int8
+    ]
+    modelo_int8 = converter.convert()
+
+    ruta_int8 = f"{base_salida}_int8.tflite"
+    ruta_temporal = f"{ruta_int8}.tmp"
+    with open(ruta_temporal, "wb") as f:
+        f.write(modelo_int8)
+
+    acc_podado, recall_podado = evaluar_test(lambda x: model.predict(x, verbose=0))
+    acc_int8, recall_int8 = evaluar_test(ModeloTFLite(ruta_temporal).predict)
+
+    print(f"\n{'Modelo':<14}{'Acc (%)':>10}{'Recall N (%)':>14}{'Tamaño (MB)':>13}")
+    print("-" * 51)
+    print(f"{'Fase 2':<14}{acc_fase2*100:>10.2f}{recall_fase2*100:>14.2f}"
+          f"{os.path.getsize(args.salida) / 1e6:>13.2f}")
+    print(f"{'Podado':<14}{acc_podado*100:>10.2f}{recall_podado*100:>14.2f}"
+          f"{os.path.getsize(ruta_podado) / 1e6:>13.2f}")
+    print(f"{'Podado int8':<14}{acc_int8*100:>10.2f}{recall_int8*100:>14.2f}"
+          f"{len(modelo_int8) / 1e6:>13.2f}")
+
+    caidas = {
+        "accuracy_vs_fase2": float(acc_fase2 - acc_int8),
+        "recall_neumonia_vs_fase2": float(recall_fase2 - recall_int8),
+        "recall_neumonia_vs_podado": float(recall_podado - recall_int8),
+    }
+    limites = {
+        "accuracy_vs_fase2": args.tolerancia,
+        "recall_neumonia_vs_fase2": args.tolerancia_recall,
+        "recall_neumonia_vs_podado": args.tolerancia_recall,
+    }
+    print(f"\n{'Caída del int8':<28}{'Medida (pts)':>14}{'Límite (pts)':>14}")
+    print("-" * 56)
+    for nombre, caida in caidas.items():
+        print(f"{nombre:<28}{caida*100:>14.2f}{limites[nombre]*100:>14.2f}")
+    excedidas = [nombre for nombre, caida in caidas.items() if caida > limites[nombre]]
+
+    with open(f"{base_salida}_fase3.json", "w", encoding="utf-8") as f:
+        json.dump({"caidas": caidas, "limites": limites, "exportado": not excedidas}, f, indent=2)
+
+    if not excedidas:
+        os.replace(ruta_temporal, ruta_int8)
+        print(f"\n. Modelo int8 dentro de la tolerancia, guardado como '{ruta_int8}'")
+        print(f"Para servirlo: python -m servicios.registro_modelos registrar <version> {ruta_int8}")
+    else:
+        os.remove(ruta_temporal)
+        print(f"\nEl modelo int8 supera la tolerancia en: {', '.join(excedidas)}; no se exporta.")
+        print("Pruebe con menor --esparsidad o más --epocas-fase3.")
@@ -1,6 +1,8 @@
 import tensorflow as tf
 import numpy as np
 
+from config.ajustes import TAMANO_ENTRADA_MODELO
+
 # 1. Cargar el modelo que acabamos de entrenar
 print("Cargando el modelo...")
 model = tf.keras.models.load_model('modelo_neumonia_MobileNet.keras')
@@ -10,8 +12,8 @@ model = tf.keras.models.load_model('modelo_neumonia_MobileNet.keras')
 # img_path = r"C:/Users/Joshua Vallejo/OneDrive/Club de Inteligencia Artificial Politecnico/App Neumonia CIAP/chest_xray/test/NORMAL/IM-0030-0001.jpeg" 
 # Ruta relativa
 img_path = r"/chest_xray/test/NORMAL/IM-0030-0001.jpeg" 
-img_height = 224
-img_width = 224
+img_height = TAMANO_ENTRADA_MODELO
+img_width = TAMANO_ENTRADA_MODELO
 
 # Preprocesamos la imagen igual que en el entrenamiento
 img = tf.keras.utils.load_img(
@@ -0,0 +1,158 @@
+# backend/servicios/admision.py
+import asyncio
+from collections import deque
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+
+from config.ajustes import (
+    LIMITE_INFERENCIA_EN_CURSO,
+    LIMITE_CARGA_EN_CURSO,
+    LIMITE_EVENTOS_EN_CURSO,
+    LIMITE_GENERAL_EN_CURSO,
+    COLA_INFERENCIA_EN_ESPERA,
+    COLA_CARGA_EN_ESPERA,
+    COLA_GENERAL_EN_ESPERA,
+    ESPERA_MAXIMA_ADMISION,
+    RETRY_AFTER_SEGUNDOS
+)
+
+# Grupo de límites por ruta; las rutas no listadas usan "general"
+GRUPOS_RUTA = {
+    "/predecir": "inferencia",
+    "/analisis/subir": "inferencia",
+    "/trabajos/analisis": "carga",
+}
+
+# Streams SSE (/trabajos/{id}/eventos): ocupan un cupo mientras están abiertos
+PREFIJO_EVENTOS, SUFIJO_EVENTOS = "/trabajos/", "/eventos"
+
+# Rutas que nunca se rechazan (sondas de salud y raíz)
+RUTAS_EXENTAS = {"/", "/salud"}
+
+
+
+# CLASE: LÍMITE DE CONCURRENCIA
+
+class _LimiteGrupo:
+    """Solicitudes en curso de un grupo de rutas y su cola de espera (FIFO)"""
+
+    def __init__(self, limite: int, cola: int):
+        self.limite = limite
+        self.cola = cola
+        self.en_curso = 0
+        self.en_espera = deque()
+        self.admitidas = 0
+        self.rechazadas = 0
+        self.expiradas = 0
+
+
+
+# CLASE: CONTROL DE ADMISIÓN
+
+class ControlAdmision:
+    """
+    Control de admisión por worker.
+    Cada grupo de rutas tiene su propio límite de solicitudes en curso, así la
+    saturación de la inferencia, las cargas o los streams SSE no afecta a
+    /analisis/historial ni a /salud.
+    Al superar el límite la solicitud espera un cupo en una cola acotada como
+    máximo ESPERA_MAXIMA_ADMISION segundos; con la cola llena o la espera
+    vencida se responde 503 con Retry-After, en lugar de acumular solicitudes
+    en el event loop hasta que expiren todas juntas.
+    Solo se usa desde el event loop, por lo que no necesita locks.
+    """
+
+    def __init__(self, limites: dict):
+        self._grupos = {nombre: _LimiteGrupo(limite, cola) for nombre, (limite, cola) in limites.items()}
+
+    def grupo_de(self, ruta: str) -> Optional[str]:
+        """Grupo de límites de una ruta (None si está exenta)"""
+        if ruta in RUTAS_EXENTAS:
+            return None
+        if ruta.startswith(PREFIJO_EVENTOS) and ruta.endswith(SUFIJO_EVENTOS):
+            return "eventos"
+        return GRUPOS_RUTA.get(ruta, "general")
+
+    async def entrar(self, grupo: Optional[str]) -> bool:
+        """Admitir una solicitud, esperando un cupo si hay lugar en la cola; False si no se admite"""
+        if grupo is None:
+            return True
+        limite = self._grupos[grupo]
+        if limite.en_curso < limite.limite and not limite.en_espera:
+            limite.en_curso += 1
+            limite.admitidas += 1
+            return True
+        if len(limite.en_espera) >= limite.cola:
+            limite.rechazadas += 1
+            return False
+
+        # salir() transfiere su cupo al primero de la cola resolviendo su futuro
+        cupo = asyncio.get_running_loop().create_future()
+        limite.en_espera.append(cupo)
+        try:
+            await asyncio.wait_for(cupo, ESPERA_MAXIMA_ADMISION)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            # Cliente desconectado mientras esperaba: devolver el cupo si ya se le había asignado
+            self._descartar(limite, cupo, grupo)
+            raise
+
+        if cupo.done() and not cupo.cancelled():
+            limite.admitidas += 1
+            return True
+        self._descartar(limite, cupo, grupo)
+        limite.expiradas += 1
+        return False
+
+    def _descartar(self, limite: _LimiteGrupo, cupo: asyncio.Future, grupo: str):
+        if cupo in limite.en_espera:
+            limite.en_espera.remove(cupo)
+        elif cupo.done() and not cupo.cancelled():
+            self.salir(grupo)
+
+    def salir(self, grupo: Optional[str]):
+        """Liberar el cupo de una solicitud admitida (pasa al primero de la cola, si hay)"""
+        if grupo is None:
+            return
+        limite = self._grupos[grupo]
+        while limite.en_espera:
+            cupo = limite.en_espera.popleft()
+            if not cupo.done():
+                cupo.set_result(True)
+                return
+        limite.en_curso -= 1
+
+    def metricas(self) -> dict:
+        return {
+            nombre: {
+                "limite": g.limite,
+                "cola": g.cola,
+                "en_curso": g.en_curso,
+                "en_espera": len(g.en_espera),
+                "admitidas": g.admitidas,
+                "rechazadas": g.rechazadas,
+                "expiradas": g.expiradas,
+            }
+            for nombre, g in self._grupos.items()
+        }
+
+
+def respuesta_sobrecarga() -> JSONResponse:
+    """Respuesta 503 para solicitudes rechazadas por sobrecarga"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servicio saturado, intente nuevamente en unos segundos"},
+        headers={"Retry-After": str(RETRY_AFTER_SEGUNDOS)},
+    )
+
+
+# Instancia compartida por el worker
+# (límite en curso, cola de espera); un stream SSE en cola no tiene sentido: se rechaza
+control_admision = ControlAdmision({
+    "inferencia": (LIMITE_INFERENCIA_EN_CURSO, COLA_INFERENCIA_EN_ESPERA),
+    "carga": (LIMITE_CARGA_EN_CURSO, COLA_CARGA_EN_ESPERA),
+    "eventos": (LIMITE_EVENTOS_EN_CURSO, 0),
+    "general": (LIMITE_GENERAL_EN_CURSO, COLA_GENERAL_EN_ESPERA),
+})
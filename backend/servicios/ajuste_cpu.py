@@ -0,0 +1,71 @@
+# backend/servicios/ajuste_cpu.py
+import json
+import logging
+import os
+
+from config.ajustes import RUTA_CONFIG_CPU
+
+# Valores de TensorFlow por defecto (0 = decide TensorFlow, None = no tocar oneDNN)
+CONFIG_CPU_POR_DEFECTO = {"intra_op": 0, "inter_op": 0, "onednn": None, "micro_lote": 1}
+
+_configuracion = None
+
+
+
+# FUNCIÓN: LEER CONFIGURACIÓN DE CPU
+
+def configuracion_cpu() -> dict:
+    """
+    Configuración elegida por herramientas/autoajuste_cpu.py para este nodo.
+    Se ignora si fue medida en un nodo con otra cantidad de CPUs.
+    """
+    global _configuracion
+    if _configuracion is not None:
+        return _configuracion
+
+    _configuracion = dict(CONFIG_CPU_POR_DEFECTO)
+    if not os.path.exists(RUTA_CONFIG_CPU):
+        return _configuracion
+
+    try:
+        with open(RUTA_CONFIG_CPU, "r", encoding="utf-8") as f:
+            guardada = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Configuración de CPU ilegible ({e}); se usan los valores por defecto")
+        return _configuracion
+
+    if guardada.get("cpus") != os.cpu_count():
+        logging.warning(
+            f"Configuración de CPU medida con {guardada.get('cpus')} CPUs y este nodo tiene "
+            f"{os.cpu_count()}; se usan los valores por defecto (ejecutar el autoajuste de nuevo)"
+        )
+        return _configuracion
+
+    _configuracion.update({clave: guardada[clave] for clave in CONFIG_CPU_POR_DEFECTO if clave in guardada})
+    return _configuracion
+
+
+
+# FUNCIÓN: APLICAR CONFIGURACIÓN ANTES DE USAR TENSORFLOW
+
+def aplicar_configuracion_cpu() -> dict:
+    """
+    Aplicar hilos intra/inter-op y oneDNN. Debe llamarse antes de importar
+    TensorFlow: oneDNN se lee de la variable de entorno al importarlo y los
+    hilos no se pueden cambiar una vez inicializado el runtime.
+    """
+    config = configuracion_cpu()
+
+    # Una variable definida explícitamente en el entorno tiene prioridad
+    if config["onednn"] is not None:
+        os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", "1" if config["onednn"] else "0")
+
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(config["intra_op"])
+        tf.config.threading.set_inter_op_parallelism_threads(config["inter_op"])
+    except RuntimeError as e:
+        logging.warning(f"No se pudo aplicar la configuración de hilos de TensorFlow: {e}")
+
+    logging.info(f"Configuración de CPU: {config}")
+    return config
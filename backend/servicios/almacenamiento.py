@@ -0,0 +1,95 @@
+# backend/servicios/almacenamiento.py
+import logging
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+from fastapi import HTTPException
+
+from config.ajustes import MAX_INDICE_ALMACENAMIENTO
+from servicios.resiliencia import llamar_supabase, llamar_supabase_sync
+
+BUCKET_RADIOGRAFIAS = "radiografias"
+
+
+
+# CLASE: ÍNDICE LOCAL DE OBJETOS EXISTENTES
+
+class IndiceAlmacenamiento:
+    """
+    Claves de storage que este worker ya sabe que existen (LRU acotado).
+    Un acierto evita incluso la consulta de existencia a storage.
+    """
+
+    def __init__(self, maximo: int = MAX_INDICE_ALMACENAMIENTO):
+        self._claves = OrderedDict()
+        self._maximo = maximo
+        self._lock = threading.Lock()
+
+    def contiene(self, clave: str) -> bool:
+        with self._lock:
+            if clave in self._claves:
+                self._claves.move_to_end(clave)
+                return True
+            return False
+
+    def agregar(self, clave: str):
+        with self._lock:
+            self._claves[clave] = True
+            self._claves.move_to_end(clave)
+            while len(self._claves) > self._maximo:
+                self._claves.popitem(last=False)
+
+
+# Instancia compartida por el worker
+indice_almacenamiento = IndiceAlmacenamiento()
+
+
+
+# FUNCIÓN: EXISTE OBJETO
+
+def existe_objeto(bucket, nombre: str) -> bool:
+    """Consultar el índice local y, si no está, a storage (desde un hilo)"""
+    if indice_almacenamiento.contiene(nombre):
+        return True
+    if llamar_supabase_sync("storage", lambda: bucket.exists(nombre)):
+        indice_almacenamiento.agregar(nombre)
+        return True
+    return False
+
+
+
+# FUNCIÓN: SUBIR RADIOGRAFÍA (DIRECCIONADA POR CONTENIDO)
+
+async def subir_radiografia(supabase, persona_id: str, imagen_cargada) -> Tuple[str, str, bool]:
+    """
+    Sube la radiografía como `<persona_id>/<sha256>.jpg`.
+    Si esa clave ya existe (misma persona, mismos bytes) no se vuelve a subir
+    y se reutiliza su URL pública.
+    Devuelve (nombre del objeto, URL pública, si el contenido ya existía).
+    """
+    bucket = supabase.storage.from_(BUCKET_RADIOGRAFIAS)
+    nombre_archivo = f"{persona_id}/{imagen_cargada.huella()}.jpg"
+
+    duplicada = indice_almacenamiento.contiene(nombre_archivo) or await llamar_supabase(
+        "storage", lambda: bucket.exists(nombre_archivo)
+    )
+    if not duplicada:
+        try:
+            # Cada intento usa un lector nuevo: uno anterior pudo quedar consumido
+            await llamar_supabase("storage", lambda: bucket.upload(
+                nombre_archivo,
+                imagen_cargada.contenido_storage(),
+                {"content-type": imagen_cargada.content_type},
+            ))
+        except HTTPException:
+            raise
+        except Exception:
+            # Otra solicitud con los mismos bytes pudo subirla entre la consulta y la subida
+            if not await llamar_supabase("storage", lambda: bucket.exists(nombre_archivo)):
+                raise
+            duplicada = True
+            logging.info(f"Radiografía {nombre_archivo} subida por una solicitud concurrente")
+        indice_almacenamiento.agregar(nombre_archivo)
+
+    return nombre_archivo, bucket.get_public_url(nombre_archivo), duplicada
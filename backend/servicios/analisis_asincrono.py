@@ -0,0 +1,176 @@
+# backend/servicios/analisis_asincrono.py
+import asyncio
+import logging
+from datetime import datetime
+
+from config.ajustes import CONCURRENCIA_TRABAJADOR, INTERVALO_SONDEO_TRABAJOS, MAX_INTENTOS_TRABAJO
+from config.conexion import get_supabase_admin
+from controladores.analisisController import obtener_informacion_vulnerabilidad, generar_explicacion_analisis
+from servicios.almacenamiento import subir_radiografia
+from servicios.carga_imagen import ImagenCargada
+from servicios.cascada import cascada
+from servicios.derivados import generar_derivados, subir_derivados
+from servicios.estadisticas import agregados
+from servicios.evaluacion_sombra import evaluador_sombra
+from servicios.inferencia import cola_inferencia, imagen_a_lote, interpretar_prediccion
+from servicios.registro_modelos import registro_modelos, sincronizar_version_activa
+from servicios.resiliencia import DependenciaNoDisponible, llamar_supabase
+from servicios.trabajos import cola_trabajos
+from servicios.versiones_persona import versiones_persona
+
+# Segundos entre purgas de trabajos terminados
+INTERVALO_PURGA_TRABAJOS = 3600
+
+
+
+# FUNCIÓN: PROCESAR UN TRABAJO
+
+async def procesar_trabajo(trabajo: dict) -> dict:
+    """
+    Mismo análisis que /predecir: diagnóstico y, si el trabajo tiene persona,
+    vulnerabilidad, radiografía en storage y registro en el historial.
+    El análisis usa el id del trabajo y se guarda con upsert, así un
+    reintento después de una caída no duplica el registro.
+    """
+    trabajo_id = trabajo["id"]
+    persona_id = trabajo["persona_id"]
+
+    async def avanzar(progreso: int, etapa: str):
+        await asyncio.to_thread(cola_trabajos.avanzar, trabajo_id, progreso, etapa)
+
+    with open(cola_trabajos.ruta_imagen(trabajo_id), "rb") as archivo, ImagenCargada(
+        archivo, trabajo["tamano"], trabajo["content_type"], (trabajo["ancho"], trabajo["alto"])
+    ) as imagen_cargada:
+        prioridad = "ANONIMA"
+        if persona_id:
+            await avanzar(10, "perfil de salud")
+            supabase = get_supabase_admin()
+            vulnerabilidad_info = await obtener_informacion_vulnerabilidad(persona_id, supabase)
+            prioridad = vulnerabilidad_info["prioridad_atencion"]
+
+        await avanzar(25, "diagnóstico")
+        img = await asyncio.to_thread(imagen_cargada.decodificar)
+        arr = imagen_a_lote(img)
+        prob, version_modelo = await cola_inferencia.predecir(arr, prioridad)
+        evaluador_sombra.enviar(arr, prob, version_modelo)
+
+        resultado = {
+            **interpretar_prediccion(prob),
+            "version_modelo": version_modelo,
+            "autenticado": False,
+            "explicacion": "Análisis estándar del modelo de IA"
+        }
+        if not persona_id:
+            return resultado
+
+        await avanzar(60, "almacenamiento")
+        nombre_archivo, url, duplicada = await subir_radiografia(supabase, persona_id, imagen_cargada)
+        derivados = None if duplicada else await asyncio.to_thread(generar_derivados, imagen_cargada)
+
+        explicacion_info = generar_explicacion_analisis(
+            resultado["diagnostico"],
+            resultado["confianza"],
+            vulnerabilidad_info
+        )
+
+        await avanzar(80, "guardando en historial")
+        analisis_data = {
+            "id": trabajo_id,
+            "persona_id": persona_id,
+            "imagen_url": url,
+            "diagnostico": resultado["diagnostico"],
+            "confianza": resultado["confianza"],
+            "probabilidades": resultado["probabilidades"],
+            "version_modelo": version_modelo,
+            "fecha": datetime.now().isoformat(),
+            "nivel_vulnerabilidad_paciente": vulnerabilidad_info["nivel_vulnerabilidad"],
+            "prioridad_atencion_sugerida": vulnerabilidad_info["prioridad_atencion"],
+            "explicacion_vulnerabilidad": vulnerabilidad_info["explicacion"],
+            "detalles_analisis": explicacion_info["explicacion_detallada"]
+        }
+        try:
+            await llamar_supabase("escritura", lambda: supabase.table("analisis_radiografias").upsert(analisis_data).execute())
+        finally:
+            # También si falla: un timeout no garantiza que la escritura no se aplicara
+            versiones_persona.incrementar(persona_id)
+        # Registro compartido con los workers de la API (un reintento repite el id y no se cuenta dos veces)
+        agregados.registrar(analisis_data)
+
+        await avanzar(90, "miniaturas")
+        await asyncio.to_thread(subir_derivados, trabajo_id, nombre_archivo, derivados)
+
+    resultado["autenticado"] = True
+    resultado["mensaje"] = "Análisis guardado en historial"
+    resultado["explicacion"] = explicacion_info["mensaje_corto"]
+    resultado["vulnerabilidad"] = {
+        "nivel": vulnerabilidad_info["nivel_vulnerabilidad"],
+        "prioridad": vulnerabilidad_info["prioridad_atencion"],
+        "explicacion": vulnerabilidad_info["explicacion"]
+    }
+    resultado["data"] = {
+        "analisis_id": trabajo_id,
+        "detalles_analisis": explicacion_info["explicacion_detallada"],
+        "nivel_vulnerabilidad_paciente": vulnerabilidad_info["nivel_vulnerabilidad"],
+        "prioridad_atencion_sugerida": vulnerabilidad_info["prioridad_atencion"],
+        "explicacion_vulnerabilidad": vulnerabilidad_info["explicacion"]
+    }
+    return resultado
+
+
+
+# TAREAS: ATENDER LA COLA
+
+async def atender(nombre: str):
+    """Tomar y procesar trabajos uno a la vez (varias tareas por proceso)"""
+    while True:
+        try:
+            trabajo = await asyncio.to_thread(cola_trabajos.tomar, nombre)
+        except Exception as e:
+            logging.error(f"Error leyendo la cola de trabajos: {str(e)}")
+            trabajo = None
+        if trabajo is None:
+            await asyncio.sleep(INTERVALO_SONDEO_TRABAJOS)
+            continue
+
+        try:
+            resultado = await procesar_trabajo(trabajo)
+            await asyncio.to_thread(cola_trabajos.completar, trabajo["id"], resultado)
+        except DependenciaNoDisponible as e:
+            # Supabase caído: devolver a la cola mientras queden intentos
+            reintentar = trabajo["intentos"] < MAX_INTENTOS_TRABAJO
+            logging.warning(f"Trabajo {trabajo['id']}: Supabase no disponible (reintentar: {reintentar})")
+            await asyncio.sleep(float(e.headers.get("Retry-After", 1)))
+            await asyncio.to_thread(cola_trabajos.fallar, trabajo["id"], e.detail, reintentar)
+        except Exception as e:
+            logging.error(f"Error procesando trabajo {trabajo['id']}: {str(e)}")
+            # El detalle de una HTTPException (p. ej. imagen inválida) es apto para el cliente
+            error = getattr(e, "detail", None) or f"Error procesando el análisis ({type(e).__name__})"
+            await asyncio.to_thread(cola_trabajos.fallar, trabajo["id"], str(error))
+
+
+async def purgar_periodicamente():
+    while True:
+        try:
+            eliminados = await asyncio.to_thread(cola_trabajos.purgar)
+            if eliminados:
+                logging.info(f"Trabajos terminados eliminados: {eliminados}")
+        except Exception as e:
+            logging.error(f"Error purgando trabajos: {str(e)}")
+        await asyncio.sleep(INTERVALO_PURGA_TRABAJOS)
+
+
+async def atender_trabajos(nombre: str, concurrencia: int = CONCURRENCIA_TRABAJADOR, purgar: bool = False):
+    """
+    Bucle principal de un proceso trabajador. El modelo se carga una vez;
+    las `concurrencia` tareas comparten la cola de inferencia del proceso,
+    así sus imágenes se agrupan en micro-lotes mientras otras esperan a Supabase.
+    """
+    registro_modelos.inicializar()
+    cascada.inicializar()
+    logging.info(f"Trabajador {nombre} listo (modelo {registro_modelos.version_activa}, {concurrencia} tareas)")
+
+    tareas = [asyncio.create_task(sincronizar_version_activa())]
+    if purgar:
+        tareas.append(asyncio.create_task(purgar_periodicamente()))
+    tareas += [asyncio.create_task(atender(f"{nombre}/{i}")) for i in range(concurrencia)]
+    await asyncio.gather(*tareas)
@@ -0,0 +1,212 @@
+# backend/servicios/carga_imagen.py
+import hashlib
+import io
+import os
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image, UnidentifiedImageError
+
+from config.ajustes import MAX_BYTES_IMAGEN, MAX_PIXELES_IMAGEN, MARGEN_MULTIPART, TAMANO_ENTRADA_MODELO
+
+# PIL lanza DecompressionBombError por encima de este límite al abrir la imagen
+Image.MAX_IMAGE_PIXELS = MAX_PIXELES_IMAGEN
+
+# Rutas que reciben radiografías (se valida Content-Length antes de leer el cuerpo
+# y se cuentan los bytes mientras se lee)
+RUTAS_CARGA_IMAGEN = {"/predecir", "/analisis/subir", "/trabajos/analisis"}
+
+# Tamaño de los bloques leídos al calcular el hash del contenido
+BLOQUE_HASH = 1024 * 1024
+
+
+
+# LÍMITE DE CUERPO (CONTENT-LENGTH Y STREAMING)
+
+class CuerpoDemasiadoGrande(HTTPException):
+    """El cuerpo recibido superó el límite de carga mientras se leía"""
+
+    def __init__(self):
+        super().__init__(status_code=413, detail="Imagen demasiado grande")
+
+
+def excede_limite_cuerpo(content_length: Optional[str]) -> bool:
+    """
+    Indica si el Content-Length declarado supera el límite de carga.
+    Se usa en el middleware para rechazar la solicitud sin leer el cuerpo.
+    """
+    if not content_length:
+        return False
+    try:
+        return int(content_length) > MAX_BYTES_IMAGEN + MARGEN_MULTIPART
+    except ValueError:
+        return False
+
+
+def receive_limitado(receive):
+    """
+    Envolver el `receive` ASGI contando los bytes del cuerpo: al superar el
+    límite lanza CuerpoDemasiadoGrande (413) antes de que Starlette termine
+    de volcar la subida a disco. Cubre las subidas sin Content-Length
+    (Transfer-Encoding: chunked), que excede_limite_cuerpo no puede rechazar.
+    """
+    limite = MAX_BYTES_IMAGEN + MARGEN_MULTIPART
+    recibidos = 0
+
+    async def recibir():
+        nonlocal recibidos
+        mensaje = await receive()
+        if mensaje["type"] == "http.request":
+            recibidos += len(mensaje.get("body", b""))
+            if recibidos > limite:
+                raise CuerpoDemasiadoGrande()
+        return mensaje
+
+    return recibir
+
+
+
+# CLASE: LECTOR SOBRE UN BUFFER EN MEMORIA
+
+class _LectorMemoria(io.RawIOBase):
+    """Lectura de una vista (memoryview) del buffer de la subida, sin copiarlo"""
+
+    def __init__(self, vista: memoryview):
+        self._vista = vista
+        self._posicion = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, destino):
+        n = min(len(destino), len(self._vista) - self._posicion)
+        destino[:n] = self._vista[self._posicion:self._posicion + n]
+        self._posicion += n
+        return n
+
+    def seek(self, desplazamiento, desde=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._posicion, os.SEEK_END: len(self._vista)}[desde]
+        self._posicion = max(0, base + desplazamiento)
+        return self._posicion
+
+    def tell(self):
+        return self._posicion
+
+    def close(self):
+        # Liberar la vista: mientras exista, el BytesIO de la subida no se puede redimensionar
+        self._vista.release()
+        super().close()
+
+
+
+# CLASE: IMAGEN CARGADA
+
+class ImagenCargada:
+    """
+    Radiografía subida y validada.
+    Reutiliza el archivo temporal (spooled) de la subida: el mismo buffer se
+    entrega al decodificador y a storage, sin copiar el contenido a un `bytes`.
+    """
+
+    def __init__(self, archivo, tamano: int, content_type: str, dimensiones: Tuple[int, int]):
+        self.archivo = archivo
+        self.tamano = tamano
+        self.content_type = content_type
+        self.dimensiones = dimensiones
+        self._lectores = []
+        self._huella = None
+
+    def decodificar(self, tamano: Tuple[int, int] = (TAMANO_ENTRADA_MODELO, TAMANO_ENTRADA_MODELO)) -> Image.Image:
+        """Decodificar la imagen en RGB al tamaño de entrada del modelo"""
+        self.archivo.seek(0)
+        img = Image.open(self.archivo)
+        # En JPEG permite decodificar directamente a una escala reducida
+        img.draft("RGB", tamano)
+        return img.convert("RGB").resize(tamano)
+
+    def huella(self) -> str:
+        """SHA-256 del contenido, calculado por bloques sobre el archivo temporal"""
+        if self._huella is None:
+            self.archivo.seek(0)
+            sha = hashlib.sha256()
+            for bloque in iter(lambda: self.archivo.read(BLOQUE_HASH), b""):
+                sha.update(bloque)
+            self._huella = sha.hexdigest()
+        return self._huella
+
+    def contenido_storage(self):
+        """
+        Contenido en un formato aceptado por el cliente de storage.
+        - En memoria: un lector sobre una vista del mismo buffer.
+        - En disco: un lector sobre el mismo archivo temporal.
+        En ambos casos sin copiar el contenido.
+        """
+        self.archivo.seek(0)
+        interno = getattr(self.archivo, "_file", self.archivo)
+        if isinstance(interno, io.BytesIO):
+            lector = io.BufferedReader(_LectorMemoria(interno.getbuffer()))
+        else:
+            lector = open(os.dup(interno.fileno()), "rb")
+            lector.seek(0)
+        self._lectores.append(lector)
+        return lector
+
+    def cerrar(self):
+        """Liberar los lectores abiertos sobre el archivo temporal"""
+        for lector in self._lectores:
+            lector.close()
+        self._lectores = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+
+
+# FUNCIÓN: LEER IMAGEN CON LÍMITE DE TAMAÑO
+
+def leer_imagen_limitada(imagen: UploadFile) -> ImagenCargada:
+    """
+    Valida la subida sin cargarla completa en memoria:
+    1. Tamaño en bytes contra MAX_BYTES_IMAGEN (la subida ya está en el
+       archivo temporal; el corte durante la lectura lo hace receive_limitado)
+    2. Cabecera de la imagen (formato y dimensiones) antes de decodificar
+    """
+    archivo = imagen.file
+
+    tamano = imagen.size
+    if tamano is None:
+        archivo.seek(0, os.SEEK_END)
+        tamano = archivo.tell()
+
+    if tamano == 0:
+        raise HTTPException(status_code=400, detail="Imagen vacía")
+
+    if tamano > MAX_BYTES_IMAGEN:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Imagen demasiado grande (máximo {MAX_BYTES_IMAGEN // (1024 * 1024)} MB)"
+        )
+
+    # Image.open solo lee la cabecera; los píxeles no se decodifican aquí
+    archivo.seek(0)
+    try:
+        with Image.open(archivo) as img:
+            dimensiones = img.size
+    except Image.DecompressionBombError:
+        raise HTTPException(status_code=413, detail="Dimensiones de imagen no permitidas")
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(status_code=400, detail="Archivo de imagen inválido")
+
+    ancho, alto = dimensiones
+    if ancho * alto > MAX_PIXELES_IMAGEN:
+        raise HTTPException(status_code=413, detail="Dimensiones de imagen no permitidas")
+
+    archivo.seek(0)
+    return ImagenCargada(archivo, tamano, imagen.content_type, dimensiones)
@@ -0,0 +1,76 @@
+# backend/servicios/cascada.py
+import logging
+
+import numpy as np
+import tensorflow as tf
+
+from config.ajustes import VERSION_CASCADA_RAPIDA, UMBRAL_CASCADA
+from servicios.registro_modelos import cargar_version, leer_manifiesto
+
+# Umbral usado si no hay uno calibrado ni definido por variable de entorno
+UMBRAL_CASCADA_POR_DEFECTO = 0.95
+
+
+
+# FUNCIÓN: COMBINAR SALIDAS DE LA CASCADA
+
+def combinar_cascada(preds_rapidas: np.ndarray, preds_completas: np.ndarray, umbral: float):
+    """
+    Salidas que produciría la cascada para un conjunto ya evaluado por ambos modelos.
+    Devuelve (salidas combinadas, máscara de casos escalados al modelo completo).
+    """
+    escalados = preds_rapidas.max(axis=1) < umbral
+    return np.where(escalados[:, None], preds_completas, preds_rapidas), escalados
+
+
+
+# CLASE: CASCADA DE MODELOS
+
+class Cascada:
+    """
+    Primera etapa de la cascada: un modelo más barato (menor alpha o resolución)
+    responde los casos claros y escala los dudosos al modelo completo.
+    """
+
+    def __init__(self, version: str = VERSION_CASCADA_RAPIDA):
+        self.version = version
+        self.umbral = None
+        self._modelo = None
+        self._tamano = None
+
+    @property
+    def activa(self) -> bool:
+        return self._modelo is not None
+
+    def inicializar(self):
+        """Cargar el modelo rápido y su umbral (calibrado o por variable de entorno)"""
+        if not self.version:
+            return
+        try:
+            info = leer_manifiesto()["versiones"].get(self.version, {})
+            if UMBRAL_CASCADA:
+                self.umbral = float(UMBRAL_CASCADA)
+            else:
+                self.umbral = float(info.get("umbral_cascada", UMBRAL_CASCADA_POR_DEFECTO))
+
+            self._modelo = cargar_version(self.version)
+            self._tamano = tuple(self._modelo.input_shape[1:3])
+            logging.info(f"Cascada activa: {self.version} (umbral {self.umbral})")
+        except Exception as e:
+            self._modelo = None
+            logging.error(f"Error cargando modelo rápido {self.version}: {str(e)}")
+
+    def evaluar(self, arr: np.ndarray):
+        """
+        Salidas del modelo rápido para un lote y máscara de las suficientemente
+        confiables para responder. Las imágenes llegan al tamaño del modelo
+        completo y se reescalan si hace falta.
+        """
+        if tuple(arr.shape[1:3]) != self._tamano:
+            arr = tf.image.resize(arr, self._tamano).numpy()
+        preds = self._modelo.predict(arr, verbose=0)
+        return preds, preds.max(axis=1) >= self.umbral
+
+
+# Instancia compartida por el worker
+cascada = Cascada()
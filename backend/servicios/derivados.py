@@ -0,0 +1,88 @@
+# backend/servicios/derivados.py
+import io
+import logging
+from typing import Dict, Optional
+
+from PIL import Image
+
+from config.ajustes import TAMANO_MINIATURA, TAMANO_VISTA_PREVIA, CALIDAD_WEBP
+from config.conexion import get_supabase_admin
+from servicios.almacenamiento import BUCKET_RADIOGRAFIAS, existe_objeto
+from servicios.resiliencia import llamar_supabase_sync
+from servicios.versiones_persona import versiones_persona
+
+# Tipo de derivado -> columna de analisis_radiografias donde se guarda su URL
+COLUMNAS_DERIVADOS = {
+    "miniatura": "imagen_miniatura_url",
+    "vista_previa": "imagen_vista_previa_url",
+}
+
+
+
+# FUNCIÓN: CODIFICAR WEBP
+
+def _codificar_webp(img: Image.Image) -> bytes:
+    """Codificar una imagen PIL como WebP"""
+    buffer = io.BytesIO()
+    img.save(buffer, format="WEBP", quality=CALIDAD_WEBP, method=4)
+    return buffer.getvalue()
+
+
+
+# FUNCIÓN: GENERAR DERIVADOS
+
+def generar_derivados(imagen_cargada) -> Dict[str, bytes]:
+    """
+    Genera la vista previa y la miniatura WebP de una radiografía subida.
+    Se decodifica una sola vez a escala reducida y la miniatura se obtiene
+    de la vista previa, no del original.
+    """
+    imagen_cargada.archivo.seek(0)
+    with Image.open(imagen_cargada.archivo) as img:
+        img.draft("RGB", (TAMANO_VISTA_PREVIA, TAMANO_VISTA_PREVIA))
+        vista_previa = img.convert("RGB")
+
+    vista_previa.thumbnail((TAMANO_VISTA_PREVIA, TAMANO_VISTA_PREVIA))
+    miniatura = vista_previa.copy()
+    miniatura.thumbnail((TAMANO_MINIATURA, TAMANO_MINIATURA))
+
+    return {
+        "vista_previa": _codificar_webp(vista_previa),
+        "miniatura": _codificar_webp(miniatura),
+    }
+
+
+
+# FUNCIÓN: SUBIR DERIVADOS (TAREA EN SEGUNDO PLANO)
+
+def subir_derivados(analisis_id: str, nombre_archivo: str, derivados: Optional[Dict[str, bytes]]):
+    """
+    Sube los derivados junto al original (`<persona_id>/<sha256>_<tipo>.webp`)
+    y registra sus URLs en el análisis. Se ejecuta después de enviar la respuesta;
+    si falla, el análisis conserva la imagen original.
+    Con derivados=None (radiografía duplicada) solo se enlazan los ya existentes.
+    """
+    try:
+        supabase = get_supabase_admin()
+        bucket = supabase.storage.from_(BUCKET_RADIOGRAFIAS)
+        nombre_base = nombre_archivo.rsplit(".", 1)[0]
+
+        urls = {}
+        for tipo, columna in COLUMNAS_DERIVADOS.items():
+            nombre = f"{nombre_base}_{tipo}.webp"
+            if derivados is not None:
+                llamar_supabase_sync("storage", lambda: bucket.upload(nombre, derivados[tipo], {"content-type": "image/webp"}))
+            elif not existe_objeto(bucket, nombre):
+                continue
+            urls[columna] = bucket.get_public_url(nombre)
+
+        if urls:
+            try:
+                llamar_supabase_sync(
+                    "escritura", lambda: supabase.table("analisis_radiografias").update(urls).eq("id", analisis_id).execute()
+                )
+            finally:
+                # Las URLs aparecen en el historial; la clave empieza con el id de la persona
+                versiones_persona.incrementar(nombre_archivo.split("/", 1)[0])
+    except Exception as e:
+        logging.error(f"Error subiendo derivados de {nombre_archivo}: {str(e)}")
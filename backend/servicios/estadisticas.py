@@ -0,0 +1,299 @@
+# backend/servicios/estadisticas.py
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from config.ajustes import (
+    INTERVALO_RECONCILIACION_ESTADISTICAS,
+    MARGEN_RECONCILIACION_ESTADISTICAS,
+    DIAS_ESTADISTICAS,
+    RUTA_ESTADISTICAS
+)
+from config.conexion import get_supabase_admin
+from servicios.resiliencia import llamar_supabase_sync
+
+try:
+    import fcntl
+except ImportError:  # Windows: cada proceso mantiene sus propios contadores
+    fcntl = None
+
+# Columnas de un análisis que afectan los contadores (una línea del registro)
+COLUMNAS_ESTADISTICAS = ("id", "fecha", "diagnostico", "nivel_vulnerabilidad_paciente", "prioridad_atencion_sugerida")
+
+
+
+# CLASE: CONTADORES
+
+class _Contadores:
+    """Contadores agregados de análisis (total, por día, diagnóstico, vulnerabilidad y prioridad)"""
+
+    def __init__(self):
+        self.total = 0
+        self.por_dia = defaultdict(Counter)
+        self.por_diagnostico = Counter()
+        self.por_nivel_vulnerabilidad = Counter()
+        self.por_prioridad = Counter()
+
+    def sumar(self, analisis: dict, cantidad: int = 1):
+        dia = str(analisis.get("fecha") or "")[:10] or "sin_fecha"
+        diagnostico = analisis.get("diagnostico") or "DESCONOCIDO"
+
+        self.total += cantidad
+        self.por_dia[dia]["total"] += cantidad
+        self.por_dia[dia][diagnostico] += cantidad
+        self.por_diagnostico[diagnostico] += cantidad
+        self.por_nivel_vulnerabilidad[analisis.get("nivel_vulnerabilidad_paciente") or "NO_REGISTRADA"] += cantidad
+        self.por_prioridad[analisis.get("prioridad_atencion_sugerida") or "NO_REGISTRADA"] += cantidad
+
+    def a_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "por_dia": {dia: dict(contador) for dia, contador in self.por_dia.items()},
+            "por_diagnostico": dict(self.por_diagnostico),
+            "por_nivel_vulnerabilidad": dict(self.por_nivel_vulnerabilidad),
+            "por_prioridad": dict(self.por_prioridad),
+        }
+
+    @classmethod
+    def desde_dict(cls, datos: dict) -> "_Contadores":
+        contadores = cls()
+        contadores.total = datos["total"]
+        contadores.por_dia = defaultdict(Counter, {dia: Counter(c) for dia, c in datos["por_dia"].items()})
+        contadores.por_diagnostico = Counter(datos["por_diagnostico"])
+        contadores.por_nivel_vulnerabilidad = Counter(datos["por_nivel_vulnerabilidad"])
+        contadores.por_prioridad = Counter(datos["por_prioridad"])
+        return contadores
+
+
+def _escribir_atomico(ruta: str, contenido: bytes):
+    """Reemplazar el archivo de una vez: los lectores ven la versión anterior o la nueva"""
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta) or ".", prefix=".estadisticas-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+
+# CLASE: AGREGADOS DE ANÁLISIS
+
+class AgregadosAnalisis:
+    """
+    Estadísticas de analisis_radiografias compartidas por los procesos del host.
+    - Base: contadores de los análisis con fecha <= `hasta`, calculados en la BD
+      con la RPC estadisticas_analisis (GROUP BY) por un solo worker, el que
+      tiene el lock de líder, y guardados en RUTA_ESTADISTICAS
+    - Registro: cada inserción de /predecir, /analisis/subir y del trabajador
+      agrega una línea a RUTA_ESTADISTICAS.registro (O(1))
+    Cada proceso suma a la base las líneas del registro posteriores a `hasta`
+    (sin repetir ids) leyendo solo lo que se agregó desde la última consulta,
+    así todos los workers del host devuelven los mismos contadores.
+    """
+
+    def __init__(self, ruta: Optional[str] = RUTA_ESTADISTICAS):
+        self._compartido = fcntl is not None and ruta is not None
+        self._ruta_base = ruta
+        self._ruta_registro = f"{ruta}.registro"
+        self._ruta_lider = f"{ruta}.lider"
+        self._lock = threading.Lock()
+
+        self._contadores = _Contadores()
+        self._hasta = ""
+        self._recientes = {}
+        self._version_base = None
+        self._archivo_registro = None
+        self._fd_lider = None
+        self.ultima_reconciliacion = None
+
+    def registrar(self, analisis: dict):
+        """Agregar un análisis recién insertado al registro compartido"""
+        fila = {columna: analisis.get(columna) for columna in COLUMNAS_ESTADISTICAS}
+        if self._compartido:
+            try:
+                self._agregar_al_registro((json.dumps(fila) + "\n").encode())
+                return
+            except OSError as e:
+                # Solo este proceso lo cuenta hasta la próxima reconciliación
+                logging.warning(f"No se pudo escribir el registro de estadísticas: {str(e)}")
+        with self._lock:
+            self._sumar_reciente(fila)
+
+    def _agregar_al_registro(self, linea: bytes):
+        while True:
+            fd = os.open(self._ruta_registro, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                # La compactación reemplaza el archivo: escribir solo en el vigente
+                if os.stat(self._ruta_registro).st_ino == os.fstat(fd).st_ino:
+                    os.write(fd, linea)
+                    return
+            finally:
+                os.close(fd)
+
+    def _sumar_reciente(self, fila: dict):
+        """Sumar un análisis posterior a la base (una sola vez por id)"""
+        analisis_id = fila.get("id")
+        if analisis_id is not None and analisis_id in self._recientes:
+            return
+        if self._hasta and str(fila.get("fecha") or "") <= self._hasta:
+            return  # Ya incluido en la base
+        self._recientes[analisis_id if analisis_id is not None else object()] = fila
+        self._contadores.sumar(fila)
+
+    def _aplicar_base(self, base: dict):
+        self._hasta = base["hasta"]
+        self.ultima_reconciliacion = base["generado"]
+
+        recientes, self._recientes = self._recientes, {}
+        self._contadores = _Contadores.desde_dict(base["contadores"])
+        for fila in recientes.values():
+            self._sumar_reciente(fila)
+
+    def _actualizar(self):
+        """Leer la base si cambió y las líneas nuevas del registro"""
+        if not self._compartido:
+            return
+
+        try:
+            estado = os.stat(self._ruta_base)
+            if (estado.st_ino, estado.st_mtime_ns) != self._version_base:
+                with open(self._ruta_base, "r", encoding="utf-8") as f:
+                    base = json.load(f)
+                self._version_base = (estado.st_ino, estado.st_mtime_ns)
+                self._aplicar_base(base)
+        except FileNotFoundError:
+            pass  # El líder todavía no reconcilió
+
+        try:
+            inodo = os.stat(self._ruta_registro).st_ino
+        except FileNotFoundError:
+            return
+        if self._archivo_registro is None or os.fstat(self._archivo_registro.fileno()).st_ino != inodo:
+            # Registro compactado: releerlo desde el principio (los ids ya sumados se ignoran).
+            # Mantenerlo abierto evita que otro archivo reutilice el mismo inodo
+            if self._archivo_registro is not None:
+                self._archivo_registro.close()
+            self._archivo_registro = open(self._ruta_registro, "rb")
+
+        datos = self._archivo_registro.read()
+        # Una línea a medio escribir se completa en la próxima lectura
+        completo = datos.rfind(b"\n") + 1
+        if completo < len(datos):
+            self._archivo_registro.seek(completo - len(datos), os.SEEK_CUR)
+        for linea in datos[:completo].splitlines():
+            try:
+                self._sumar_reciente(json.loads(linea))
+            except ValueError:
+                continue
+
+    def es_lider(self) -> bool:
+        """Tomar (o conservar) el lock de líder: solo ese proceso del host reconcilia"""
+        if not self._compartido:
+            return True
+        if self._fd_lider is None:
+            fd = os.open(self._ruta_lider, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            self._fd_lider = fd
+        return True
+
+    def reconciliar(self):
+        """Recalcular la base en la BD y descartar del registro lo que ya incluye"""
+        # El margen deja fuera los análisis con fecha anterior que todavía se están insertando
+        hasta = (datetime.now() - timedelta(seconds=MARGEN_RECONCILIACION_ESTADISTICAS)).isoformat()
+        supabase = get_supabase_admin()
+        response = llamar_supabase_sync("consulta", lambda: (
+            supabase.rpc("estadisticas_analisis", {"hasta": hasta}).execute()
+        ))
+        nuevos = _Contadores()
+        for fila in response.data or []:
+            nuevos.sumar(fila, fila["total"])
+        base = {"hasta": hasta, "generado": datetime.now().isoformat(), "contadores": nuevos.a_dict()}
+
+        if not self._compartido:
+            with self._lock:
+                self._aplicar_base(base)
+            return
+
+        _escribir_atomico(self._ruta_base, json.dumps(base).encode())
+        self._compactar_registro(hasta)
+
+    def _compactar_registro(self, hasta: str):
+        fd = os.open(self._ruta_registro, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            with os.fdopen(os.dup(fd), "rb") as f:
+                lineas = f.read().splitlines(keepends=True)
+            vigentes = []
+            for linea in lineas:
+                try:
+                    if str(json.loads(linea).get("fecha") or "") > hasta:
+                        vigentes.append(linea)
+                except ValueError:
+                    continue
+            _escribir_atomico(self._ruta_registro, b"".join(vigentes))
+        finally:
+            os.close(fd)
+
+    def resumen(self, dias: int = DIAS_ESTADISTICAS) -> dict:
+        """Rollups precalculados para /estadisticas"""
+        with self._lock:
+            try:
+                self._actualizar()
+            except (OSError, ValueError) as e:
+                logging.warning(f"No se pudieron leer las estadísticas compartidas: {str(e)}")
+
+            c = self._contadores
+            neumonia = c.por_diagnostico.get("PNEUMONIA", 0)
+            dias_recientes = sorted(c.por_dia)[-dias:] if dias > 0 else []
+            return {
+                "total_analisis": c.total,
+                "tasa_neumonia": round(neumonia / c.total, 4) if c.total else 0.0,
+                "por_dia": [
+                    {
+                        "fecha": dia,
+                        "total": c.por_dia[dia]["total"],
+                        "neumonia": c.por_dia[dia]["PNEUMONIA"],
+                        "normal": c.por_dia[dia]["NORMAL"],
+                    }
+                    for dia in dias_recientes
+                ],
+                "por_diagnostico": dict(c.por_diagnostico),
+                "por_nivel_vulnerabilidad": dict(c.por_nivel_vulnerabilidad),
+                "por_prioridad_atencion": dict(c.por_prioridad),
+                "ultima_reconciliacion": self.ultima_reconciliacion,
+            }
+
+
+# Instancia compartida por el worker
+agregados = AgregadosAnalisis()
+
+
+
+# TAREA: RECONCILIACIÓN PERIÓDICA
+
+async def reconciliar_periodicamente():
+    """
+    El worker líder del host reconcilia al arrancar y luego cada
+    INTERVALO_RECONCILIACION_ESTADISTICAS; los demás intentan tomar el lock
+    en cada intervalo por si el líder terminó.
+    """
+    while True:
+        try:
+            if agregados.es_lider():
+                await asyncio.to_thread(agregados.reconciliar)
+        except Exception as e:
+            logging.error(f"Error reconciliando estadísticas: {str(e)}")
+        await asyncio.sleep(INTERVALO_RECONCILIACION_ESTADISTICAS)
@@ -0,0 +1,154 @@
+# backend/servicios/evaluacion_sombra.py
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from config.ajustes import (
+    TAMANO_ENTRADA_MODELO,
+    VERSION_SOMBRA,
+    FRACCION_SOMBRA,
+    MAX_COLA_SOMBRA,
+    HILOS_SOMBRA,
+    RUTA_REGISTRO_SOMBRA
+)
+from servicios.inferencia import CLASES, percentil_ms
+from servicios.modelo_tflite import cargar_modelo_aislado
+from servicios.registro_modelos import ruta_version
+
+MUESTRAS_LATENCIA = 500
+
+
+
+# CLASE: EVALUADOR EN SOMBRA
+
+class EvaluadorSombra:
+    """
+    Evalúa una versión candidata sobre una fracción del tráfico real de /predecir.
+    - Fuera de la ruta de respuesta: enviar() solo encola y nunca bloquea
+    - Presupuesto de CPU propio: la candidata corre en un intérprete TFLite con
+      HILOS_SOMBRA hilos (no en el pool de TensorFlow de la inferencia principal)
+      y una cola acotada; si está llena la muestra se descarta
+    - El resultado entregado al usuario nunca depende del modelo candidato
+    """
+
+    def __init__(self, version: str = VERSION_SOMBRA, fraccion: float = FRACCION_SOMBRA):
+        self.version = version
+        self.fraccion = fraccion
+        self._cola = queue.Queue(maxsize=MAX_COLA_SOMBRA)
+        self._modelo = None
+        self._hilo = None
+        self._lock = threading.Lock()
+
+        self.comparadas = 0
+        self.acuerdos = 0
+        self.descartadas = 0
+        self.errores = 0
+        self.error_carga = None
+        self._suma_delta_confianza = 0.0
+        self._latencias = deque(maxlen=MUESTRAS_LATENCIA)
+
+    @property
+    def activo(self) -> bool:
+        return bool(self.version) and self.fraccion > 0
+
+    def enviar(self, arr: np.ndarray, prob_principal: np.ndarray, version_principal: str):
+        """Muestrear y encolar una imagen ya evaluada por el modelo principal"""
+        if not self.activo or random.random() >= self.fraccion:
+            return
+
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._trabajar, name="sombra", daemon=True)
+                self._hilo.start()
+
+        try:
+            self._cola.put_nowait((arr, prob_principal, version_principal))
+        except queue.Full:
+            self.descartadas += 1
+
+    def _trabajar(self):
+        try:
+            modelo = cargar_modelo_aislado(ruta_version(self.version), HILOS_SOMBRA)
+            # Recibe las mismas imágenes que el modelo principal (TAMANO_ENTRADA_MODELO)
+            _, alto, ancho, _ = modelo.input_shape
+            if (alto, ancho) != (TAMANO_ENTRADA_MODELO, TAMANO_ENTRADA_MODELO):
+                raise ValueError(
+                    f"la versión espera {alto}x{ancho}; TAMANO_ENTRADA_MODELO es {TAMANO_ENTRADA_MODELO}"
+                )
+            self._modelo = modelo
+        except Exception as e:
+            logging.error(f"Error cargando modelo en sombra {self.version}: {str(e)}")
+            self.error_carga = f"{self.version}: {e}"
+            self.version = ""
+            return
+
+        while True:
+            arr, prob_principal, version_principal = self._cola.get()
+            try:
+                inicio = time.perf_counter()
+                pred = self._modelo.predict(arr, verbose=0)[0]
+                # Mismo softmax que la inferencia principal, en NumPy
+                exp = np.exp(pred - np.max(pred))
+                prob_candidata = exp / exp.sum()
+                latencia = time.perf_counter() - inicio
+                self._registrar(prob_principal, version_principal, prob_candidata, latencia)
+            except Exception as e:
+                self.errores += 1
+                logging.error(f"Error en evaluación en sombra: {str(e)}")
+
+    def _registrar(self, prob_principal, version_principal, prob_candidata, latencia):
+        idx_principal = int(np.argmax(prob_principal))
+        idx_candidata = int(np.argmax(prob_candidata))
+        confianza_principal = float(prob_principal[idx_principal] * 100)
+        confianza_candidata = float(prob_candidata[idx_candidata] * 100)
+
+        with self._lock:
+            self.comparadas += 1
+            self.acuerdos += int(idx_principal == idx_candidata)
+            self._suma_delta_confianza += confianza_candidata - confianza_principal
+            self._latencias.append(latencia)
+
+        registro = {
+            "fecha": datetime.now().isoformat(),
+            "version_principal": version_principal,
+            "version_candidata": self.version,
+            "diagnostico_principal": CLASES[idx_principal],
+            "diagnostico_candidata": CLASES[idx_candidata],
+            "confianza_principal": round(confianza_principal, 2),
+            "confianza_candidata": round(confianza_candidata, 2),
+            "latencia_candidata_ms": round(latencia * 1000, 2),
+        }
+        os.makedirs(os.path.dirname(RUTA_REGISTRO_SOMBRA), exist_ok=True)
+        with open(RUTA_REGISTRO_SOMBRA, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro) + "\n")
+
+    def resumen(self) -> dict:
+        """Acuerdo, diferencia de confianza y latencia de la versión candidata"""
+        with self._lock:
+            return {
+                "version_candidata": self.version or None,
+                "fraccion": self.fraccion,
+                "comparadas": self.comparadas,
+                "tasa_acuerdo": round(self.acuerdos / self.comparadas, 4) if self.comparadas else None,
+                "delta_confianza_media": (
+                    round(self._suma_delta_confianza / self.comparadas, 2) if self.comparadas else None
+                ),
+                "latencia_candidata_p50_ms": percentil_ms(self._latencias, 0.50),
+                "latencia_candidata_p95_ms": percentil_ms(self._latencias, 0.95),
+                "en_cola": self._cola.qsize(),
+                "descartadas": self.descartadas,
+                "errores": self.errores,
+                "error_carga": self.error_carga,
+            }
+
+
+# Instancia compartida por el worker
+evaluador_sombra = EvaluadorSombra()
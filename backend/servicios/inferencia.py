@@ -0,0 +1,311 @@
+# backend/servicios/inferencia.py
+import asyncio
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from config.ajustes import (
+    HILOS_INFERENCIA,
+    ENVEJECIMIENTO_COLA_SEGUNDOS,
+    TTA_ACTIVO,
+    UMBRAL_CONFIANZA_TTA
+)
+from servicios.registro_modelos import registro_modelos
+from servicios.cascada import cascada
+from servicios.ajuste_cpu import configuracion_cpu
+
+CLASES = ["NORMAL", "PNEUMONIA"]
+
+# Orden de atención: perfiles de ALTA prioridad primero, tráfico anónimo al final
+PRIORIDADES = ["ALTA", "MEDIA", "BAJA", "ANONIMA"]
+RANGO_PRIORIDAD = {prioridad: rango for rango, prioridad in enumerate(PRIORIDADES)}
+
+# Esperas recientes conservadas por prioridad para percentiles
+MUESTRAS_ESPERA = 500
+
+
+
+# FUNCIÓN: PREPROCESAR IMAGEN
+
+def imagen_a_lote(img) -> np.ndarray:
+    """Convertir una imagen PIL en un lote de una sola imagen"""
+    arr = keras.preprocessing.image.img_to_array(img)
+    return np.expand_dims(arr, axis=0)
+
+
+
+# FUNCIÓN: VARIANTES PARA TTA
+
+# Recorte central del 90% (coordenadas normalizadas y1, x1, y2, x2)
+CAJA_RECORTE_TTA = [0.05, 0.05, 0.95, 0.95]
+
+
+def variantes_tta(arr: np.ndarray) -> np.ndarray:
+    """
+    Variantes deterministas de n imágenes (n, alto, ancho, 3) en un solo lote
+    (3n, alto, ancho, 3), agrupadas por variante: volteo horizontal, recorte
+    central y recorte central volteado.
+    """
+    n, alto, ancho, _ = arr.shape
+    imagenes = tf.convert_to_tensor(arr, dtype=tf.float32)
+    volteadas = tf.image.flip_left_right(imagenes)
+    recortes = tf.image.crop_and_resize(
+        tf.concat([imagenes, volteadas], axis=0),
+        boxes=[CAJA_RECORTE_TTA] * (2 * n),
+        box_indices=list(range(2 * n)),
+        crop_size=(alto, ancho),
+    )
+    return tf.concat([volteadas, recortes], axis=0).numpy()
+
+
+
+# FUNCIÓN: EVALUAR MODELO
+
+def evaluar_modelo(modelo, arr: np.ndarray, usar_tta: bool = TTA_ACTIVO,
+                   umbral: float = UMBRAL_CONFIANZA_TTA):
+    """
+    Salidas del modelo (probabilidades de la capa softmax) para un lote.
+    Si usar_tta, las imágenes cuya probabilidad máxima queda bajo el umbral se
+    reevalúan con sus variantes, todas juntas en una sola pasada, y se
+    promedian las salidas de cada imagen.
+    Devuelve (salidas, máscara de imágenes a las que se aplicó TTA).
+    """
+    preds = modelo.predict(arr, verbose=0)
+    usos_tta = np.zeros(len(preds), dtype=bool)
+    if not usar_tta:
+        return preds, usos_tta
+
+    ambiguas = np.flatnonzero(preds.max(axis=1) < umbral)
+    if len(ambiguas) == 0:
+        return preds, usos_tta
+
+    # (3n, clases) agrupadas por variante -> (3, n, clases)
+    preds_variantes = modelo.predict(variantes_tta(arr[ambiguas]), verbose=0)
+    preds_variantes = preds_variantes.reshape(-1, len(ambiguas), preds.shape[1])
+    preds[ambiguas] = (preds[ambiguas] + preds_variantes.sum(axis=0)) / (len(preds_variantes) + 1)
+    usos_tta[ambiguas] = True
+    return preds, usos_tta
+
+
+
+# FUNCIÓN: INTERPRETAR PREDICCIÓN
+
+def interpretar_prediccion(prob: np.ndarray) -> dict:
+    """Diagnóstico, confianza y probabilidades a partir de la salida del modelo"""
+    idx = int(np.argmax(prob))
+    return {
+        "diagnostico": CLASES[idx],
+        "confianza": round(float(prob[idx] * 100), 2),
+        "probabilidades": {
+            "normal": float(prob[0]),
+            "neumonia": float(prob[1]),
+        },
+    }
+
+
+
+# FUNCIÓN: PERCENTIL EN MILISEGUNDOS
+
+def percentil_ms(valores, p: float) -> float:
+    """Percentil p (0-1) de una colección de segundos, en milisegundos"""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    return round(ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))] * 1000, 2)
+
+
+
+# CLASE: MÉTRICAS POR PRIORIDAD
+
+class _MetricasPrioridad:
+    """Tiempo de espera en cola de una prioridad"""
+
+    def __init__(self):
+        self.atendidas = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.esperas = deque(maxlen=MUESTRAS_ESPERA)
+
+    def registrar(self, espera: float):
+        self.atendidas += 1
+        self.espera_total += espera
+        self.espera_maxima = max(self.espera_maxima, espera)
+        self.esperas.append(espera)
+
+    def resumen(self, en_cola: int) -> dict:
+        return {
+            "en_cola": en_cola,
+            "atendidas": self.atendidas,
+            "espera_media_ms": round(self.espera_total / self.atendidas * 1000, 2) if self.atendidas else 0.0,
+            "espera_p50_ms": percentil_ms(self.esperas, 0.50),
+            "espera_p95_ms": percentil_ms(self.esperas, 0.95),
+            "espera_maxima_ms": round(self.espera_maxima * 1000, 2),
+        }
+
+
+
+# CLASE: COLA DE INFERENCIA CON PRIORIDAD
+
+class ColaInferencia:
+    """
+    Cola de inferencia con prioridad y envejecimiento.
+    Cada prioridad es una FIFO; el hilo de inferencia atiende la cabeza con menor
+    rango efectivo = rango - espera / ENVEJECIMIENTO_COLA_SEGUNDOS, de modo que
+    una solicitud anónima que espera lo suficiente termina siendo atendida.
+    Las solicitudes ya encoladas se agrupan en micro-lotes de hasta micro_lote
+    imágenes (sin esperar a que lleguen más) y se evalúan en una sola pasada.
+    """
+
+    def __init__(self, hilos: int = HILOS_INFERENCIA, envejecimiento: float = ENVEJECIMIENTO_COLA_SEGUNDOS,
+                 micro_lote: int = None):
+        self._colas = {prioridad: deque() for prioridad in PRIORIDADES}
+        self._metricas = {prioridad: _MetricasPrioridad() for prioridad in PRIORIDADES}
+        self._latencias_modelo = deque(maxlen=MUESTRAS_ESPERA)
+        self._predicciones = 0
+        self._predicciones_tta = 0
+        self._resueltas_cascada = 0
+        self._condicion = threading.Condition()
+        self._num_hilos = hilos
+        self._envejecimiento = envejecimiento
+        self._micro_lote = max(1, micro_lote or configuracion_cpu()["micro_lote"])
+        self._lotes = 0
+        self._hilos = []
+
+    def _iniciar(self):
+        if self._hilos:
+            return
+        for i in range(self._num_hilos):
+            hilo = threading.Thread(target=self._trabajar, name=f"inferencia-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    async def predecir(self, arr: np.ndarray, prioridad: str = "ANONIMA"):
+        """
+        Encolar un lote y esperar sin bloquear el event loop.
+        Devuelve (probabilidades, versión del modelo que las produjo).
+        """
+        if prioridad not in RANGO_PRIORIDAD:
+            prioridad = "MEDIA"
+
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+
+        with self._condicion:
+            self._iniciar()
+            self._colas[prioridad].append((time.monotonic(), arr, futuro, loop))
+            self._condicion.notify()
+
+        return await futuro
+
+    def _siguiente(self):
+        """Extraer la solicitud con menor rango efectivo (se llama con el lock tomado)"""
+        ahora = time.monotonic()
+        elegida = None
+        mejor = None
+        for prioridad in PRIORIDADES:
+            cola = self._colas[prioridad]
+            if not cola:
+                continue
+            espera = ahora - cola[0][0]
+            rango = RANGO_PRIORIDAD[prioridad] - espera / self._envejecimiento
+            if mejor is None or rango < mejor:
+                elegida, mejor = prioridad, rango
+        if elegida is None:
+            return None
+        encolada, arr, futuro, loop = self._colas[elegida].popleft()
+        self._metricas[elegida].registrar(ahora - encolada)
+        return arr, futuro, loop
+
+    def _trabajar(self):
+        while True:
+            with self._condicion:
+                solicitud = self._siguiente()
+                while solicitud is None:
+                    self._condicion.wait()
+                    solicitud = self._siguiente()
+                solicitudes = [solicitud]
+                while len(solicitudes) < self._micro_lote:
+                    solicitud = self._siguiente()
+                    if solicitud is None:
+                        break
+                    solicitudes.append(solicitud)
+
+            solicitudes = [s for s in solicitudes if not s[1].cancelled()]
+            if solicitudes:
+                self._procesar(solicitudes)
+
+    def _procesar(self, solicitudes):
+        """Evaluar un micro-lote y resolver cada solicitud con su resultado"""
+        try:
+            inicio = time.perf_counter()
+            arr = np.concatenate([s[0] for s in solicitudes])
+            preds = np.zeros((len(arr), len(CLASES)), dtype=np.float32)
+            versiones = [None] * len(arr)
+            usos_tta = np.zeros(len(arr), dtype=bool)
+            resueltas = np.zeros(len(arr), dtype=bool)
+
+            # Cascada: el modelo rápido responde los casos claros
+            if cascada.activa:
+                preds_rapidas, resueltas = cascada.evaluar(arr)
+                preds[resueltas] = preds_rapidas[resueltas]
+                for i in np.flatnonzero(resueltas):
+                    versiones[i] = cascada.version
+
+            pendientes = np.flatnonzero(~resueltas)
+            if len(pendientes):
+                # Tomar la versión activa por lote: un cambio de versión no afecta a los que ya empezaron
+                version, modelo = registro_modelos.activo()
+                preds[pendientes], usos_tta[pendientes] = evaluar_modelo(modelo, arr[pendientes])
+                for i in pendientes:
+                    versiones[i] = version
+
+            probs = tf.nn.softmax(preds).numpy()
+            latencia = time.perf_counter() - inicio
+            self._latencias_modelo.extend([latencia] * len(arr))
+            self._predicciones += len(arr)
+            self._predicciones_tta += int(usos_tta.sum())
+            self._resueltas_cascada += int(resueltas.sum())
+            self._lotes += 1
+            for i, (_, futuro, loop) in enumerate(solicitudes):
+                loop.call_soon_threadsafe(_resolver, futuro, (probs[i], versiones[i]), None)
+        except Exception as e:
+            for _, futuro, loop in solicitudes:
+                loop.call_soon_threadsafe(_resolver, futuro, None, e)
+
+    def metricas(self) -> dict:
+        """Espera en cola por prioridad y latencia del modelo"""
+        with self._condicion:
+            return {
+                "por_prioridad": {
+                    prioridad: self._metricas[prioridad].resumen(len(self._colas[prioridad]))
+                    for prioridad in PRIORIDADES
+                },
+                "latencia_modelo_p50_ms": percentil_ms(self._latencias_modelo, 0.50),
+                "latencia_modelo_p95_ms": percentil_ms(self._latencias_modelo, 0.95),
+                "predicciones": self._predicciones,
+                "micro_lote": self._micro_lote,
+                "tamano_medio_lote": round(self._predicciones / self._lotes, 2) if self._lotes else 0.0,
+                "predicciones_con_tta": self._predicciones_tta,
+                "resueltas_por_cascada": self._resueltas_cascada,
+                "tasa_escalamiento_cascada": (
+                    round(1 - self._resueltas_cascada / self._predicciones, 4)
+                    if cascada.activa and self._predicciones else None
+                ),
+            }
+
+
+def _resolver(futuro, resultado, error):
+    if futuro.cancelled():
+        return
+    if error is not None:
+        futuro.set_exception(error)
+    else:
+        futuro.set_result(resultado)
+
+
+# Instancia compartida por el worker
+cola_inferencia = ColaInferencia()
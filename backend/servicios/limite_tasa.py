@@ -0,0 +1,160 @@
+# backend/servicios/limite_tasa.py
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+
+from config.ajustes import LIMITES_TASA, RUTA_ESTADO_LIMITE_TASA, CONFIAR_X_FORWARDED_FOR
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# Grupo de límites de tasa por ruta; las rutas no listadas usan "general"
+GRUPOS_TASA = {
+    "/predecir": "prediccion",
+    "/analisis/subir": "prediccion",
+    "/trabajos/analisis": "prediccion",
+    "/auth/login": "auth",
+    "/auth/registro": "auth",
+    "/auth/recuperar-password": "auth",
+}
+
+# Rutas sin límite de tasa (sondas de salud y raíz)
+RUTAS_SIN_LIMITE = {"/", "/salud"}
+
+# Cubetas por grupo; claves distintas que caen en la misma cubeta se desalojan
+CUBETAS_POR_GRUPO = 16384
+
+# Cubeta: hash de la clave (u64), tokens disponibles (f64), última reposición (f64)
+_FORMATO = struct.Struct("<Qdd")
+
+
+
+# CLASE: LIMITADOR DE TASA
+
+class LimitadorTasa:
+    """
+    Token buckets por (grupo de rutas, persona o IP).
+    El estado vive en un archivo mapeado en memoria de tamaño fijo, así todos los
+    workers del mismo host comparten las cubetas. Cada consulta toca una sola
+    cubeta y la bloquea con un lock de rango (fcntl), sin consultar la BD.
+    """
+
+    def __init__(self, limites: dict, ruta: Optional[str] = RUTA_ESTADO_LIMITE_TASA,
+                 cubetas_por_grupo: int = CUBETAS_POR_GRUPO):
+        self._limites = limites
+        self._indice_grupo = {grupo: i for i, grupo in enumerate(limites)}
+        self._cubetas = cubetas_por_grupo
+        self._lock = threading.Lock()
+
+        tamano = len(limites) * cubetas_por_grupo * _FORMATO.size
+        self._fd = None
+        try:
+            self._fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(self._fd).st_size < tamano:
+                os.ftruncate(self._fd, tamano)
+            self._mapa = mmap.mmap(self._fd, tamano)
+        except (OSError, TypeError) as e:
+            # Sin archivo compartido: cada worker mantiene sus propias cubetas
+            logging.warning(f"Límite de tasa sin estado compartido ({e}); se usa memoria local")
+            self._fd = None
+            self._mapa = mmap.mmap(-1, tamano)
+
+    def _bloquear(self, desplazamiento: int, bloquear: bool):
+        if fcntl is not None and self._fd is not None:
+            modo = fcntl.LOCK_EX if bloquear else fcntl.LOCK_UN
+            fcntl.lockf(self._fd, modo, _FORMATO.size, desplazamiento)
+
+    def consumir(self, grupo: str, clave: str) -> float:
+        """
+        Consumir un token de la cubeta (grupo, clave).
+        Devuelve 0 si se permite la solicitud, o los segundos hasta el próximo token.
+        """
+        return self._tomar(grupo, clave, 1.0)
+
+    def consultar(self, grupo: str, clave: str) -> float:
+        """Como consumir(), pero sin gastar el token"""
+        return self._tomar(grupo, clave, 0.0)
+
+    def _tomar(self, grupo: str, clave: str, costo: float) -> float:
+        capacidad, reposicion = self._limites[grupo]
+        hash_clave = int.from_bytes(
+            hashlib.blake2b(clave.encode(), digest_size=8).digest(), "little"
+        ) or 1
+        cubeta = self._indice_grupo[grupo] * self._cubetas + hash_clave % self._cubetas
+        desplazamiento = cubeta * _FORMATO.size
+        ahora = time.time()
+
+        with self._lock:
+            self._bloquear(desplazamiento, True)
+            try:
+                hash_guardado, tokens, ultima = _FORMATO.unpack_from(self._mapa, desplazamiento)
+                if hash_guardado != hash_clave:
+                    # Cubeta nueva (o de otra clave): empieza llena
+                    tokens, ultima = capacidad, ahora
+
+                tokens = min(capacidad, tokens + max(0.0, ahora - ultima) * reposicion)
+                if tokens >= 1.0:
+                    tokens -= costo
+                    espera = 0.0
+                else:
+                    espera = (1.0 - tokens) / reposicion if reposicion > 0 else 60.0
+
+                _FORMATO.pack_into(self._mapa, desplazamiento, hash_clave, tokens, ahora)
+            finally:
+                self._bloquear(desplazamiento, False)
+
+        return espera
+
+
+def grupo_tasa_de(ruta: str) -> Optional[str]:
+    """Grupo de límites de tasa de una ruta (None si no tiene límite)"""
+    if ruta in RUTAS_SIN_LIMITE:
+        return None
+    return GRUPOS_TASA.get(ruta, "general")
+
+
+def ip_cliente(scope) -> str:
+    """IP del cliente leída del scope ASGI (sin construir un Request)"""
+    if CONFIAR_X_FORWARDED_FOR:
+        for nombre, valor in scope["headers"]:
+            if nombre == b"x-forwarded-for":
+                return valor.decode("latin-1").split(",")[0].strip()
+    cliente = scope.get("client")
+    return cliente[0] if cliente else "desconocida"
+
+
+def clave_cliente(scope, token: Optional[str]) -> str:
+    """
+    Clave de la cubeta antes de consultar la BD: el token Bearer (que es el id
+    de la persona, así coincide con su cubeta) o, sin token, la IP del cliente
+    """
+    if token:
+        return f"persona:{token}"
+    return f"ip:{ip_cliente(scope)}"
+
+
+def clave_token_invalido(scope) -> str:
+    """Cubeta por IP de los tokens que no corresponden a ninguna persona"""
+    return f"token-invalido:{ip_cliente(scope)}"
+
+
+def respuesta_limite_tasa(espera: float) -> JSONResponse:
+    """Respuesta 429 para solicitudes que superan su límite de tasa"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Demasiadas solicitudes, intente nuevamente más tarde"},
+        headers={"Retry-After": str(max(1, int(espera + 0.999)))},
+    )
+
+
+# Instancia compartida por el worker
+limitador_tasa = LimitadorTasa(LIMITES_TASA)
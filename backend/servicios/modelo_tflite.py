@@ -0,0 +1,76 @@
+# backend/servicios/modelo_tflite.py
+import os
+import tempfile
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+
+
+# CLASE: MODELO TFLITE
+
+class ModeloTFLite:
+    """
+    Adaptador de un modelo .tflite (ej. int8 de la fase 3 de model.py) con la
+    misma interfaz que usa el servidor de un modelo Keras: input_shape y predict().
+    """
+
+    def __init__(self, ruta: str = None, hilos: int = None, contenido: bytes = None):
+        self._interprete = tf.lite.Interpreter(model_path=ruta, model_content=contenido, num_threads=hilos)
+        self._interprete.allocate_tensors()
+        self._entrada = self._interprete.get_input_details()[0]
+        self._salida = self._interprete.get_output_details()[0]
+        self.input_shape = (None, *[int(d) for d in self._entrada["shape"][1:]])
+        self._lote = int(self._entrada["shape"][0])
+        # El intérprete no es seguro entre hilos
+        self._lock = threading.Lock()
+
+    def _cuantizar(self, arr: np.ndarray) -> np.ndarray:
+        tipo = self._entrada["dtype"]
+        if tipo == np.float32:
+            return arr.astype(np.float32)
+        escala, cero = self._entrada["quantization"]
+        info = np.iinfo(tipo)
+        return np.clip(np.round(arr / escala + cero), info.min, info.max).astype(tipo)
+
+    def _decuantizar(self, arr: np.ndarray) -> np.ndarray:
+        if self._salida["dtype"] == np.float32:
+            return arr
+        escala, cero = self._salida["quantization"]
+        return (arr.astype(np.float32) - cero) * escala
+
+    def predict(self, arr, verbose=0) -> np.ndarray:
+        arr = np.asarray(arr, dtype=np.float32)
+        with self._lock:
+            if arr.shape[0] != self._lote:
+                self._interprete.resize_tensor_input(self._entrada["index"], list(arr.shape))
+                self._interprete.allocate_tensors()
+                self._entrada = self._interprete.get_input_details()[0]
+                self._salida = self._interprete.get_output_details()[0]
+                self._lote = arr.shape[0]
+            self._interprete.set_tensor(self._entrada["index"], self._cuantizar(arr))
+            self._interprete.invoke()
+            return self._decuantizar(self._interprete.get_tensor(self._salida["index"]))
+
+
+def cargar_modelo(ruta: str):
+    """Cargar un modelo .keras o .tflite"""
+    if os.path.splitext(ruta)[1].lower() == ".tflite":
+        return ModeloTFLite(ruta)
+    return tf.keras.models.load_model(ruta)
+
+
+def cargar_modelo_aislado(ruta: str, hilos: int):
+    """
+    Cargar un modelo como intérprete TFLite con `hilos` propios. Los .keras se
+    convierten en memoria (float32, sin cuantizar): predict() de Keras usaría
+    el pool intra-op de TensorFlow compartido con la inferencia principal.
+    """
+    if os.path.splitext(ruta)[1].lower() == ".tflite":
+        return ModeloTFLite(ruta, hilos)
+    modelo = tf.keras.models.load_model(ruta)
+    with tempfile.TemporaryDirectory() as directorio:
+        modelo.export(directorio)
+        contenido = tf.lite.TFLiteConverter.from_saved_model(directorio).convert()
+    return ModeloTFLite(hilos=hilos, contenido=contenido)
@@ -0,0 +1,199 @@
+# backend/servicios/registro_modelos.py
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+from config.ajustes import DIRECTORIO_MODELOS, INTERVALO_SINCRONIZACION_MODELO, TAMANO_ENTRADA_MODELO
+from servicios.modelo_tflite import cargar_modelo
+
+RUTA_MANIFIESTO = os.path.join(DIRECTORIO_MODELOS, "manifiesto.json")
+
+# Versión asignada al modelo descargado por trayendo_modelo cuando no hay manifiesto
+VERSION_INICIAL = "mobilenet-v1"
+
+
+
+# FUNCIONES: MANIFIESTO
+
+def leer_manifiesto() -> dict:
+    """Leer el manifiesto de versiones (vacío si no existe)"""
+    if not os.path.exists(RUTA_MANIFIESTO):
+        return {"activa": None, "versiones": {}}
+    with open(RUTA_MANIFIESTO, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def guardar_manifiesto(manifiesto: dict):
+    """Escribir el manifiesto de forma atómica (archivo temporal + os.replace)"""
+    os.makedirs(DIRECTORIO_MODELOS, exist_ok=True)
+    temporal = f"{RUTA_MANIFIESTO}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, RUTA_MANIFIESTO)
+
+
+def ruta_version(version: str, manifiesto: Optional[dict] = None) -> str:
+    """Ruta del artefacto (.keras o .tflite) de una versión registrada"""
+    manifiesto = manifiesto or leer_manifiesto()
+    info = manifiesto["versiones"].get(version)
+    if info is None:
+        raise KeyError(f"Versión de modelo no registrada: {version}")
+    archivo = info["archivo"]
+    return archivo if os.path.isabs(archivo) else os.path.join(DIRECTORIO_MODELOS, archivo)
+
+
+def registrar_version(version: str, ruta_origen: str, descripcion: str = "", **metadatos) -> dict:
+    """Copiar un artefacto .keras o .tflite al registro como una nueva versión"""
+    manifiesto = leer_manifiesto()
+    if version in manifiesto["versiones"]:
+        raise ValueError(f"La versión {version} ya existe")
+
+    archivo = os.path.join(version, "modelo" + os.path.splitext(ruta_origen)[1].lower())
+    os.makedirs(os.path.join(DIRECTORIO_MODELOS, version), exist_ok=True)
+    shutil.copy2(ruta_origen, os.path.join(DIRECTORIO_MODELOS, archivo))
+
+    manifiesto["versiones"][version] = {
+        "archivo": archivo,
+        "descripcion": descripcion,
+        "fecha_registro": datetime.now().isoformat(),
+        **metadatos,
+    }
+    guardar_manifiesto(manifiesto)
+    return manifiesto["versiones"][version]
+
+
+
+# FUNCIÓN: CARGAR Y CALENTAR UNA VERSIÓN
+
+def cargar_version(version: str):
+    """Cargar el modelo de una versión y ejecutar una predicción de calentamiento"""
+    modelo = cargar_modelo(ruta_version(version))
+
+    # Calentamiento: la primera predicción construye el grafo
+    _, alto, ancho, canales = modelo.input_shape
+    modelo.predict(np.zeros((1, alto, ancho, canales), dtype=np.float32), verbose=0)
+    return modelo
+
+
+
+# CLASE: REGISTRO DE MODELOS
+
+class RegistroModelos:
+    """
+    Versión activa del modelo en este worker.
+    El par (versión, modelo) se reemplaza con una sola asignación: las
+    inferencias en curso terminan con el modelo que ya tomaron y las nuevas
+    usan la versión recién activada, sin reiniciar el servidor.
+    """
+
+    def __init__(self):
+        self._activo = (None, None)
+        self._lock_carga = threading.Lock()
+        self.estado_carga = {"version": None, "estado": "inactivo", "error": None}
+
+    def inicializar(self):
+        """Activar la versión del manifiesto o, si no hay, el modelo de trayendo_modelo"""
+        import trayendo_modelo
+
+        manifiesto = leer_manifiesto()
+        if not manifiesto["versiones"]:
+            manifiesto["versiones"][VERSION_INICIAL] = {
+                "archivo": trayendo_modelo.MODEL_PATH,
+                "descripcion": "Modelo MobileNetV2 original",
+                "fecha_registro": datetime.now().isoformat(),
+            }
+            manifiesto["activa"] = VERSION_INICIAL
+            guardar_manifiesto(manifiesto)
+
+        activa = manifiesto["activa"] or VERSION_INICIAL
+        if os.path.abspath(ruta_version(activa, manifiesto)) == os.path.abspath(trayendo_modelo.MODEL_PATH):
+            # Reutilizar el modelo ya cargado al importar trayendo_modelo
+            self._activo = (activa, trayendo_modelo.model)
+        else:
+            self.cargar_y_activar(activa, persistir=False)
+
+    def activo(self):
+        """Par (versión, modelo) activo"""
+        return self._activo
+
+    @property
+    def version_activa(self) -> Optional[str]:
+        return self._activo[0]
+
+    @property
+    def disponible(self) -> bool:
+        return self._activo[1] is not None
+
+    def cargar_y_activar(self, version: str, persistir: bool = True) -> bool:
+        """
+        Cargar, calentar y activar una versión (bloqueante: usar en un hilo).
+        Si falla, la versión anterior sigue activa y el error queda en estado_carga.
+        """
+        with self._lock_carga:
+            self.estado_carga = {"version": version, "estado": "cargando", "error": None}
+            try:
+                modelo = cargar_version(version)
+                # El servidor decodifica las imágenes a TAMANO_ENTRADA_MODELO
+                _, alto, ancho, _ = modelo.input_shape
+                if (alto, ancho) != (TAMANO_ENTRADA_MODELO, TAMANO_ENTRADA_MODELO):
+                    raise ValueError(
+                        f"La versión {version} espera {alto}x{ancho}; "
+                        f"TAMANO_ENTRADA_MODELO es {TAMANO_ENTRADA_MODELO}"
+                    )
+                self._activo = (version, modelo)
+
+                if persistir:
+                    manifiesto = leer_manifiesto()
+                    manifiesto["activa"] = version
+                    guardar_manifiesto(manifiesto)
+
+                self.estado_carga = {"version": version, "estado": "activo", "error": None}
+                logging.info(f"Modelo {version} activado")
+                return True
+            except Exception as e:
+                self.estado_carga = {"version": version, "estado": "error", "error": str(e)}
+                logging.error(f"Error activando modelo {version}: {str(e)}")
+                return False
+
+    @property
+    def cargando(self) -> bool:
+        return self.estado_carga["estado"] == "cargando"
+
+
+# Instancia compartida por el worker
+registro_modelos = RegistroModelos()
+
+
+
+# TAREA: SINCRONIZAR VERSIÓN ACTIVA ENTRE WORKERS
+
+async def sincronizar_version_activa():
+    """Adoptar la versión activa del manifiesto (activada desde otro worker)"""
+    while True:
+        await asyncio.sleep(INTERVALO_SINCRONIZACION_MODELO)
+        try:
+            activa = leer_manifiesto().get("activa")
+            estado = registro_modelos.estado_carga
+            # No reintentar en cada ciclo una versión cuya carga ya falló
+            fallida = estado["version"] == activa and estado["estado"] == "error"
+            if activa and activa != registro_modelos.version_activa and not registro_modelos.cargando and not fallida:
+                await asyncio.to_thread(registro_modelos.cargar_y_activar, activa, False)
+        except Exception as e:
+            logging.error(f"Error sincronizando versión del modelo: {str(e)}")
+
+
+# CLI: python -m servicios.registro_modelos registrar <version> <ruta.keras> [descripcion]
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "registrar":
+        info = registrar_version(sys.argv[2], sys.argv[3], " ".join(sys.argv[4:]))
+        print(f"Versión {sys.argv[2]} registrada: {info}")
+    else:
+        print("Uso: python -m servicios.registro_modelos registrar <version> <ruta.keras> [descripcion]")
@@ -0,0 +1,216 @@
+# backend/servicios/resiliencia.py
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Callable
+
+import httpx
+from fastapi import HTTPException
+
+from config.ajustes import (
+    TIMEOUT_SUPABASE_CONSULTA,
+    TIMEOUT_SUPABASE_ESCRITURA,
+    TIMEOUT_SUPABASE_STORAGE,
+    REINTENTOS_SUPABASE,
+    ESPERA_BASE_REINTENTO,
+    UMBRAL_FALLOS_CIRCUITO,
+    SEGUNDOS_CIRCUITO_ABIERTO
+)
+
+# Operación -> (servicio/circuito, timeout en segundos, reintentos).
+# Las escrituras no se reintentan: un timeout no garantiza que no se aplicaran.
+# Las subidas a storage sí, porque la clave depende del contenido (idempotentes).
+OPERACIONES = {
+    "consulta": ("postgrest", TIMEOUT_SUPABASE_CONSULTA, REINTENTOS_SUPABASE),
+    "escritura": ("postgrest", TIMEOUT_SUPABASE_ESCRITURA, 0),
+    "storage": ("storage", TIMEOUT_SUPABASE_STORAGE, REINTENTOS_SUPABASE),
+}
+
+
+
+# EXCEPCIÓN: DEPENDENCIA NO DISPONIBLE
+
+class DependenciaNoDisponible(HTTPException):
+    """Supabase no respondió a tiempo, falló repetidamente o su circuito está abierto"""
+
+    def __init__(self, servicio: str, reintentar_en: float):
+        super().__init__(
+            status_code=503,
+            detail="Servicio de datos no disponible temporalmente, intente nuevamente",
+            headers={"Retry-After": str(max(1, int(reintentar_en + 0.999)))},
+        )
+        self.servicio = servicio
+
+
+
+# CLASE: CIRCUITO
+
+class Circuito:
+    """
+    Circuit breaker por servicio.
+    - cerrado: las llamadas pasan; UMBRAL_FALLOS_CIRCUITO fallos seguidos lo abren
+    - abierto: las llamadas fallan de inmediato durante SEGUNDOS_CIRCUITO_ABIERTO
+    - semiabierto: pasa una sola llamada de prueba; si funciona se cierra
+    """
+
+    def __init__(self, nombre: str, umbral_fallos: int = UMBRAL_FALLOS_CIRCUITO,
+                 segundos_apertura: float = SEGUNDOS_CIRCUITO_ABIERTO):
+        self.nombre = nombre
+        self.umbral_fallos = umbral_fallos
+        self.segundos_apertura = segundos_apertura
+        self._fallos = 0
+        self._abierto_desde = None
+        self._prueba_en_curso = False
+        self._aperturas = 0
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self._abierto_desde is None:
+                return True
+            if time.monotonic() - self._abierto_desde < self.segundos_apertura or self._prueba_en_curso:
+                return False
+            self._prueba_en_curso = True
+            return True
+
+    def exito(self):
+        with self._lock:
+            if self._abierto_desde is not None:
+                logging.info(f"Circuito {self.nombre} cerrado")
+            self._fallos = 0
+            self._abierto_desde = None
+            self._prueba_en_curso = False
+
+    def fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._prueba_en_curso or (self._abierto_desde is None and self._fallos >= self.umbral_fallos):
+                if self._abierto_desde is None:
+                    self._aperturas += 1
+                    logging.warning(f"Circuito {self.nombre} abierto tras {self._fallos} fallos")
+                self._abierto_desde = time.monotonic()
+            self._prueba_en_curso = False
+
+    def liberar_prueba(self):
+        """
+        La llamada terminó sin resultado (cancelada): no cuenta como éxito ni
+        como fallo, pero la próxima llamada puede volver a probar el servicio
+        """
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def reintentar_en(self) -> float:
+        """Segundos hasta que se permita la próxima llamada de prueba"""
+        with self._lock:
+            if self._abierto_desde is None:
+                return 0.0
+            return max(0.0, self.segundos_apertura - (time.monotonic() - self._abierto_desde))
+
+    def estado(self) -> dict:
+        with self._lock:
+            if self._abierto_desde is None:
+                estado = "cerrado"
+            elif time.monotonic() - self._abierto_desde >= self.segundos_apertura:
+                estado = "semiabierto"
+            else:
+                estado = "abierto"
+            return {"estado": estado, "fallos_consecutivos": self._fallos, "aperturas": self._aperturas}
+
+
+# Un circuito por servicio de Supabase, compartido por el worker
+circuitos = {"postgrest": Circuito("postgrest"), "storage": Circuito("storage")}
+
+
+
+# FUNCIONES: CLASIFICAR ERRORES Y ESPERAR ENTRE REINTENTOS
+
+def es_fallo_dependencia(error: Exception) -> bool:
+    """
+    Timeouts, errores de red y respuestas 5xx cuentan como fallos del servicio.
+    Los errores de la solicitud (4xx, sin filas, duplicados) no abren el circuito.
+    """
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    estado = getattr(error, "status", None) or getattr(error, "status_code", None) or getattr(error, "code", None)
+    try:
+        return 500 <= int(estado) < 600
+    except (TypeError, ValueError):
+        return False
+
+
+def espera_reintento(intento: int) -> float:
+    """Backoff exponencial con jitter completo"""
+    return random.uniform(0, ESPERA_BASE_REINTENTO * (2 ** intento))
+
+
+
+# FUNCIONES: LLAMAR A SUPABASE CON TIMEOUT, REINTENTOS Y CIRCUITO
+
+async def llamar_supabase(operacion: str, funcion: Callable):
+    """
+    Ejecutar una llamada síncrona del cliente de Supabase en un hilo, sin
+    bloquear el event loop, con el timeout y los reintentos de la operación.
+    Lanza DependenciaNoDisponible (503) si el servicio no está disponible.
+    """
+    servicio, timeout, reintentos = OPERACIONES[operacion]
+    circuito = circuitos[servicio]
+
+    for intento in range(reintentos + 1):
+        if not circuito.permitir():
+            raise DependenciaNoDisponible(servicio, circuito.reintentar_en())
+        try:
+            resultado = await asyncio.wait_for(asyncio.to_thread(funcion), timeout)
+        except asyncio.CancelledError:
+            # El cliente se desconectó o un wait_for externo canceló la llamada:
+            # CancelledError no es Exception y sin esto la prueba quedaría tomada
+            circuito.liberar_prueba()
+            raise
+        except Exception as e:
+            if not es_fallo_dependencia(e):
+                circuito.exito()
+                raise
+            circuito.fallo()
+            logging.warning(f"Fallo de {servicio} ({operacion}, intento {intento + 1}): {type(e).__name__} {e}")
+            if intento == reintentos:
+                raise DependenciaNoDisponible(servicio, circuito.reintentar_en()) from e
+            await asyncio.sleep(espera_reintento(intento))
+        else:
+            circuito.exito()
+            return resultado
+
+
+def llamar_supabase_sync(operacion: str, funcion: Callable):
+    """
+    Versión para hilos (tareas en segundo plano y reconciliación).
+    El límite de tiempo lo aplica el timeout HTTP configurado en el cliente.
+    """
+    servicio, _, reintentos = OPERACIONES[operacion]
+    circuito = circuitos[servicio]
+
+    for intento in range(reintentos + 1):
+        if not circuito.permitir():
+            raise DependenciaNoDisponible(servicio, circuito.reintentar_en())
+        try:
+            resultado = funcion()
+        except Exception as e:
+            if not es_fallo_dependencia(e):
+                circuito.exito()
+                raise
+            circuito.fallo()
+            logging.warning(f"Fallo de {servicio} ({operacion}, intento {intento + 1}): {type(e).__name__} {e}")
+            if intento == reintentos:
+                raise DependenciaNoDisponible(servicio, circuito.reintentar_en()) from e
+            time.sleep(espera_reintento(intento))
+        except BaseException:
+            # KeyboardInterrupt / SystemExit durante la prueba: liberarla igualmente
+            circuito.liberar_prueba()
+            raise
+        else:
+            circuito.exito()
+            return resultado
+
+
+def estado_circuitos() -> dict:
+    return {nombre: circuito.estado() for nombre, circuito in circuitos.items()}
@@ -0,0 +1,39 @@
+# backend/servicios/respuestas.py
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Sin orjson: json estándar con la misma salida compacta en UTF-8
+    orjson = None
+
+# numpy (probabilidades, confianza) y claves no str se serializan sin conversión previa
+OPCIONES_ORJSON = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def serializar_json(contenido: Any) -> bytes:
+    """JSON compacto en UTF-8 (orjson si está instalado)"""
+    if orjson is not None:
+        return orjson.dumps(contenido, option=OPCIONES_ORJSON)
+    return json.dumps(
+        contenido,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+
+# CLASE: RESPUESTA JSON
+
+class RespuestaJSON(JSONResponse):
+    """
+    Respuesta por defecto de la API (default_response_class).
+    Igual a JSONResponse pero serializa con orjson: los historiales con
+    `detalles_analisis` largos se codifican varias veces más rápido.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return serializar_json(content)
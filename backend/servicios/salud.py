@@ -0,0 +1,82 @@
+# backend/servicios/salud.py
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Callable
+
+from config.ajustes import INTERVALO_SONDEO_SALUD, TIMEOUT_SONDEO_SALUD
+from config.conexion import verificar_conexion, verificar_storage
+
+
+
+# CLASE: MONITOR DE SALUD
+
+class MonitorSalud:
+    """
+    Estado de las dependencias (BD y storage) refrescado en segundo plano.
+    /salud responde con el último estado conocido sin consultar a Supabase,
+    así las sondas del balanceador no generan carga ni dependen de su latencia.
+    """
+
+    def __init__(self, sondas: dict, timeout: float = TIMEOUT_SONDEO_SALUD):
+        self._sondas = sondas
+        self._timeout = timeout
+        self.dependencias = {
+            nombre: {
+                "disponible": None,
+                "ultima_verificacion": None,
+                "ultimo_exito": None,
+                "latencia_ms": None,
+                "error": None,
+            }
+            for nombre in sondas
+        }
+
+    async def _sondear(self, nombre: str, sonda: Callable[[], bool]):
+        estado = self.dependencias[nombre]
+        inicio = time.perf_counter()
+        try:
+            disponible = await asyncio.wait_for(asyncio.to_thread(sonda), self._timeout)
+            error = None if disponible else "la verificación falló"
+        except asyncio.TimeoutError:
+            disponible, error = False, f"sin respuesta en {self._timeout} s"
+        except Exception as e:
+            disponible, error = False, str(e)
+
+        ahora = datetime.now().isoformat()
+        estado.update({
+            "disponible": disponible,
+            "ultima_verificacion": ahora,
+            "latencia_ms": round((time.perf_counter() - inicio) * 1000, 2),
+            "error": error,
+        })
+        if disponible:
+            estado["ultimo_exito"] = ahora
+        else:
+            logging.warning(f"Dependencia {nombre} no disponible: {error}")
+
+    async def sondear(self):
+        """Verificar todas las dependencias en paralelo"""
+        await asyncio.gather(*(self._sondear(nombre, sonda) for nombre, sonda in self._sondas.items()))
+
+    @property
+    def dependencias_disponibles(self) -> bool:
+        return all(estado["disponible"] for estado in self.dependencias.values())
+
+
+# Instancia compartida por el worker
+monitor_salud = MonitorSalud({"supabase": verificar_conexion, "storage": verificar_storage})
+
+
+
+# TAREA: SONDEO PERIÓDICO
+
+async def sondear_periodicamente():
+    """Sondear al arrancar y luego cada INTERVALO_SONDEO_SALUD"""
+    while True:
+        try:
+            await monitor_salud.sondear()
+        except Exception as e:
+            logging.error(f"Error sondeando dependencias: {str(e)}")
+        await asyncio.sleep(INTERVALO_SONDEO_SALUD)
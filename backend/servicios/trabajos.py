@@ -0,0 +1,241 @@
+# backend/servicios/trabajos.py
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+from config.ajustes import (
+    DIRECTORIO_TRABAJOS,
+    ENVEJECIMIENTO_COLA_SEGUNDOS,
+    SEGUNDOS_CONCESION_TRABAJO,
+    MAX_INTENTOS_TRABAJO,
+    RETENCION_TRABAJOS_HORAS
+)
+from servicios.inferencia import RANGO_PRIORIDAD
+
+# Estados de un trabajo
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+COMPLETADO = "completado"
+ERROR = "error"
+TERMINADOS = (COMPLETADO, ERROR)
+
+# Error de un trabajo cuyo trabajador se detuvo en todos los intentos sin registrar otro
+ERROR_INTENTOS_AGOTADOS = "El análisis no pudo completarse"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    prioridad INTEGER NOT NULL,
+    persona_id TEXT,
+    content_type TEXT NOT NULL,
+    tamano INTEGER NOT NULL,
+    ancho INTEGER NOT NULL,
+    alto INTEGER NOT NULL,
+    progreso INTEGER NOT NULL DEFAULT 0,
+    etapa TEXT,
+    resultado TEXT,
+    error TEXT,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    trabajador TEXT,
+    vence REAL,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trabajos_por_atender ON trabajos (estado, prioridad, creado);
+"""
+
+
+
+# CLASE: COLA DE TRABAJOS (SQLITE)
+
+class ColaTrabajos:
+    """
+    Cola durable de análisis asíncronos en un archivo SQLite local (WAL).
+    La API encola y consulta; los procesos de trabajador.py toman trabajos
+    con una concesión que renuevan en cada avance. Si un trabajador se cae,
+    la concesión vence y otro retoma el trabajo (hasta MAX_INTENTOS_TRABAJO).
+    La imagen de cada trabajo se guarda junto a la base hasta que termina.
+    """
+
+    def __init__(self, directorio: str = DIRECTORIO_TRABAJOS):
+        self.directorio = directorio
+        self.directorio_imagenes = os.path.join(directorio, "imagenes")
+        self._ruta = os.path.join(directorio, "trabajos.sqlite3")
+        self._local = threading.local()
+
+    def _conexion(self) -> sqlite3.Connection:
+        """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)"""
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            os.makedirs(self.directorio_imagenes, exist_ok=True)
+            conexion = sqlite3.connect(self._ruta, timeout=30, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.executescript(_ESQUEMA)
+            self._local.conexion = conexion
+        return conexion
+
+    def ruta_imagen(self, trabajo_id: str) -> str:
+        return os.path.join(self.directorio_imagenes, trabajo_id)
+
+    def encolar(self, archivo, tamano: int, content_type: str, dimensiones, persona_id: Optional[str],
+                prioridad: str = "ANONIMA") -> str:
+        """
+        Copiar la imagen al directorio de la cola y registrar el trabajo.
+        La fila se inserta después de sincronizar la imagen a disco: un
+        trabajo visible siempre tiene su imagen.
+        `prioridad` es la de la cola de inferencia (ALTA, MEDIA, BAJA o ANONIMA).
+        """
+        trabajo_id = str(uuid.uuid4())
+        ruta = self.ruta_imagen(trabajo_id)
+        conexion = self._conexion()
+
+        archivo.seek(0)
+        with open(ruta, "wb") as destino:
+            shutil.copyfileobj(archivo, destino)
+            destino.flush()
+            os.fsync(destino.fileno())
+
+        ahora = time.time()
+        ancho, alto = dimensiones
+        try:
+            conexion.execute(
+                "INSERT INTO trabajos (id, estado, prioridad, persona_id, content_type, tamano, ancho, alto,"
+                " etapa, creado, actualizado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (trabajo_id, PENDIENTE, RANGO_PRIORIDAD.get(prioridad, RANGO_PRIORIDAD["MEDIA"]), persona_id,
+                 content_type, tamano, ancho, alto, "en cola", ahora, ahora),
+            )
+        except Exception:
+            os.remove(ruta)
+            raise
+        return trabajo_id
+
+    def tomar(self, trabajador: str) -> Optional[dict]:
+        """
+        Reservar el siguiente trabajo pendiente (o con la concesión vencida).
+        Mismo orden que la cola de inferencia: menor rango efectivo =
+        prioridad - espera / ENVEJECIMIENTO_COLA_SEGUNDOS.
+        BEGIN IMMEDIATE serializa a los trabajadores: cada trabajo se entrega a uno solo.
+        """
+        conexion = self._conexion()
+        while True:
+            ahora = time.time()
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                fila = conexion.execute(
+                    "SELECT * FROM trabajos WHERE estado = ? OR (estado = ? AND vence < ?)"
+                    " ORDER BY prioridad - (? - creado) / ?, creado LIMIT 1",
+                    (PENDIENTE, EN_PROCESO, ahora, ahora, ENVEJECIMIENTO_COLA_SEGUNDOS),
+                ).fetchone()
+                if fila is None:
+                    conexion.execute("COMMIT")
+                    return None
+
+                if fila["intentos"] >= MAX_INTENTOS_TRABAJO:
+                    # Concesión vencida en el último intento: el trabajador se cayó repetidamente.
+                    # Se conserva el último error real registrado por un intento anterior
+                    conexion.execute(
+                        "UPDATE trabajos SET estado = ?, error = COALESCE(error, ?), actualizado = ? WHERE id = ?",
+                        (ERROR, ERROR_INTENTOS_AGOTADOS, ahora, fila["id"]),
+                    )
+                    conexion.execute("COMMIT")
+                    self._borrar_imagen(fila["id"])
+                    logging.error(f"Trabajo {fila['id']} descartado tras {fila['intentos']} intentos")
+                    continue
+
+                conexion.execute(
+                    "UPDATE trabajos SET estado = ?, trabajador = ?, vence = ?, intentos = intentos + 1,"
+                    " actualizado = ? WHERE id = ?",
+                    (EN_PROCESO, trabajador, ahora + SEGUNDOS_CONCESION_TRABAJO, ahora, fila["id"]),
+                )
+                conexion.execute("COMMIT")
+            except Exception:
+                conexion.execute("ROLLBACK")
+                raise
+
+            trabajo = dict(fila)
+            trabajo["intentos"] += 1
+            return trabajo
+
+    def avanzar(self, trabajo_id: str, progreso: int, etapa: str):
+        """Registrar el avance y renovar la concesión"""
+        ahora = time.time()
+        self._conexion().execute(
+            "UPDATE trabajos SET progreso = ?, etapa = ?, vence = ?, actualizado = ? WHERE id = ? AND estado = ?",
+            (progreso, etapa, ahora + SEGUNDOS_CONCESION_TRABAJO, ahora, trabajo_id, EN_PROCESO),
+        )
+
+    def completar(self, trabajo_id: str, resultado: dict):
+        self._conexion().execute(
+            "UPDATE trabajos SET estado = ?, progreso = 100, etapa = ?, resultado = ?, error = NULL,"
+            " actualizado = ? WHERE id = ?",
+            (COMPLETADO, "completado", json.dumps(resultado, ensure_ascii=False), time.time(), trabajo_id),
+        )
+        self._borrar_imagen(trabajo_id)
+
+    def fallar(self, trabajo_id: str, error: str, reintentar: bool = False):
+        """Marcar el trabajo con error o, si reintentar, devolverlo a la cola"""
+        if reintentar:
+            self._conexion().execute(
+                "UPDATE trabajos SET estado = ?, etapa = ?, error = ?, actualizado = ? WHERE id = ?",
+                (PENDIENTE, "en cola (reintento)", error, time.time(), trabajo_id),
+            )
+            return
+        self._conexion().execute(
+            "UPDATE trabajos SET estado = ?, etapa = ?, error = ?, actualizado = ? WHERE id = ?",
+            (ERROR, "error", error, time.time(), trabajo_id),
+        )
+        self._borrar_imagen(trabajo_id)
+
+    def obtener(self, trabajo_id: str) -> Optional[dict]:
+        fila = self._conexion().execute("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+        if fila is None:
+            return None
+        trabajo = dict(fila)
+        trabajo["resultado"] = json.loads(trabajo["resultado"]) if trabajo["resultado"] else None
+        return trabajo
+
+    def pendientes(self) -> int:
+        return self._conexion().execute(
+            "SELECT COUNT(*) FROM trabajos WHERE estado IN (?, ?)", (PENDIENTE, EN_PROCESO)
+        ).fetchone()[0]
+
+    def purgar(self, horas: float = RETENCION_TRABAJOS_HORAS) -> int:
+        """Eliminar trabajos terminados hace más de `horas`"""
+        cursor = self._conexion().execute(
+            "DELETE FROM trabajos WHERE estado IN (?, ?) AND actualizado < ?",
+            (*TERMINADOS, time.time() - horas * 3600),
+        )
+        return cursor.rowcount
+
+    def _borrar_imagen(self, trabajo_id: str):
+        try:
+            os.remove(self.ruta_imagen(trabajo_id))
+        except FileNotFoundError:
+            pass
+
+
+def vista_trabajo(trabajo: dict) -> dict:
+    """Campos del trabajo expuestos por la API"""
+    return {
+        "trabajo_id": trabajo["id"],
+        "estado": trabajo["estado"],
+        "progreso": trabajo["progreso"],
+        "etapa": trabajo["etapa"],
+        "resultado": trabajo["resultado"],
+        "error": trabajo["error"] if trabajo["estado"] == ERROR else None,
+        "creado": trabajo["creado"],
+        "actualizado": trabajo["actualizado"],
+    }
+
+
+# Instancia compartida por el worker
+cola_trabajos = ColaTrabajos()
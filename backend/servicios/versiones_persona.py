@@ -0,0 +1,132 @@
+# backend/servicios/versiones_persona.py
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+
+from config.ajustes import GET_CONDICIONALES, RUTA_VERSIONES_PERSONA, RANURAS_VERSIONES_PERSONA
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# Recursos por persona que responden a GET condicionales (ETag / Last-Modified)
+RUTAS_CONDICIONALES = {"/analisis/historial", "/analisis/perfil-salud", "/persona/perfil"}
+
+# Ranura: hash de la persona (u64), versión (u64), última modificación (segundos, u64)
+_FORMATO = struct.Struct("<QQQ")
+
+
+
+# CLASE: VERSIONES POR PERSONA
+
+class VersionesPersona:
+    """
+    Contador de versión por persona, incrementado en cada escritura de su
+    historial, perfil o perfil de salud. Determina el ETag y Last-Modified de
+    RUTAS_CONDICIONALES, así un GET con If-None-Match vigente responde 304 sin
+    consultar la BD.
+    Vive en un archivo mapeado en memoria compartido por los workers del host
+    (como el límite de tasa). Una ranura nueva o reutilizada por otra persona
+    empieza en una versión basada en el reloj, nunca en un valor ya entregado.
+    Supone un solo host: otro host no ve las escrituras de este y seguiría
+    respondiendo 304 con datos viejos. Con varios hosts, GET_CONDICIONALES=false
+    (sin ruta: se generan validadores pero nunca se responde 304).
+    """
+
+    def __init__(self, ruta: Optional[str] = RUTA_VERSIONES_PERSONA, ranuras: int = RANURAS_VERSIONES_PERSONA):
+        self._ranuras = ranuras
+        self._lock = threading.Lock()
+
+        tamano = ranuras * _FORMATO.size
+        self._fd = None
+        if ruta is None:
+            self._mapa = mmap.mmap(-1, tamano)
+            return
+        try:
+            self._fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(self._fd).st_size < tamano:
+                os.ftruncate(self._fd, tamano)
+            self._mapa = mmap.mmap(self._fd, tamano)
+        except (OSError, TypeError) as e:
+            # Sin archivo compartido otro worker podría aplicar una escritura sin
+            # que este lo sepa: se generan validadores pero nunca se responde 304
+            logging.warning(f"Versiones por persona sin estado compartido ({e}); GET condicionales desactivados")
+            self._fd = None
+            self._mapa = mmap.mmap(-1, tamano)
+
+    @property
+    def compartido(self) -> bool:
+        return self._fd is not None
+
+    def _bloquear(self, desplazamiento: int, bloquear: bool):
+        if fcntl is not None and self._fd is not None:
+            modo = fcntl.LOCK_EX if bloquear else fcntl.LOCK_UN
+            fcntl.lockf(self._fd, modo, _FORMATO.size, desplazamiento)
+
+    def _actualizar(self, persona_id: str, incrementar: bool) -> Tuple[int, int, int]:
+        hash_persona = int.from_bytes(
+            hashlib.blake2b(persona_id.encode(), digest_size=8).digest(), "little"
+        ) or 1
+        desplazamiento = (hash_persona % self._ranuras) * _FORMATO.size
+        ahora = int(time.time())
+
+        with self._lock:
+            self._bloquear(desplazamiento, True)
+            try:
+                hash_guardado, version, modificado = _FORMATO.unpack_from(self._mapa, desplazamiento)
+                if hash_guardado != hash_persona:
+                    version, modificado = time.time_ns(), ahora
+                elif incrementar:
+                    # Last-Modified distinto por versión aunque haya varias escrituras por segundo
+                    version, modificado = version + 1, max(ahora, modificado + 1)
+                else:
+                    return hash_persona, version, modificado
+                _FORMATO.pack_into(self._mapa, desplazamiento, hash_persona, version, modificado)
+            finally:
+                self._bloquear(desplazamiento, False)
+
+        return hash_persona, version, modificado
+
+    def incrementar(self, persona_id: str):
+        """Registrar una escritura (llamar después de confirmarla en la BD)"""
+        try:
+            self._actualizar(persona_id, incrementar=True)
+        except Exception as e:
+            logging.error(f"Error incrementando versión de {persona_id}: {str(e)}")
+
+    def validadores(self, persona_id: str) -> Tuple[str, str, int]:
+        """(ETag, Last-Modified, segundos de la última modificación) de la versión actual"""
+        hash_persona, version, modificado = self._actualizar(persona_id, incrementar=False)
+        # Débil: la compresión cambia los bytes pero no el contenido
+        return f'W/"{hash_persona:x}-{version:x}"', formatdate(modificado, usegmt=True), modificado
+
+
+# Instancia compartida por el worker
+versiones_persona = VersionesPersona(RUTA_VERSIONES_PERSONA if GET_CONDICIONALES else None)
+
+
+
+# FUNCIÓN: EVALUAR GET CONDICIONAL
+
+def no_modificado(if_none_match: Optional[str], if_modified_since: Optional[str], etag: str, modificado: int) -> bool:
+    """
+    True si el cliente ya tiene la versión actual (responder 304).
+    If-None-Match tiene prioridad; If-Modified-Since solo se evalúa sin él.
+    """
+    if if_none_match is not None:
+        etiquetas = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+        return "*" in etiquetas or etag.removeprefix("W/") in etiquetas
+
+    if if_modified_since is not None:
+        try:
+            return modificado <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
@@ -0,0 +1,41 @@
+# backend/tests/test_resiliencia.py
+"""
+Circuito de Supabase: una llamada de prueba cancelada no debe dejar el
+circuito abierto para siempre.
+
+Uso (desde backend/):
+    python -m pytest tests
+"""
+import asyncio
+import threading
+
+from servicios import resiliencia
+from servicios.resiliencia import Circuito, llamar_supabase
+
+
+def test_prueba_semiabierta_cancelada_libera_el_circuito(monkeypatch):
+    circuito = Circuito("postgrest", umbral_fallos=1, segundos_apertura=0)
+    monkeypatch.setitem(resiliencia.circuitos, "postgrest", circuito)
+    circuito.fallo()
+    assert circuito.estado()["estado"] == "semiabierto"
+
+    liberar = threading.Event()
+
+    async def escenario():
+        tarea = asyncio.create_task(llamar_supabase("consulta", lambda: liberar.wait(5)))
+        await asyncio.sleep(0.05)
+        # La prueba está en curso: ninguna otra llamada pasa
+        assert not circuito.permitir()
+        tarea.cancel()
+        try:
+            await tarea
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        asyncio.run(escenario())
+    finally:
+        liberar.set()
+
+    # Sin la liberación, permitir() devolvería False hasta reiniciar el proceso
+    assert circuito.permitir()
@@ -0,0 +1,76 @@
+# backend/trabajador.py
+"""
+Procesos de inferencia para los análisis asíncronos (POST /trabajos/analisis).
+
+Cada proceso aplica el autoajuste de CPU, carga el modelo una sola vez y
+atiende la cola SQLite de DIRECTORIO_TRABAJOS con CONCURRENCIA_TRABAJADOR
+tareas. Se escalan por separado de la API: basta con lanzar más procesos
+(o más instancias de este script) en el mismo host que la API.
+
+Uso (desde backend/):
+    python trabajador.py
+    python trabajador.py --procesos 2 --concurrencia 4
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import time
+
+from config.ajustes import PROCESOS_TRABAJADOR, CONCURRENCIA_TRABAJADOR
+
+
+def ejecutar_trabajador(indice: int, concurrencia: int):
+    """Proceso hijo: TensorFlow se importa aquí, después de aplicar la configuración de CPU"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+
+    from servicios.ajuste_cpu import aplicar_configuracion_cpu
+    aplicar_configuracion_cpu()
+
+    from servicios.analisis_asincrono import atender_trabajos
+    nombre = f"{socket.gethostname()}:{os.getpid()}"
+    # Solo el primer proceso purga los trabajos terminados
+    asyncio.run(atender_trabajos(nombre, concurrencia, purgar=indice == 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Procesos de inferencia para análisis asíncronos")
+    parser.add_argument("--procesos", type=int, default=PROCESOS_TRABAJADOR)
+    parser.add_argument("--concurrencia", type=int, default=CONCURRENCIA_TRABAJADOR)
+    args = parser.parse_args()
+
+    if args.procesos <= 1:
+        ejecutar_trabajador(0, args.concurrencia)
+        return
+
+    # spawn: cada proceso inicializa TensorFlow desde cero (fork tras importarlo no es seguro)
+    contexto = multiprocessing.get_context("spawn")
+
+    def lanzar(indice: int):
+        proceso = contexto.Process(
+            target=ejecutar_trabajador, args=(indice, args.concurrencia), name=f"trabajador-{indice}"
+        )
+        proceso.start()
+        return proceso
+
+    procesos = [lanzar(i) for i in range(args.procesos)]
+    print(f"{args.procesos} procesos trabajadores iniciados ({args.concurrencia} tareas cada uno)")
+    try:
+        while True:
+            time.sleep(5)
+            for i, proceso in enumerate(procesos):
+                if not proceso.is_alive():
+                    # Sus trabajos en curso se reasignan al vencer la concesión
+                    print(f"Trabajador {i} terminó (código {proceso.exitcode}); reiniciando")
+                    procesos[i] = lanzar(i)
+    except KeyboardInterrupt:
+        for proceso in procesos:
+            proceso.terminate()
+        for proceso in procesos:
+            proceso.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,12 @@ import streamlit as st
 import tensorflow as tf
 import numpy as np
 from PIL import Image, ImageOps
+import os
+import sys
+
+# Resolución de entrada compartida con el backend (config/ajustes.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from config.ajustes import TAMANO_ENTRADA_MODELO
 
 # --- CONFIGURACIÓN DE LA PÁGINA ---
 st.set_page_config(
@@ -46,9 +52,9 @@ if uploaded_file is not None:
     st.write("Analizando imagen...")
 
     # 2. Preprocesar la imagen para la IA
-    # IMPORTANTE: Debe ser del mismo tamaño que usamos al entrenar (180x180)
-    img_height = 224
-    img_width = 224
+    # IMPORTANTE: Debe ser del mismo tamaño que usamos al entrenar (TAMANO_ENTRADA_MODELO)
+    img_height = TAMANO_ENTRADA_MODELO
+    img_width = TAMANO_ENTRADA_MODELO
     
     # Convertir a RGB por si acaso es una imagen en escala de grises pura
     image = ImageOps.fit(image, (img_width, img_height), Image.Resampling.LANCZOS)
@@ -216,7 +216,7 @@ export default function PaginaHistorial() {
                       <TableCell>
                         {item.imagen_url ? (
                           <img 
-                            src={item.imagen_url} 
+                            src={item.imagen_miniatura_url || item.imagen_url} 
                             alt="Radiografía" 
                             style={{ width: 60, height: 60, objectFit: 'cover', borderRadius: 4 }}
                             onError={(e) => {
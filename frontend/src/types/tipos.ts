@@ -48,6 +48,8 @@ export interface EstadoAutenticacion {
 export interface Analisis {
   id: string;
   imagen_url: string;
+  imagen_miniatura_url?: string;
+  imagen_vista_previa_url?: string;
   diagnostico: 'NORMAL' | 'NEUMONIA';
   confianza: number;
   fecha: string;